@@ -104,18 +104,8 @@ def _get_marker_param(request):
     return request.GET['marker']
 
 
-def limited(items, request, max_limit=CONF.osapi_max_limit):
-    """Return a slice of items according to requested offset and limit.
-
-    :param items: A sliceable entity
-    :param request: ``wsgi.Request`` possibly containing 'offset' and 'limit'
-                    GET variables. 'offset' is where to start in the list,
-                    and 'limit' is the maximum number of items to return. If
-                    'limit' is not specified, 0, or > max_limit, we default
-                    to max_limit. Negative values for either offset or limit
-                    will cause exc.HTTPBadRequest() exceptions to be raised.
-    :kwarg max_limit: The maximum number of items to return from 'items'
-    """
+def _get_offset_and_limit(request, max_limit):
+    """Extract the offset and the limit, capped to max_limit, or fail."""
     try:
         offset = int(request.GET.get('offset', 0))
     except ValueError:
@@ -136,11 +126,40 @@ def limited(items, request, max_limit=CONF.osapi_max_limit):
         msg = _('offset param must be positive')
         raise webob.exc.HTTPBadRequest(explanation=msg)
 
-    limit = min(max_limit, limit or max_limit)
+    return offset, min(max_limit, limit or max_limit)
+
+
+def limited(items, request, max_limit=CONF.osapi_max_limit):
+    """Return a slice of items according to requested offset and limit.
+
+    :param items: A sliceable entity
+    :param request: ``wsgi.Request`` possibly containing 'offset' and 'limit'
+                    GET variables. 'offset' is where to start in the list,
+                    and 'limit' is the maximum number of items to return. If
+                    'limit' is not specified, 0, or > max_limit, we default
+                    to max_limit. Negative values for either offset or limit
+                    will cause exc.HTTPBadRequest() exceptions to be raised.
+    :kwarg max_limit: The maximum number of items to return from 'items'
+    """
+    offset, limit = _get_offset_and_limit(request, max_limit)
     range_end = offset + limit
     return items[offset:range_end]
 
 
+def limited_count(request, max_limit=CONF.osapi_max_limit):
+    """Return how many items limited() may use from the start of a list.
+
+    That is the requested offset plus the requested limit, so that only
+    this many items need to be fetched to then be passed to limited().
+
+    :param request: ``wsgi.Request`` possibly containing 'offset' and 'limit'
+                    GET variables, see limited().
+    :kwarg max_limit: The maximum number of items limited() returns
+    """
+    offset, limit = _get_offset_and_limit(request, max_limit)
+    return offset + limit
+
+
 def limited_by_marker(items, request, max_limit=CONF.osapi_max_limit):
     """Return a slice of items according to the requested marker and limit."""
     params = get_pagination_params(request)
@@ -28,6 +28,7 @@ from cinder import backup as backupAPI
 from cinder import exception
 from cinder.i18n import _, _LI
 from cinder.openstack.common import log as logging
+from cinder.openstack.common import strutils
 from cinder import utils
 
 LOG = logging.getLogger(__name__)
@@ -106,7 +107,7 @@ class CreateDeserializer(wsgi.MetadataXMLDeserializer):
         backup_node = self.find_first_child_named(node, 'backup')
 
         attributes = ['container', 'display_name',
-                      'display_description', 'volume_id']
+                      'display_description', 'volume_id', 'incremental']
 
         for attr in attributes:
             if backup_node.getAttribute(attr):
@@ -205,6 +206,14 @@ class BackupsController(wsgi.Controller):
         """Returns a list of backups, transformed through view builder."""
         context = req.environ['cinder.context']
         filters = req.params.copy()
+        marker = filters.pop('marker', None)
+        sort_key = filters.pop('sort_key', None)
+        sort_dir = filters.pop('sort_dir', None)
+        filters.pop('limit', None)
+        filters.pop('offset', None)
+        # The offset is applied by common.limited, after the database
+        # limited the backups to the ones before the end of the page.
+        limit = common.limited_count(req)
 
         utils.remove_invalid_filter_options(context,
                                             filters,
@@ -214,7 +223,10 @@ class BackupsController(wsgi.Controller):
             filters['display_name'] = filters['name']
             del filters['name']
 
-        backups = self.backup_api.get_all(context, search_opts=filters)
+        backups = self.backup_api.get_all(context, search_opts=filters,
+                                          marker=marker, limit=limit,
+                                          sort_key=sort_key,
+                                          sort_dir=sort_dir)
         limited_list = common.limited(backups, req)
         req.cache_db_backups(limited_list)
 
@@ -248,6 +260,8 @@ class BackupsController(wsgi.Controller):
         container = backup.get('container', None)
         name = backup.get('name', None)
         description = backup.get('description', None)
+        incremental = strutils.bool_from_string(
+            backup.get('incremental', False), strict=False)
 
         LOG.info(_LI("Creating backup of volume %(volume_id)s in container"
                      " %(container)s"),
@@ -256,9 +270,12 @@ class BackupsController(wsgi.Controller):
 
         try:
             new_backup = self.backup_api.create(context, name, description,
-                                                volume_id, container)
+                                                volume_id, container,
+                                                incremental=incremental)
         except exception.InvalidVolume as error:
             raise exc.HTTPBadRequest(explanation=error.msg)
+        except exception.InvalidBackup as error:
+            raise exc.HTTPBadRequest(explanation=error.msg)
         except exception.VolumeNotFound as error:
             raise exc.HTTPNotFound(explanation=error.msg)
         except exception.ServiceNotFound as error:
@@ -0,0 +1,155 @@
+#   Copyright (c) 2014 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+from webob import exc
+
+from cinder.api import extensions
+from cinder.api.openstack import wsgi
+from cinder.api.v2.views import volumes as volume_views
+from cinder import exception
+from cinder.i18n import _
+from cinder.openstack.common import log as logging
+from cinder.openstack.common import uuidutils
+from cinder import volume as cinder_volume
+from cinder.volume import volume_types
+
+LOG = logging.getLogger(__name__)
+authorize = extensions.extension_authorizer('volume', 'volume_bulk_create')
+
+# Volumes created in bulk can't be created from another volume.
+UNSUPPORTED_KEYS = ('snapshot_id', 'source_volid', 'source_replica',
+                    'consistencygroup_id')
+
+
+class VolumeBulkCreateController(wsgi.Controller):
+    """The /os-volume-bulk-create controller for the OpenStack API."""
+
+    _view_builder_class = volume_views.ViewBuilder
+
+    def __init__(self, *args, **kwargs):
+        super(VolumeBulkCreateController, self).__init__(*args, **kwargs)
+        self.volume_api = cinder_volume.API()
+
+    @wsgi.response(202)
+    def create(self, req, body):
+        """Create count alike volumes.
+
+        The quota is reserved and the hosts are filtered and weighed once
+        for all of the volumes.
+
+        Required HTTP Body:
+
+        {
+         'volume':
+          {
+           'count': <Number of volumes to create>,
+           'size':  <Size of each volume, in GB>,
+          }
+        }
+
+        Optional elements to 'volume' are the ones of a volume create
+        request, but for those creating it from another volume or snapshot:
+            name               The name of all the new volumes.
+            description        The description of all the new volumes.
+            volume_type        ID or name of the volume type of the volumes.
+            metadata           Key/value pairs to be associated with each of
+                               the new volumes.
+            availability_zone  The availability zone of the new volumes.
+            scheduler_hints    Scheduler hints for all the volumes.
+            imageRef           The image to create each volume from.
+        """
+        context = req.environ['cinder.context']
+        authorize(context)
+
+        if not self.is_valid_body(body, 'volume'):
+            msg = _("Missing required element '%s' in request body") % 'volume'
+            raise exc.HTTPBadRequest(explanation=msg)
+
+        volume = body['volume']
+
+        required_keys = set(['count', 'size'])
+        missing_keys = list(required_keys - set(volume.keys()))
+        if missing_keys:
+            msg = _("The following elements are required: %s") % \
+                ', '.join(missing_keys)
+            raise exc.HTTPBadRequest(explanation=msg)
+
+        unsupported_keys = [key for key in UNSUPPORTED_KEYS
+                            if volume.get(key) is not None]
+        if unsupported_keys:
+            msg = _("The following elements are not supported: %s") % \
+                ', '.join(unsupported_keys)
+            raise exc.HTTPBadRequest(explanation=msg)
+
+        LOG.debug('Bulk create volume request body: %s', body)
+
+        kwargs = {}
+        req_volume_type = volume.get('volume_type', None)
+        if req_volume_type:
+            try:
+                if not uuidutils.is_uuid_like(req_volume_type):
+                    kwargs['volume_type'] = \
+                        volume_types.get_volume_type_by_name(
+                            context, req_volume_type)
+                else:
+                    kwargs['volume_type'] = volume_types.get_volume_type(
+                        context, req_volume_type)
+            except exception.VolumeTypeNotFound:
+                msg = _("Volume type not found.")
+                raise exc.HTTPNotFound(explanation=msg)
+
+        image_href = volume.get('imageRef')
+        if image_href is not None:
+            # If the image href was generated by nova api, strip image_href
+            # down to an id.
+            try:
+                image_uuid = image_href.split('/').pop()
+            except (TypeError, AttributeError):
+                image_uuid = None
+            if not uuidutils.is_uuid_like(image_uuid):
+                msg = _("Invalid imageRef provided.")
+                raise exc.HTTPBadRequest(explanation=msg)
+            kwargs['image_id'] = image_uuid
+
+        kwargs['metadata'] = volume.get('metadata', None)
+        kwargs['availability_zone'] = volume.get('availability_zone', None)
+        kwargs['scheduler_hints'] = volume.get('scheduler_hints', None)
+
+        new_volumes = self.volume_api.create_many(
+            context,
+            volume['count'],
+            volume['size'],
+            volume.get('name', volume.get('display_name')),
+            volume.get('description', volume.get('display_description')),
+            **kwargs)
+
+        new_volumes = [dict(new_volume.iteritems())
+                       for new_volume in new_volumes]
+        return self._view_builder.detail_list(req, new_volumes)
+
+
+class Volume_bulk_create(extensions.ExtensionDescriptor):
+    """Creates alike volumes with a single scheduling pass."""
+
+    name = 'VolumeBulkCreate'
+    alias = 'os-volume-bulk-create'
+    namespace = ('http://docs.openstack.org/volume/ext/'
+                 'os-volume-bulk-create/api/v1')
+    updated = '2014-10-01T00:00:00+00:00'
+
+    def get_resources(self):
+        controller = VolumeBulkCreateController()
+        res = extensions.ResourceExtension(Volume_bulk_create.alias,
+                                           controller)
+        return [res]
@@ -33,15 +33,17 @@ class VolumeImageMetadataController(wsgi.Controller):
         super(VolumeImageMetadataController, self).__init__(*args, **kwargs)
         self.volume_api = volume.API()
 
-    def _get_all_images_metadata(self, context):
-        """Returns the image metadata for all volumes."""
+    def _get_images_metadata(self, context, volume_ids):
+        """Returns the image metadata of the given volumes, by volume id."""
+        if not volume_ids:
+            return {}
         try:
-            all_metadata = self.volume_api.get_volumes_image_metadata(context)
+            return self.volume_api.get_volumes_image_metadata(
+                context, volume_ids=volume_ids)
         except Exception as e:
             LOG.debug('Problem retrieving volume image metadata. '
                       'It will be skipped. Error: %s', e)
-            all_metadata = {}
-        return all_metadata
+            return {}
 
     def _add_image_metadata(self, context, resp_volume, image_meta=None):
         """Appends the image metadata to the given volume.
@@ -75,9 +77,12 @@ class VolumeImageMetadataController(wsgi.Controller):
         context = req.environ['cinder.context']
         if authorize(context):
             resp_obj.attach(xml=VolumesImageMetadataTemplate())
-            all_meta = self._get_all_images_metadata(context)
-            for vol in list(resp_obj.obj.get('volumes', [])):
-                image_meta = all_meta.get(vol['id'], {})
+            volumes = list(resp_obj.obj.get('volumes', []))
+            # Only the volumes of this page, not all of the visible ones.
+            images_meta = self._get_images_metadata(
+                context, [vol['id'] for vol in volumes])
+            for vol in volumes:
+                image_meta = images_meta.get(vol['id'], {})
                 self._add_image_metadata(context, vol, image_meta)
 
 
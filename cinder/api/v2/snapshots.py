@@ -143,10 +143,16 @@ class SnapshotsController(wsgi.Controller):
         """Returns a list of snapshots, transformed through entity_maker."""
         context = req.environ['cinder.context']
 
-        #pop out limit and offset , they are not search_opts
+        #pop out the paginate options, they are not search_opts
         search_opts = req.GET.copy()
+        marker = search_opts.pop('marker', None)
+        sort_key = search_opts.pop('sort_key', None)
+        sort_dir = search_opts.pop('sort_dir', None)
         search_opts.pop('limit', None)
         search_opts.pop('offset', None)
+        # The offset is applied by common.limited, after the database
+        # limited the snapshots to the ones before the end of the page.
+        limit = common.limited_count(req)
 
         #filter out invalid option
         allowed_search_options = ('status', 'volume_id', 'name')
@@ -159,7 +165,11 @@ class SnapshotsController(wsgi.Controller):
             del search_opts['name']
 
         snapshots = self.volume_api.get_all_snapshots(context,
-                                                      search_opts=search_opts)
+                                                      search_opts=search_opts,
+                                                      marker=marker,
+                                                      limit=limit,
+                                                      sort_key=sort_key,
+                                                      sort_dir=sort_dir)
         limited_list = common.limited(snapshots, req)
         req.cache_db_snapshots(limited_list)
         res = [entity_maker(context, snapshot) for snapshot in limited_list]
@@ -40,6 +40,9 @@ LOG = logging.getLogger(__name__)
 SCHEDULER_HINTS_NAMESPACE =\
     "http://docs.openstack.org/block-service/ext/scheduler-hints/api/v2"
 
+# Volume columns rendered by the summary view.
+SUMMARY_FIELDS = ('id', 'display_name')
+
 
 def make_attachment(elem):
     elem.set('id')
@@ -231,14 +234,19 @@ class VolumeController(wsgi.Controller):
         if 'metadata' in filters:
             filters['metadata'] = ast.literal_eval(filters['metadata'])
 
+        # The summary view only renders the ids and names of the volumes,
+        # don't load anything else.
+        fields = None if is_detail else SUMMARY_FIELDS
         volumes = self.volume_api.get_all(context, marker, limit, sort_key,
                                           sort_dir, filters,
-                                          viewable_admin_meta=True)
+                                          viewable_admin_meta=True,
+                                          fields=fields)
 
         volumes = [dict(vol.iteritems()) for vol in volumes]
 
-        for volume in volumes:
-            utils.add_visible_admin_metadata(volume)
+        if is_detail:
+            for volume in volumes:
+                utils.add_visible_admin_metadata(volume)
 
         limited_list = common.limited(volumes, req)
         req.cache_db_volumes(limited_list)
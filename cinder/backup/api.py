@@ -21,6 +21,7 @@ Handles all requests relating to the volume backups service.
 from eventlet import greenthread
 from oslo.config import cfg
 
+from cinder.backup import manager as backup_manager
 from cinder.backup import rpcapi as backup_rpcapi
 from cinder import context
 from cinder.db import base
@@ -69,24 +70,67 @@ class API(base.Base):
             msg = _('Backup status must be available or error')
             raise exception.InvalidBackup(reason=msg)
 
+        # Incremental backups reference the objects of their parent, so a
+        # backup can only be deleted once all of its children are gone.
+        if self._get_dependent_backups(context, backup):
+            msg = _('Incremental backups exist for this backup.')
+            raise exception.InvalidBackup(reason=msg)
+
         self.db.backup_update(context, backup_id, {'status': 'deleting'})
         self.backup_rpcapi.delete_backup(context,
                                          backup['host'],
                                          backup['id'])
 
-    def get_all(self, context, search_opts=None):
+    def get_all(self, context, search_opts=None, marker=None, limit=None,
+                sort_key=None, sort_dir=None):
+        """Get backups matching search_opts, filtered by the database.
+
+        marker, limit, sort_key and sort_dir are the paginate options of
+        db.backup_get_all, the backups aren't paginated without them.
+        """
         if search_opts is None:
             search_opts = {}
         check_policy(context, 'get_all')
         if context.is_admin:
-            backups = self.db.backup_get_all(context, filters=search_opts)
+            backups = self.db.backup_get_all(context, search_opts, marker,
+                                             limit, sort_key, sort_dir)
         else:
             backups = self.db.backup_get_all_by_project(context,
                                                         context.project_id,
-                                                        filters=search_opts)
+                                                        search_opts, marker,
+                                                        limit, sort_key,
+                                                        sort_dir)
 
         return backups
 
+    def _get_dependent_backups(self, context, backup):
+        """Return the incremental backups whose parent is this backup.
+
+        The children are looked up in all projects, as an admin can make
+        an incremental backup of the volume of another project.
+        """
+        return self.db.backup_get_all(context.elevated(),
+                                      filters={'parent_id': backup['id']})
+
+    def _get_latest_backup(self, context, volume):
+        """Return the most recent available backup of a volume, if any.
+
+        Only the backups made by the configured backup driver are
+        considered, as an incremental backup can't be based on the backup
+        of another driver.
+        """
+        backups = self.db.backup_get_all_by_project(
+            context, volume['project_id'],
+            filters={'volume_id': volume['id'], 'status': 'available'})
+        driver = backup_manager.mapper.get(CONF.backup_driver,
+                                           CONF.backup_driver)
+        backups = [backup for backup in backups
+                   if backup_manager.mapper.get(backup['service'],
+                                                backup['service']) == driver]
+        if not backups:
+            return None
+        return max(backups, key=lambda backup: backup['created_at'])
+
     def _is_backup_service_enabled(self, volume, volume_host):
         """Check if there is a backup service available."""
         topic = CONF.backup_topic
@@ -112,7 +156,7 @@ class API(base.Base):
         return [srv['host'] for srv in services if not srv['disabled']]
 
     def create(self, context, name, description, volume_id,
-               container, availability_zone=None):
+               container, availability_zone=None, incremental=False):
         """Make the RPC call to create a volume backup."""
         check_policy(context, 'create')
         volume = self.volume_api.get(context, volume_id)
@@ -123,6 +167,16 @@ class API(base.Base):
         if not self._is_backup_service_enabled(volume, volume_host):
             raise exception.ServiceNotFound(service_id='cinder-backup')
 
+        parent_id = None
+        if incremental:
+            latest_backup = self._get_latest_backup(context, volume)
+            if latest_backup is None:
+                msg = _('No backups available to do an incremental backup.')
+                raise exception.InvalidBackup(reason=msg)
+            parent_id = latest_backup['id']
+            if container is None:
+                container = latest_backup['container']
+
         # do quota reserver before setting volume status and backup status
         try:
             reserve_opts = {'backups': 1,
@@ -169,7 +223,8 @@ class API(base.Base):
                    'status': 'creating',
                    'container': container,
                    'size': volume['size'],
-                   'host': volume_host, }
+                   'host': volume_host,
+                   'parent_id': parent_id, }
         try:
             backup = self.db.backup_create(context, options)
             QUOTAS.commit(context, reservations)
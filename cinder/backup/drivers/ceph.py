@@ -52,6 +52,7 @@ import eventlet
 from oslo.config import cfg
 
 from cinder.backup.driver import BackupDriver
+from cinder.backup import fileio
 from cinder import exception
 from cinder.i18n import _, _LE, _LI, _LW
 from cinder.openstack.common import excutils
@@ -274,16 +275,21 @@ class CephBackupDriver(BackupDriver):
     def _discard_bytes(self, volume, offset, length):
         """Trim length bytes from offset.
 
-        If the volume is an rbd do a discard() otherwise assume it is a file
-        and pad with zeroes.
+        If the volume is an rbd do a discard(), if it is a file or block
+        device try to punch a hole into it, otherwise pad with zeroes. The
+        volume is left positioned at the end of the discarded range.
         """
         if length:
             LOG.debug("Discarding %(length)s bytes from offset %(offset)s" %
                       {'length': length, 'offset': offset})
             if self._file_is_rbd(volume):
                 volume.rbd_image.discard(offset, length)
+                volume.seek(offset + length)
+            elif utils.punch_hole(volume, offset, length):
+                volume.seek(offset + length)
             else:
-                zeroes = '\0' * length
+                volume.seek(offset)
+                zeroes = '\0' * min(length, self.chunk_size)
                 chunks = int(length / self.chunk_size)
                 for chunk in xrange(0, chunks):
                     LOG.debug("Writing zeroes chunk %d" % chunk)
@@ -294,55 +300,81 @@ class CephBackupDriver(BackupDriver):
 
                 rem = int(length % self.chunk_size)
                 if rem:
-                    zeroes = '\0' * rem
+                    zeroes = zeroes[:rem]
                     volume.write(zeroes)
                     volume.flush()
 
+    def _discard_chunk(self, volume, length):
+        """Trim length bytes from the current position of the volume.
+
+        Called in a native thread, as the discards of _transfer_data() are
+        interleaved with its writes.
+        """
+        offset = volume.tell()
+        if self._file_is_rbd(volume):
+            volume.rbd_image.discard(offset, length)
+            volume.seek(offset + length)
+        elif utils.punch_hole(volume, offset, length):
+            volume.seek(offset + length)
+        else:
+            volume.write('\0' * length)
+            volume.flush()
+
+    def _write_chunk(self, volume, data):
+        """Write data to the volume, in a native thread."""
+        volume.write(data)
+        volume.flush()
+
     def _transfer_data(self, src, src_name, dest, dest_name, length):
-        """Transfer data between files (Python IO objects)."""
+        """Transfer data between files (Python IO objects).
+
+        The source is read ahead, and the destination written behind, in
+        native threads so that slow volumes do not block other backups.
+        """
         LOG.debug("Transferring data between '%(src)s' and '%(dest)s'" %
                   {'src': src_name, 'dest': dest_name})
 
         chunks = int(length / self.chunk_size)
+        if length % self.chunk_size:
+            chunks += 1
         LOG.debug("%(chunks)s chunks of %(bytes)s bytes to be transferred" %
                   {'chunks': chunks, 'bytes': self.chunk_size})
 
-        for chunk in xrange(0, chunks):
+        reader = fileio.ReadAhead(src, self.chunk_size, length=length)
+        writer = fileio.WriteBehind()
+        transferred = 0
+        try:
+            chunk = 0
             before = time.time()
-            data = src.read(self.chunk_size)
-            # If we have reach end of source, discard any extraneous bytes from
-            # destination volume if trim is enabled and stop writing.
-            if data == '':
-                if CONF.restore_discard_excess_bytes:
-                    self._discard_bytes(dest, dest.tell(),
-                                        length - dest.tell())
-
-                return
-
-            dest.write(data)
-            dest.flush()
-            delta = (time.time() - before)
-            rate = (self.chunk_size / delta) / 1024
-            LOG.debug((_("Transferred chunk %(chunk)s of %(chunks)s "
-                         "(%(rate)dK/s)") %
-                       {'chunk': chunk + 1, 'chunks': chunks,
-                        'rate': rate}))
-
-            # yield to any other pending backups
-            eventlet.sleep(0)
-
-        rem = int(length % self.chunk_size)
-        if rem:
-            LOG.debug("Transferring remaining %s bytes" % rem)
-            data = src.read(rem)
-            if data == '':
-                if CONF.restore_discard_excess_bytes:
-                    self._discard_bytes(dest, dest.tell(), rem)
-            else:
-                dest.write(data)
-                dest.flush()
-                # yield to any other pending backups
-                eventlet.sleep(0)
+            while True:
+                data = reader.read()[0]
+                if data == '':
+                    break
+                if utils.is_all_zero(data):
+                    # Do not write out zeroes, leave the range unallocated on
+                    # destinations that support it.
+                    writer.submit(self._discard_chunk, dest, len(data))
+                else:
+                    writer.submit(self._write_chunk, dest, data)
+                transferred += len(data)
+
+                chunk += 1
+                now = time.time()
+                rate = (len(data) / max(now - before, 0.001)) / 1024
+                before = now
+                LOG.debug((_("Transferred chunk %(chunk)s of %(chunks)s "
+                             "(%(rate)dK/s)") %
+                           {'chunk': chunk, 'chunks': chunks,
+                            'rate': rate}))
+            writer.wait()
+        finally:
+            reader.close()
+            writer.close()
+
+        # If we have reach end of source, discard any extraneous bytes from
+        # destination volume if trim is enabled.
+        if transferred < length and CONF.restore_discard_excess_bytes:
+            self._discard_bytes(dest, dest.tell(), length - transferred)
 
     def _create_base_image(self, name, size, rados_client):
         """Create a base backup image.
@@ -26,28 +26,41 @@
                                     operations (default: 10).
 :backup_swift_retry_backoff: The backoff time in seconds between retrying
                                     failed Swift operations (default: 10).
+:backup_swift_object_concurrency: The number of Swift objects transferred
+                                  in parallel during backup and restore
+                                  (default: 1).
 :backup_compression_algorithm: Compression algorithm to use for volume
                                backups. Supported options are:
-                               None (to disable), zlib and bz2 (default: zlib)
+                               None (to disable), zlib, bz2 and, when the
+                               python bindings are installed, lz4 and zstd
+                               (default: zlib)
+:backup_compression_levels: Compression level to use per algorithm, for
+                            example zlib:6,zstd:3 (default: the algorithm's
+                            default level).
 """
 
+import collections
 import hashlib
 import json
 import os
 import socket
 
 import eventlet
+from eventlet import pools
+from eventlet import tpool
 from oslo.config import cfg
 import six
 from swiftclient import client as swift
 
 from cinder.backup.driver import BackupDriver
+from cinder.backup import fileio
 from cinder import exception
 from cinder.i18n import _, _LE, _LI, _LW
 from cinder.openstack.common import excutils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import timeutils
 from cinder.openstack.common import units
+from cinder import utils
 
 LOG = logging.getLogger(__name__)
 
@@ -90,33 +103,109 @@ swiftbackup_service_opts = [
     cfg.IntOpt('backup_swift_retry_backoff',
                default=2,
                help='The backoff time in seconds between Swift retries'),
+    cfg.IntOpt('backup_swift_object_concurrency',
+               default=1,
+               help='The number of Swift objects to upload or download in '
+                    'parallel during a single backup or restore'),
     cfg.StrOpt('backup_compression_algorithm',
                default='zlib',
                help='Compression algorithm (None to disable)'),
+    cfg.DictOpt('backup_compression_levels',
+                default={},
+                help='Compression level to use for each compression '
+                     'algorithm, for example zlib:6,zstd:3'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(swiftbackup_service_opts)
 
 
+class Codec(object):
+    """A compression algorithm used for the objects of a backup.
+
+    The name of the codec is stored with every object in the backup
+    metadata so that restore always uses the algorithm the object was
+    compressed with.
+    """
+
+    def __init__(self, name, compress, decompress):
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+
+
+def _get_zlib_codec(level):
+    import zlib
+    if level is None:
+        level = 6
+    return Codec('zlib', lambda data: zlib.compress(data, level),
+                 zlib.decompress)
+
+
+def _get_bz2_codec(level):
+    import bz2
+    if level is None:
+        level = 9
+    return Codec('bz2', lambda data: bz2.compress(data, level),
+                 bz2.decompress)
+
+
+def _get_lz4_codec(level):
+    import lz4.frame
+    if level is None:
+        level = 0
+    return Codec('lz4',
+                 lambda data: lz4.frame.compress(data,
+                                                 compression_level=level),
+                 lz4.frame.decompress)
+
+
+def _get_zstd_codec(level):
+    import zstandard
+    if level is None:
+        level = 3
+
+    # NOTE: zstandard compressor and decompressor objects must not be shared
+    # between threads, so every call gets its own.
+    def compress(data):
+        return zstandard.ZstdCompressor(
+            level=level, write_content_size=True).compress(data)
+
+    def decompress(data):
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    return Codec('zstd', compress, decompress)
+
+
+# Compression algorithms by name. Codecs whose python bindings are not
+# installed are reported as unsupported when they are requested.
+CODECS = {
+    'zlib': _get_zlib_codec,
+    'bz2': _get_bz2_codec,
+    'lz4': _get_lz4_codec,
+    'zstd': _get_zstd_codec,
+}
+CODEC_ALIASES = {'gzip': 'zlib', 'bzip2': 'bz2'}
+
+
 class SwiftBackupDriver(BackupDriver):
     """Provides backup, restore and delete of backup objects within Swift."""
 
-    DRIVER_VERSION = '1.0.0'
-    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1'}
+    DRIVER_VERSION = '1.1.0'
+    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1',
+                              '1.1.0': '_restore_v1'}
 
     def _get_compressor(self, algorithm):
-        try:
-            if algorithm.lower() in ('none', 'off', 'no'):
-                return None
-            elif algorithm.lower() in ('zlib', 'gzip'):
-                import zlib as compressor
-                return compressor
-            elif algorithm.lower() in ('bz2', 'bzip2'):
-                import bz2 as compressor
-                return compressor
-        except ImportError:
-            pass
+        if algorithm.lower() in ('none', 'off', 'no'):
+            return None
+        name = CODEC_ALIASES.get(algorithm.lower(), algorithm.lower())
+        if name in CODECS:
+            level = CONF.backup_compression_levels.get(name)
+            try:
+                return CODECS[name](int(level) if level is not None
+                                    else None)
+            except ImportError:
+                pass
 
         err = _('unsupported compression algorithm: %s') % algorithm
         raise ValueError(unicode(err))
@@ -152,6 +241,7 @@ class SwiftBackupDriver(BackupDriver):
         self.swift_backoff = CONF.backup_swift_retry_backoff
         self.compressor = \
             self._get_compressor(CONF.backup_compression_algorithm)
+        self.concurrency = max(1, CONF.backup_swift_object_concurrency)
         LOG.debug('Connect to %s in "%s" mode' % (CONF.backup_swift_url,
                                                   CONF.backup_swift_auth))
         if CONF.backup_swift_auth == 'single_user':
@@ -160,7 +250,16 @@ class SwiftBackupDriver(BackupDriver):
                               "but %(param)s not set")
                           % {'param': 'backup_swift_user'})
                 raise exception.ParameterNotFound(param='backup_swift_user')
-            self.conn = swift.Connection(
+        self.conn = self._get_connection()
+        # NOTE: a swift connection wraps a single HTTP connection, so every
+        # object transfer in flight needs a connection of its own.
+        self.conn_pool = pools.Pool(max_size=self.concurrency,
+                                    create=self._get_connection)
+
+    def _get_connection(self):
+        """Return a new Swift connection using the configured auth mode."""
+        if CONF.backup_swift_auth == 'single_user':
+            return swift.Connection(
                 authurl=CONF.backup_swift_url,
                 auth_version=CONF.backup_swift_auth_version,
                 tenant_name=CONF.backup_swift_tenant,
@@ -168,11 +267,10 @@ class SwiftBackupDriver(BackupDriver):
                 key=CONF.backup_swift_key,
                 retries=self.swift_attempts,
                 starting_backoff=self.swift_backoff)
-        else:
-            self.conn = swift.Connection(retries=self.swift_attempts,
-                                         preauthurl=self.swift_url,
-                                         preauthtoken=self.context.auth_token,
-                                         starting_backoff=self.swift_backoff)
+        return swift.Connection(retries=self.swift_attempts,
+                                preauthurl=self.swift_url,
+                                preauthtoken=self.context.auth_token,
+                                starting_backoff=self.swift_backoff)
 
     def _create_container(self, context, backup):
         backup_id = backup['id']
@@ -226,6 +324,7 @@ class SwiftBackupDriver(BackupDriver):
         metadata['backup_name'] = backup['display_name']
         metadata['backup_description'] = backup['display_description']
         metadata['created_at'] = str(backup['created_at'])
+        metadata['parent_id'] = backup['parent_id']
         metadata['objects'] = object_list
         metadata['volume_meta'] = volume_meta
         metadata_json = json.dumps(metadata, sort_keys=True, indent=2)
@@ -284,25 +383,119 @@ class SwiftBackupDriver(BackupDriver):
                       'availability_zone': availability_zone,
                   })
         object_meta = {'id': 1, 'list': [], 'prefix': object_prefix,
-                       'volume_meta': None}
+                       'volume_meta': None, 'pending': collections.deque(),
+                       'parent_objects': {}}
+        if backup['parent_id']:
+            object_meta['parent_objects'] = self._get_parent_objects(
+                backup, container)
         return object_meta, container
 
+    def _get_parent_objects(self, backup, container):
+        """Return the parent backup's objects keyed by their offset.
+
+        An incremental backup only uploads the chunks whose fingerprint
+        differs from the chunk at the same offset in its parent; unchanged
+        chunks keep referring to the object the parent already points to.
+        """
+        parent = self.db.backup_get(self.context, backup['parent_id'])
+        if parent['container'] != container:
+            err = (_('incremental backup must be stored in the container of '
+                     'its parent backup %(parent_id)s (%(container)s)') %
+                   {'parent_id': parent['id'],
+                    'container': parent['container']})
+            raise exception.InvalidBackup(reason=err)
+        try:
+            metadata = self._read_metadata(parent)
+        except socket.error as err:
+            raise exception.SwiftConnectionFailed(reason=err)
+        parent_objects = {}
+        for metadata_object in metadata['objects']:
+            object_name = metadata_object.keys()[0]
+            offset = metadata_object[object_name]['offset']
+            parent_objects[offset] = metadata_object
+        LOG.debug('incremental backup %(backup_id)s of parent %(parent_id)s '
+                  'with %(count)d parent objects' %
+                  {'backup_id': backup['id'], 'parent_id': parent['id'],
+                   'count': len(parent_objects)})
+        return parent_objects
+
     def _backup_chunk(self, backup, container, data, data_offset, object_meta):
-        """Backup data chunk based on the object metadata and offset."""
+        """Backup data chunk based on the object metadata and offset.
+
+        The chunk is compressed and uploaded by a worker greenthread so that
+        up to backup_swift_object_concurrency chunks are in flight while the
+        next one is read from the volume.
+        """
         object_prefix = object_meta['prefix']
-        object_list = object_meta['list']
         object_id = object_meta['id']
         object_name = '%s-%05d' % (object_prefix, object_id)
+        self._wait_for_chunks(object_meta, self.concurrency - 1)
+        parent_object = object_meta['parent_objects'].get(data_offset)
+        object_meta['pending'].append(
+            eventlet.spawn(self._put_chunk, container, object_name, data,
+                           data_offset, parent_object))
+        object_meta['id'] = object_id + 1
+        LOG.debug('Calling eventlet.sleep(0)')
+        eventlet.sleep(0)
+
+    def _wait_for_chunks(self, object_meta, max_pending=0):
+        """Wait until at most max_pending chunk uploads are in flight.
+
+        Uploads are collected in the order they were started, so the object
+        list in the backup metadata is ordered by object id no matter which
+        upload completes first. If an upload failed, the remaining ones are
+        cancelled and the error is raised.
+        """
+        object_list = object_meta['list']
+        pending = object_meta['pending']
+        try:
+            while len(pending) > max_pending:
+                object_list.append(pending[0].wait())
+                pending.popleft()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for thread in pending:
+                    thread.kill()
+                pending.clear()
+
+    def _put_chunk(self, container, object_name, data, data_offset,
+                   parent_object=None):
+        """Compress and upload a single chunk, return its object metadata.
+
+        If the chunk is unchanged from parent_object, nothing is uploaded and
+        the parent's object metadata is returned instead. Chunks that only
+        contain zeroes are not uploaded either, they are recorded as holes.
+        """
+        if utils.is_all_zero(data):
+            LOG.debug('chunk at offset %d is all zeroes, recording a hole' %
+                      data_offset)
+            return {object_name: {'offset': data_offset,
+                                  'length': len(data),
+                                  'hole': True}}
+
+        fingerprint = hashlib.sha256(data).hexdigest()
+        if parent_object is not None:
+            parent_info = parent_object.values()[0]
+            if (parent_info.get('fingerprint') == fingerprint and
+                    parent_info['length'] == len(data)):
+                LOG.debug('chunk at offset %(offset)d unchanged, reusing '
+                          'object %(object_name)s' %
+                          {'offset': data_offset,
+                           'object_name': parent_object.keys()[0]})
+                return parent_object
+
         obj = {}
         obj[object_name] = {}
         obj[object_name]['offset'] = data_offset
         obj[object_name]['length'] = len(data)
-        LOG.debug('reading chunk of data from volume')
+        obj[object_name]['fingerprint'] = fingerprint
         if self.compressor is not None:
-            algorithm = CONF.backup_compression_algorithm.lower()
+            algorithm = self.compressor.name
             obj[object_name]['compression'] = algorithm
             data_size_bytes = len(data)
-            data = self.compressor.compress(data)
+            # Compression runs in a native thread so that the chunks in
+            # flight are compressed in parallel.
+            data = tpool.execute(self.compressor.compress, data)
             comp_size_bytes = len(data)
             LOG.debug('compressed %(data_size_bytes)d bytes of data '
                       'to %(comp_size_bytes)d bytes using '
@@ -316,30 +509,26 @@ class SwiftBackupDriver(BackupDriver):
             LOG.debug('not compressing data')
             obj[object_name]['compression'] = 'none'
 
+        md5 = hashlib.md5(data).hexdigest()
+        obj[object_name]['md5'] = md5
+        LOG.debug('backup MD5 for %(object_name)s: %(md5)s' %
+                  {'object_name': object_name, 'md5': md5})
         reader = six.StringIO(data)
         LOG.debug('About to put_object')
         try:
-            etag = self.conn.put_object(container, object_name, reader,
-                                        content_length=len(data))
+            with self.conn_pool.item() as conn:
+                etag = conn.put_object(container, object_name, reader,
+                                       content_length=len(data))
         except socket.error as err:
             raise exception.SwiftConnectionFailed(reason=err)
         LOG.debug('swift MD5 for %(object_name)s: %(etag)s' %
                   {'object_name': object_name, 'etag': etag, })
-        md5 = hashlib.md5(data).hexdigest()
-        obj[object_name]['md5'] = md5
-        LOG.debug('backup MD5 for %(object_name)s: %(md5)s' %
-                  {'object_name': object_name, 'md5': md5})
         if etag != md5:
             err = _('error writing object to swift, MD5 of object in '
                     'swift %(etag)s is not the same as MD5 of object sent '
                     'to swift %(md5)s') % {'etag': etag, 'md5': md5}
             raise exception.InvalidBackup(reason=err)
-        object_list.append(obj)
-        object_id += 1
-        object_meta['list'] = object_list
-        object_meta['id'] = object_id
-        LOG.debug('Calling eventlet.sleep(0)')
-        eventlet.sleep(0)
+        return obj
 
     def _finalize_backup(self, backup, container, object_meta):
         """Finalize the backup by updating its metadata on Swift."""
@@ -377,13 +566,16 @@ class SwiftBackupDriver(BackupDriver):
         """Backup the given volume to Swift."""
 
         object_meta, container = self._prepare_backup(backup)
-        while True:
-            data = volume_file.read(self.data_block_size_bytes)
-            data_offset = volume_file.tell()
-            if data == '':
-                break
-            self._backup_chunk(backup, container, data,
-                               data_offset, object_meta)
+        # The volume is read in native threads, ahead of the uploads.
+        with fileio.ReadAhead(volume_file,
+                              self.data_block_size_bytes) as reader:
+            while True:
+                data, data_offset = reader.read()
+                if data == '':
+                    break
+                self._backup_chunk(backup, container, data,
+                                   data_offset, object_meta)
+        self._wait_for_chunks(object_meta)
 
         if backup_metadata:
             try:
@@ -401,11 +593,19 @@ class SwiftBackupDriver(BackupDriver):
         """Restore a v1 swift volume backup from swift."""
         backup_id = backup['id']
         LOG.debug('v1 swift volume backup restore of %s started', backup_id)
-        container = backup['container']
         metadata_objects = metadata['objects']
-        metadata_object_names = sum((obj.keys() for obj in metadata_objects),
-                                    [])
+        # Holes are zero filled chunks that were never uploaded.
+        metadata_object_names = [name for obj in metadata_objects
+                                 for name, info in obj.items()
+                                 if not info.get('hole')]
         LOG.debug('metadata_object_names = %s' % metadata_object_names)
+        if metadata.get('parent_id'):
+            # Unchanged chunks of an incremental backup are restored from
+            # the objects of the backups up its parent chain, so only the
+            # objects this backup uploaded itself live under its prefix.
+            object_prefix = backup['service_metadata']
+            metadata_object_names = [name for name in metadata_object_names
+                                     if name.startswith(object_prefix)]
         prune_list = [self._metadata_filename(backup)]
         swift_object_names = [swift_object_name for swift_object_name in
                               self._generate_object_names(backup)
@@ -415,50 +615,101 @@ class SwiftBackupDriver(BackupDriver):
                     'swift does not match object list stored in metadata')
             raise exception.InvalidBackup(reason=err)
 
-        for metadata_object in metadata_objects:
-            object_name = metadata_object.keys()[0]
-            LOG.debug('restoring object from swift. backup: %(backup_id)s, '
-                      'container: %(container)s, swift object name: '
-                      '%(object_name)s, volume: %(volume_id)s' %
-                      {
-                          'backup_id': backup_id,
-                          'container': container,
-                          'object_name': object_name,
-                          'volume_id': volume_id,
-                      })
-            try:
-                (resp, body) = self.conn.get_object(container, object_name)
-            except socket.error as err:
-                raise exception.SwiftConnectionFailed(reason=err)
-            compression_algorithm = metadata_object[object_name]['compression']
-            decompressor = self._get_compressor(compression_algorithm)
-            if decompressor is not None:
-                LOG.debug('decompressing data using %s algorithm' %
-                          compression_algorithm)
-                decompressed = decompressor.decompress(body)
-                volume_file.write(decompressed)
-            else:
-                volume_file.write(body)
+        # Be tolerant to IO implementations that do not support fileno()
+        try:
+            fileno = volume_file.fileno()
+        except IOError:
+            LOG.info(_LI("volume_file does not support "
+                         "fileno() so skipping"
+                         "fsync()"))
+            fileno = None
+
+        # Objects are fetched and decompressed by up to
+        # backup_swift_object_concurrency worker greenthreads ahead of the
+        # writer, but are always written to the volume in metadata order,
+        # in native threads.
+        pending = collections.deque()
+        writer = fileio.WriteBehind()
+        try:
+            for metadata_object in metadata_objects:
+                object_info = metadata_object.values()[0]
+                if object_info.get('hole'):
+                    thread = None
+                else:
+                    thread = eventlet.spawn(self._get_chunk, backup,
+                                            volume_id, metadata_object)
+                pending.append((object_info, thread))
+                while len(pending) >= self.concurrency:
+                    self._restore_chunk(volume_file, fileno, writer,
+                                        *pending.popleft())
+            while pending:
+                self._restore_chunk(volume_file, fileno, writer,
+                                    *pending.popleft())
+            writer.wait()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                writer.close()
+                for object_info, thread in pending:
+                    if thread is not None:
+                        thread.kill()
+        LOG.debug('v1 swift volume backup restore of %s finished',
+                  backup_id)
 
-            # force flush every write to avoid long blocking write on close
-            volume_file.flush()
+    def _get_chunk(self, backup, volume_id, metadata_object):
+        """Download and decompress a single backup object."""
+        container = backup['container']
+        object_name = metadata_object.keys()[0]
+        LOG.debug('restoring object from swift. backup: %(backup_id)s, '
+                  'container: %(container)s, swift object name: '
+                  '%(object_name)s, volume: %(volume_id)s' %
+                  {
+                      'backup_id': backup['id'],
+                      'container': container,
+                      'object_name': object_name,
+                      'volume_id': volume_id,
+                  })
+        try:
+            with self.conn_pool.item() as conn:
+                (resp, body) = conn.get_object(container, object_name)
+        except socket.error as err:
+            raise exception.SwiftConnectionFailed(reason=err)
+        compression_algorithm = metadata_object[object_name]['compression']
+        decompressor = self._get_compressor(compression_algorithm)
+        if decompressor is not None:
+            LOG.debug('decompressing data using %s algorithm' %
+                      compression_algorithm)
+            return tpool.execute(decompressor.decompress, body)
+        return body
+
+    def _restore_chunk(self, volume_file, fileno, writer, object_info,
+                       thread):
+        """Queue the write of a restored chunk, once it is downloaded."""
+        if thread is None:
+            writer.submit(self._write_chunk, volume_file, fileno,
+                          length=object_info['length'])
+        else:
+            writer.submit(self._write_chunk, volume_file, fileno,
+                          data=thread.wait())
 
-            # Be tolerant to IO implementations that do not support fileno()
-            try:
-                fileno = volume_file.fileno()
-            except IOError:
-                LOG.info(_LI("volume_file does not support "
-                             "fileno() so skipping"
-                             "fsync()"))
+    def _write_chunk(self, volume_file, fileno, data=None, length=None):
+        """Write a chunk, or a hole of length bytes, and flush it to disk.
+
+        Called in a native thread.  Holes are punched into the volume rather
+        than written out as zeroes where the volume supports it.
+        """
+        if data is None:
+            offset = volume_file.tell()
+            if utils.punch_hole(volume_file, offset, length):
+                volume_file.seek(offset + length)
             else:
-                os.fsync(fileno)
+                volume_file.write('\0' * length)
+        else:
+            volume_file.write(data)
 
-            # Restoring a backup to a volume can take some time. Yield so other
-            # threads can run, allowing for among other things the service
-            # status to be updated
-            eventlet.sleep(0)
-        LOG.debug('v1 swift volume backup restore of %s finished',
-                  backup_id)
+        # force flush every write to avoid long blocking write on close
+        volume_file.flush()
+        if fileno is not None:
+            os.fsync(fileno)
 
     def restore(self, backup, volume_id, volume_file):
         """Restore the given volume backup from swift."""
@@ -509,6 +760,13 @@ class SwiftBackupDriver(BackupDriver):
         LOG.debug('delete started, backup: %s, container: %s, prefix: %s',
                   backup['id'], container, backup['service_metadata'])
 
+        # The children can be in other projects than their parent.
+        if self.db.backup_get_all(self.context.elevated(),
+                                  filters={'parent_id': backup['id']}):
+            err = _('delete aborted, incremental backups still reference '
+                    'the objects of backup %s') % backup['id']
+            raise exception.InvalidBackup(reason=err)
+
         if container is not None:
             swift_object_names = []
             try:
@@ -0,0 +1,173 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Volume file I/O of backup drivers.
+
+Reads, writes, flushes and fsyncs on an attached volume block the process,
+and with them every greenthread of the backup service.  The readers and
+writers below hand them to eventlet's bounded pool of native threads
+instead: a ReadAhead reads up to backup_file_io_depth chunks ahead of the
+backup consuming them, and a WriteBehind queues up to as many writes
+behind the restore producing them.
+
+The calls made in native threads run outside of the eventlet hub, and
+must not sleep or wait on greenthreads.
+"""
+
+import sys
+
+import eventlet
+from eventlet import queue
+from eventlet import tpool
+from oslo.config import cfg
+import six
+
+
+fileio_opts = [
+    cfg.IntOpt('backup_file_io_depth',
+               default=4,
+               help='Number of chunks read ahead of a backup, or written '
+                    'behind a restore, in native threads'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(fileio_opts)
+
+_DONE = object()
+
+
+def _get_depth(depth):
+    if depth is None:
+        depth = CONF.backup_file_io_depth
+    return max(1, depth)
+
+
+class ReadAhead(object):
+    """Reads a volume file chunk by chunk in native threads.
+
+    Chunks of up to chunk_size bytes are read in order, and up to length
+    bytes when length is given, ahead of the calls to read().
+    """
+
+    def __init__(self, volume_file, chunk_size, length=None, depth=None):
+        self._file = volume_file
+        self._chunk_size = chunk_size
+        self._remaining = length
+        self._queue = queue.LightQueue(_get_depth(depth))
+        self._end = None
+        self._thread = eventlet.spawn(self._run)
+
+    def _read(self, size):
+        data = self._file.read(size)
+        return data, self._file.tell()
+
+    def _run(self):
+        try:
+            while True:
+                size = self._chunk_size
+                if self._remaining is not None:
+                    size = min(size, self._remaining)
+                if size <= 0:
+                    self._queue.put(('', None, None))
+                    return
+                data, offset = tpool.execute(self._read, size)
+                self._queue.put((data, offset, None))
+                if data == '':
+                    return
+                if self._remaining is not None:
+                    self._remaining -= len(data)
+        except Exception:
+            self._queue.put((None, None, sys.exc_info()))
+
+    def read(self):
+        """Return the next chunk, and the file offset right after it.
+
+        The chunk is '' once the end of the file, or length bytes, were
+        reached.  Errors of the reads are raised here.
+        """
+        if self._end is not None:
+            return self._end
+        data, offset, exc_info = self._queue.get()
+        if exc_info is not None:
+            self._end = ('', None)
+            six.reraise(*exc_info)
+        if data == '':
+            self._end = (data, offset)
+        return data, offset
+
+    def close(self):
+        """Stop reading ahead, dropping the chunks not read yet."""
+        self._thread.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class WriteBehind(object):
+    """Calls the writes of a volume file in native threads, in order.
+
+    Up to depth calls are queued behind the greenthread submitting them,
+    which can go on fetching the next chunks in the meantime.  Once a
+    call fails, the following ones are dropped and the error is raised
+    by the next call to submit() or wait().
+    """
+
+    def __init__(self, depth=None):
+        self._queue = queue.LightQueue(_get_depth(depth))
+        self._exc_info = None
+        self._thread = eventlet.spawn(self._run)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if self._exc_info is not None:
+                continue
+            func, args, kwargs = item
+            try:
+                tpool.execute(func, *args, **kwargs)
+            except Exception:
+                self._exc_info = sys.exc_info()
+
+    def _check(self):
+        if self._exc_info is not None:
+            six.reraise(*self._exc_info)
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs) to be called in a native thread."""
+        self._check()
+        self._queue.put((func, args, kwargs))
+
+    def wait(self):
+        """Wait for the queued calls to be done."""
+        if not self._thread.dead:
+            self._queue.put(_DONE)
+            self._thread.wait()
+        self._check()
+
+    def close(self):
+        """Stop writing, dropping the calls still queued."""
+        self._thread.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
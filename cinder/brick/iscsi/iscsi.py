@@ -111,38 +111,46 @@ class TgtAdm(TargetAdmin):
 
         self.iscsi_target_prefix = target_prefix
         self.volumes_dir = volumes_dir
-
-    def _get_target(self, iqn):
-        (out, err) = self._execute('tgt-admin', '--show', run_as_root=True)
-        lines = out.split('\n')
-        for line in lines:
-            if iqn in line:
+        # Index of the target table of tgtd, see _get_targets().
+        self._targets = None
+
+    def _get_targets(self, refresh=False):
+        """Return the targets exported by tgtd, by iqn.
+
+        Dumping the whole target table is expensive with many targets, so
+        it is only read the first time, or when refresh is True, and kept
+        up to date as targets are created and removed.  Each target is
+        {'tid': <tid>, 'luns': <list of LUN numbers>}.
+        """
+        if self._targets is None or refresh:
+            (out, err) = self._execute('tgtadm', '--lld', 'iscsi',
+                                       '--op', 'show', '--mode', 'target',
+                                       run_as_root=True)
+            targets = {}
+            target = None
+            for line in out.split('\n'):
                 parsed = line.split()
-                tid = parsed[1]
-                return tid[:-1]
+                if line.startswith('Target ') and len(parsed) > 2:
+                    target = {'tid': parsed[1][:-1], 'luns': []}
+                    targets[parsed[2]] = target
+                elif target is not None and parsed[:1] == ['LUN:']:
+                    target['luns'].append(parsed[1])
+            self._targets = targets
+        return self._targets
 
-        return None
+    def _get_target(self, iqn):
+        target = self._get_targets().get(iqn)
+        if target is None:
+            # It may have been created since the table was read.
+            target = self._get_targets(refresh=True).get(iqn)
+        if target is None:
+            return None
+        return target['tid']
 
     def _verify_backing_lun(self, iqn, tid):
-        backing_lun = True
-        capture = False
-        target_info = []
-
-        (out, err) = self._execute('tgt-admin', '--show', run_as_root=True)
-        lines = out.split('\n')
-
-        for line in lines:
-            if iqn in line and "Target %s" % tid in line:
-                capture = True
-            if capture:
-                target_info.append(line)
-            if iqn not in line and 'Target ' in line:
-                capture = False
-
-        if '        LUN: 1' not in target_info:
-            backing_lun = False
-
-        return backing_lun
+        target = self._get_targets().get(iqn)
+        return (target is not None and target['tid'] == tid and
+                '1' in target['luns'])
 
     def _recreate_backing_lun(self, iqn, tid, name, path):
         LOG.warning(_LW('Attempting recreate of backing lun...'))
@@ -187,6 +195,40 @@ class TgtAdm(TargetAdmin):
         LOG.debug('Failed to find CHAP auth from config for %s' % vol_id)
         return None
 
+    def _get_volume_conf(self, name, path, chap_auth, write_cache):
+        if chap_auth is None:
+            return self.VOLUME_CONF % (name, path, write_cache)
+        chap_str = re.sub('^IncomingUser ', 'incominguser ', chap_auth)
+        return self.VOLUME_CONF_WITH_CHAP_AUTH % (name, path, chap_str,
+                                                  write_cache)
+
+    def _write_volume_conf(self, vol_id, volume_conf):
+        """Write the persist file of a target.
+
+        Returns its path, and whether it was changed.
+        """
+        volume_path = os.path.join(self.volumes_dir, vol_id)
+        try:
+            with open(volume_path, 'r') as f:
+                if f.read() == volume_conf:
+                    return volume_path, False
+        except IOError:
+            pass
+
+        f = open(volume_path, 'w+')
+        f.write(volume_conf)
+        f.close()
+        LOG.debug('Created volume path %(vp)s,\n'
+                  'content: %(vc)s'
+                  % {'vp': volume_path, 'vc': volume_conf})
+        return volume_path, True
+
+    def _is_target_exported(self, name, vol_id):
+        iqn = '%s%s' % (self.iscsi_target_prefix, vol_id)
+        target = self._get_targets().get(iqn)
+        return (target is not None and
+                self._verify_backing_lun(iqn, target['tid']))
+
     def create_iscsi_target(self, name, tid, lun, path,
                             chap_auth=None, **kwargs):
         # Note(jdg) tid and lun aren't used by TgtAdm but remain for
@@ -195,30 +237,19 @@ class TgtAdm(TargetAdmin):
         fileutils.ensure_tree(self.volumes_dir)
 
         vol_id = name.split(':')[1]
-        write_cache = kwargs.get('write_cache', 'on')
-        if chap_auth is None:
-            volume_conf = self.VOLUME_CONF % (name, path, write_cache)
-        else:
-            chap_str = re.sub('^IncomingUser ', 'incominguser ', chap_auth)
-            volume_conf = self.VOLUME_CONF_WITH_CHAP_AUTH % (name,
-                                                             path, chap_str,
-                                                             write_cache)
+        volume_conf = self._get_volume_conf(name, path, chap_auth,
+                                            kwargs.get('write_cache', 'on'))
 
         LOG.info(_LI('Creating iscsi_target for: %s') % vol_id)
-        volumes_dir = self.volumes_dir
-        volume_path = os.path.join(volumes_dir, vol_id)
-
-        f = open(volume_path, 'w+')
-        f.write(volume_conf)
-        f.close()
-        LOG.debug('Created volume path %(vp)s,\n'
-                  'content: %(vc)s'
-                  % {'vp': volume_path, 'vc': volume_conf})
+        volume_path, changed = self._write_volume_conf(vol_id, volume_conf)
 
-        old_persist_file = None
         old_name = kwargs.get('old_name', None)
-        if old_name is not None:
-            old_persist_file = os.path.join(volumes_dir, old_name)
+        if (not changed and old_name is None and
+                self._is_target_exported(name, vol_id)):
+            # Already exported as configured, e.g. by ensure_export.
+            LOG.debug('Target %s is already exported.' % name)
+            return self._get_target('%s%s' % (self.iscsi_target_prefix,
+                                              vol_id))
 
         try:
             # with the persistent tgts we create them
@@ -229,19 +260,6 @@ class TgtAdm(TargetAdmin):
                                        run_as_root=True)
             LOG.debug("StdOut from tgt-admin --update: %s", out)
             LOG.debug("StdErr from tgt-admin --update: %s", err)
-
-            # Grab targets list for debug
-            # Consider adding a check for lun 0 and 1 for tgtadm
-            # before considering this as valid
-            (out, err) = self._execute('tgtadm',
-                                       '--lld',
-                                       'iscsi',
-                                       '--op',
-                                       'show',
-                                       '--mode',
-                                       'target',
-                                       run_as_root=True)
-            LOG.debug("Targets after update: %s" % out)
         except putils.ProcessExecutionError as e:
             LOG.warning(_LW("Failed to create iscsi target for volume "
                             "id:%(vol_id)s: %(e)s")
@@ -251,6 +269,70 @@ class TgtAdm(TargetAdmin):
             os.unlink(volume_path)
             raise exception.ISCSITargetCreateFailed(volume_id=vol_id)
 
+        self._get_targets(refresh=True)
+        return self._check_created_target(name, path, vol_id, old_name)
+
+    def create_iscsi_targets(self, targets):
+        """Create several iSCSI targets with a single update of tgtd.
+
+        The target table is read once, the persist files of the targets
+        are written and all the targets that are not exported as configured
+        are updated at once, before the table is read again to check them.
+
+        :param targets: list of dicts of the arguments of
+                        create_iscsi_target() for each target.
+        :returns: list of the tids of the targets, or of the exceptions
+                  raised when they failed to be created, in the same order.
+        """
+        fileutils.ensure_tree(self.volumes_dir)
+
+        results = [None] * len(targets)
+        pending = []
+        for index, target in enumerate(targets):
+            name = target['name']
+            vol_id = name.split(':')[1]
+            volume_conf = self._get_volume_conf(
+                name, target['path'], target.get('chap_auth'),
+                target.get('write_cache', 'on'))
+            volume_path, changed = self._write_volume_conf(vol_id,
+                                                           volume_conf)
+            if (not changed and target.get('old_name') is None and
+                    self._is_target_exported(name, vol_id)):
+                results[index] = self._get_target(
+                    '%s%s' % (self.iscsi_target_prefix, vol_id))
+            else:
+                pending.append((index, target, vol_id, volume_path))
+
+        if not pending:
+            return results
+
+        LOG.info(_LI('Creating %d iscsi targets.') % len(pending))
+        try:
+            (out, err) = self._execute('tgt-admin', '--update', 'ALL',
+                                       run_as_root=True)
+            LOG.debug("StdOut from tgt-admin --update: %s", out)
+            LOG.debug("StdErr from tgt-admin --update: %s", err)
+        except putils.ProcessExecutionError as e:
+            # Some targets may have been updated anyway, they are checked
+            # in the table below.
+            LOG.warning(_LW("Failed to update iscsi targets: %s") % e)
+
+        self._get_targets(refresh=True)
+        for index, target, vol_id, volume_path in pending:
+            try:
+                results[index] = self._check_created_target(
+                    target['name'], target['path'], vol_id,
+                    target.get('old_name'))
+            except Exception as e:
+                if os.path.exists(volume_path):
+                    os.unlink(volume_path)
+                results[index] = e
+        return results
+
+    def _check_created_target(self, name, path, vol_id, old_name=None):
+        """Check a target just created, from the refreshed table."""
+        volumes_dir = self.volumes_dir
+        volume_path = os.path.join(volumes_dir, vol_id)
         iqn = '%s%s' % (self.iscsi_target_prefix, vol_id)
         tid = self._get_target(iqn)
         if tid is None:
@@ -273,12 +355,15 @@ class TgtAdm(TargetAdmin):
                 raise exception.ISCSITargetCreateFailed(volume_id=vol_id)
 
             # Finally check once more and if no go, fail and punt
+            self._get_targets(refresh=True)
             if not self._verify_backing_lun(iqn, tid):
                 os.unlink(volume_path)
                 raise exception.ISCSITargetCreateFailed(volume_id=vol_id)
 
-        if old_persist_file is not None and os.path.exists(old_persist_file):
-            os.unlink(old_persist_file)
+        if old_name is not None:
+            old_persist_file = os.path.join(volumes_dir, old_name)
+            if os.path.exists(old_persist_file):
+                os.unlink(old_persist_file)
 
         return tid
 
@@ -310,6 +395,8 @@ class TgtAdm(TargetAdmin):
                           "id:%(vol_id)s: %(e)s")
                       % {'vol_id': vol_id, 'e': e})
             raise exception.ISCSITargetRemoveFailed(volume_id=vol_id)
+        if self._targets is not None:
+            self._targets.pop(iqn, None)
 
         # NOTE(jdg): There's a bug in some versions of tgt that
         # will sometimes fail silently when using the force flag
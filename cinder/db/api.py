@@ -185,6 +185,11 @@ def volume_data_get_for_host(context, host, count_only=False):
                                          count_only)
 
 
+def volume_data_get_for_hosts(context, hosts, count_only=False):
+    """Get {host: (volume_count, gigabytes)} for hosts in a single query."""
+    return IMPL.volume_data_get_for_hosts(context, hosts, count_only)
+
+
 def volume_data_get_for_project(context, project_id):
     """Get (volume_count, gigabytes) for project."""
     return IMPL.volume_data_get_for_project(context, project_id)
@@ -211,10 +216,10 @@ def volume_get(context, volume_id):
 
 
 def volume_get_all(context, marker, limit, sort_key, sort_dir,
-                   filters=None):
-    """Get all volumes."""
+                   filters=None, fields=None):
+    """Get all volumes, or only the given fields of them."""
     return IMPL.volume_get_all(context, marker, limit, sort_key, sort_dir,
-                               filters=filters)
+                               filters=filters, fields=fields)
 
 
 def volume_get_all_by_host(context, host):
@@ -228,10 +233,18 @@ def volume_get_all_by_group(context, group_id):
 
 
 def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
-                              sort_dir, filters=None):
-    """Get all volumes belonging to a project."""
+                              sort_dir, filters=None, fields=None):
+    """Get all volumes belonging to a project, or only the given fields."""
     return IMPL.volume_get_all_by_project(context, project_id, marker, limit,
-                                          sort_key, sort_dir, filters=filters)
+                                          sort_key, sort_dir, filters=filters,
+                                          fields=fields)
+
+
+def volume_get_hosts_by_project(context, project_id, volume_ids,
+                                no_migration_targets=False):
+    """Get {volume_id: host} of volumes of a project in a single query."""
+    return IMPL.volume_get_hosts_by_project(context, project_id, volume_ids,
+                                            no_migration_targets)
 
 
 def volume_get_iscsi_target_num(context, volume_id):
@@ -248,6 +261,14 @@ def volume_update(context, volume_id, values):
     return IMPL.volume_update(context, volume_id, values)
 
 
+def volume_update_all(context, volume_ids, values):
+    """Set the given column values on several volumes at once.
+
+    Returns the number of volumes updated.
+    """
+    return IMPL.volume_update_all(context, volume_ids, values)
+
+
 ####################
 
 
@@ -266,14 +287,22 @@ def snapshot_get(context, snapshot_id):
     return IMPL.snapshot_get(context, snapshot_id)
 
 
-def snapshot_get_all(context):
+def snapshot_get_all(context, filters=None, marker=None, limit=None,
+                     sort_key=None, sort_dir=None):
     """Get all snapshots."""
-    return IMPL.snapshot_get_all(context)
+    return IMPL.snapshot_get_all(context, filters=filters, marker=marker,
+                                 limit=limit, sort_key=sort_key,
+                                 sort_dir=sort_dir)
 
 
-def snapshot_get_all_by_project(context, project_id):
+def snapshot_get_all_by_project(context, project_id, filters=None,
+                                marker=None, limit=None, sort_key=None,
+                                sort_dir=None):
     """Get all snapshots belonging to a project."""
-    return IMPL.snapshot_get_all_by_project(context, project_id)
+    return IMPL.snapshot_get_all_by_project(context, project_id,
+                                            filters=filters, marker=marker,
+                                            limit=limit, sort_key=sort_key,
+                                            sort_dir=sort_dir)
 
 
 def snapshot_get_all_for_cgsnapshot(context, project_id):
@@ -379,6 +408,11 @@ def volume_type_get_all(context, inactive=False):
     return IMPL.volume_type_get_all(context, inactive)
 
 
+def volume_type_get_all_version(context):
+    """Get a value changing whenever volume types are created or destroyed."""
+    return IMPL.volume_type_get_all_version(context)
+
+
 def volume_type_get(context, id, inactive=False):
     """Get volume type by id."""
     return IMPL.volume_type_get(context, id, inactive)
@@ -562,9 +596,9 @@ def volume_glance_metadata_create(context, volume_id, key, value):
                                               value)
 
 
-def volume_glance_metadata_get_all(context):
-    """Return the glance metadata for all volumes."""
-    return IMPL.volume_glance_metadata_get_all(context)
+def volume_glance_metadata_get_all(context, volume_ids=None):
+    """Return the glance metadata for all volumes, or only for volume_ids."""
+    return IMPL.volume_glance_metadata_get_all(context, volume_ids=volume_ids)
 
 
 def volume_glance_metadata_get(context, volume_id):
@@ -724,6 +758,32 @@ def reservation_rollback(context, reservations, project_id=None):
                                      project_id=project_id)
 
 
+def quota_reserve_atomic(context, resources, quotas, deltas, expire,
+                         until_refresh, project_id=None):
+    """Check quotas and create reservations, without locking the usages."""
+    return IMPL.quota_reserve_atomic(context, resources, quotas, deltas,
+                                     expire, until_refresh,
+                                     project_id=project_id)
+
+
+def reservation_commit_atomic(context, reservations, project_id=None):
+    """Commit quota reservations, without locking the usages."""
+    return IMPL.reservation_commit_atomic(context, reservations,
+                                          project_id=project_id)
+
+
+def reservation_rollback_atomic(context, reservations, project_id=None):
+    """Roll back quota reservations, without locking the usages."""
+    return IMPL.reservation_rollback_atomic(context, reservations,
+                                            project_id=project_id)
+
+
+def quota_usage_reconcile(context, resources, until_refresh, max_age):
+    """Recount the quota usages which need it."""
+    return IMPL.quota_usage_reconcile(context, resources, until_refresh,
+                                      max_age)
+
+
 def quota_destroy_all_by_project(context, project_id):
     """Destroy all quotas associated with a given project."""
     return IMPL.quota_destroy_all_by_project(context, project_id)
@@ -742,9 +802,12 @@ def backup_get(context, backup_id):
     return IMPL.backup_get(context, backup_id)
 
 
-def backup_get_all(context, filters=None):
+def backup_get_all(context, filters=None, marker=None, limit=None,
+                   sort_key=None, sort_dir=None):
     """Get all backups."""
-    return IMPL.backup_get_all(context, filters=filters)
+    return IMPL.backup_get_all(context, filters=filters, marker=marker,
+                               limit=limit, sort_key=sort_key,
+                               sort_dir=sort_dir)
 
 
 def backup_get_all_by_host(context, host):
@@ -757,10 +820,13 @@ def backup_create(context, values):
     return IMPL.backup_create(context, values)
 
 
-def backup_get_all_by_project(context, project_id, filters=None):
+def backup_get_all_by_project(context, project_id, filters=None, marker=None,
+                              limit=None, sort_key=None, sort_dir=None):
     """Get all backups belonging to a project."""
     return IMPL.backup_get_all_by_project(context, project_id,
-                                          filters=filters)
+                                          filters=filters, marker=marker,
+                                          limit=limit, sort_key=sort_key,
+                                          sort_dir=sort_dir)
 
 
 def backup_update(context, backup_id, values):
@@ -19,6 +19,7 @@
 """Implementation of SQLAlchemy backend."""
 
 
+import datetime
 import functools
 import sys
 import threading
@@ -33,7 +34,7 @@ from oslo.db.sqlalchemy import session as db_session
 import osprofiler.sqlalchemy
 import sqlalchemy
 from sqlalchemy import or_
-from sqlalchemy.orm import joinedload, joinedload_all
+from sqlalchemy.orm import joinedload, joinedload_all, subqueryload
 from sqlalchemy.orm import RelationshipProperty
 from sqlalchemy.sql.expression import literal_column
 from sqlalchemy.sql import func
@@ -760,6 +761,43 @@ def _get_quota_usages(context, session, project_id):
     return dict((row.resource, row) for row in rows)
 
 
+def _sync_quota_usages(elevated, session, project_id, usages, resource,
+                       until_refresh):
+    """Recount the usage of a resource with its sync routine.
+
+    The usages recounted by the sync routine are updated in usages, and
+    created if missing.  Returns the names of their resources.
+    """
+    # Grab the sync routine
+    sync = QUOTA_SYNC_FUNCTIONS[resource.sync]
+    volume_type_id = getattr(resource, 'volume_type_id', None)
+    volume_type_name = getattr(resource, 'volume_type_name', None)
+    updates = sync(elevated, project_id,
+                   volume_type_id=volume_type_id,
+                   volume_type_name=volume_type_name,
+                   session=session)
+    for res, in_use in updates.items():
+        # Make sure we have a destination for the usage!
+        if res not in usages:
+            usages[res] = _quota_usage_create(elevated,
+                                              project_id,
+                                              res,
+                                              0, 0,
+                                              until_refresh or None,
+                                              session=session)
+
+        # Update the usage
+        usages[res].in_use = in_use
+        usages[res].until_refresh = until_refresh or None
+
+    # NOTE(Vek): We make the assumption that the sync
+    #            routine actually refreshes the
+    #            resources that it is the sync routine
+    #            for.  We don't check, because this is
+    #            a best-effort mechanism.
+    return set(updates)
+
+
 @require_context
 @_retry_on_deadlock
 def quota_reserve(context, resources, quotas, deltas, expire,
@@ -803,43 +841,13 @@ def quota_reserve(context, resources, quotas, deltas, expire,
 
             # OK, refresh the usage
             if refresh:
-                # Grab the sync routine
-                sync = QUOTA_SYNC_FUNCTIONS[resources[resource].sync]
-                volume_type_id = getattr(resources[resource],
-                                         'volume_type_id', None)
-                volume_type_name = getattr(resources[resource],
-                                           'volume_type_name', None)
-                updates = sync(elevated, project_id,
-                               volume_type_id=volume_type_id,
-                               volume_type_name=volume_type_name,
-                               session=session)
-                for res, in_use in updates.items():
-                    # Make sure we have a destination for the usage!
-                    if res not in usages:
-                        usages[res] = _quota_usage_create(
-                            elevated,
-                            project_id,
-                            res,
-                            0, 0,
-                            until_refresh or None,
-                            session=session
-                        )
-
-                    # Update the usage
-                    usages[res].in_use = in_use
-                    usages[res].until_refresh = until_refresh or None
-
-                    # Because more than one resource may be refreshed
-                    # by the call to the sync routine, and we don't
-                    # want to double-sync, we make sure all refreshed
-                    # resources are dropped from the work set.
-                    work.discard(res)
-
-                    # NOTE(Vek): We make the assumption that the sync
-                    #            routine actually refreshes the
-                    #            resources that it is the sync routine
-                    #            for.  We don't check, because this is
-                    #            a best-effort mechanism.
+                # Because more than one resource may be refreshed
+                # by the call to the sync routine, and we don't
+                # want to double-sync, we make sure all refreshed
+                # resources are dropped from the work set.
+                work -= _sync_quota_usages(elevated, session, project_id,
+                                           usages, resources[resource],
+                                           until_refresh)
 
         # Check for deltas that would go negative
         unders = [r for r, delta in deltas.items()
@@ -943,6 +951,214 @@ def reservation_rollback(context, reservations, project_id=None):
             reservation.delete(session=session)
 
 
+# NOTE: The *_atomic quota functions below don't lock the usages for the
+# whole transaction.  Each usage is changed with a single UPDATE, that is
+# made conditional when it must not exceed the quota, and usages are
+# always updated in the same order to avoid deadlocks.  Usages are only
+# recounted when missing; quota_usage_reconcile recounts the others.
+
+def _get_quota_usages_unlocked(context, session, project_id):
+    rows = model_query(context, models.QuotaUsage,
+                       read_deleted="no",
+                       session=session).\
+        filter_by(project_id=project_id).\
+        all()
+    return dict((row.resource, row) for row in rows)
+
+
+def _quota_usages_create_synced(context, project_id, resources,
+                                resource_names, until_refresh):
+    """Create the missing usages of resources, with their current counts."""
+    elevated = context.elevated()
+    session = get_session()
+    with session.begin():
+        usages = _get_quota_usages(context, session, project_id)
+        work = set(resource_names) - set(usages)
+        while work:
+            resource = work.pop()
+            work -= _sync_quota_usages(elevated, session, project_id,
+                                       usages, resources[resource],
+                                       until_refresh)
+
+
+@require_context
+@_retry_on_deadlock
+def quota_reserve_atomic(context, resources, quotas, deltas, expire,
+                         until_refresh, project_id=None):
+    """Reserve deltas like quota_reserve, but without locking the usages.
+
+    The reserved quantity of a usage is increased by an UPDATE that only
+    applies if the usage is then still within its quota.  The until_refresh
+    counts are decreased but the usages are not recounted here, see
+    quota_usage_reconcile.
+    """
+    elevated = context.elevated()
+    if project_id is None:
+        project_id = context.project_id
+
+    usages = _get_quota_usages_unlocked(context, get_session(), project_id)
+    if any(resource not in usages for resource in deltas):
+        _quota_usages_create_synced(context, project_id, resources,
+                                    deltas.keys(), until_refresh)
+        usages = _get_quota_usages_unlocked(context, get_session(),
+                                            project_id)
+
+    session = get_session()
+    with session.begin():
+        overs = []
+        for resource in sorted(deltas):
+            delta = deltas[resource]
+            usage_model = models.QuotaUsage
+            query = model_query(context, usage_model, read_deleted="no",
+                                session=session).\
+                filter_by(id=usages[resource].id)
+            # The count stops at 0, and stays NULL when not counting.
+            values = {'until_refresh': sqlalchemy.case(
+                [(usage_model.until_refresh > 0,
+                  usage_model.until_refresh - 1)],
+                else_=usage_model.until_refresh)}
+            # NOTE(Vek): We're only concerned about positive increments.
+            #            If a project has gone over quota, we want them to
+            #            be able to reduce their usage without any
+            #            problems.
+            if delta >= 0:
+                values['reserved'] = usage_model.reserved + delta
+                if quotas[resource] >= 0:
+                    query = query.filter(usage_model.in_use +
+                                         usage_model.reserved + delta <=
+                                         quotas[resource])
+            if not query.update(values, synchronize_session=False):
+                overs.append(resource)
+
+        if overs:
+            # Raising discards the updates of the other usages, the usages
+            # are the ones read before them.
+            usages = dict((k, dict(in_use=v['in_use'],
+                                   reserved=v['reserved']))
+                          for k, v in usages.items())
+            raise exception.OverQuota(overs=sorted(overs), quotas=quotas,
+                                      usages=usages)
+
+        reservations = []
+        for resource, delta in deltas.items():
+            reservation = _reservation_create(elevated,
+                                              str(uuid.uuid4()),
+                                              usages[resource],
+                                              project_id,
+                                              resource, delta, expire,
+                                              session=session)
+            reservations.append(reservation.uuid)
+
+    unders = [r for r, delta in deltas.items()
+              if delta < 0 and delta + usages[r].in_use < 0]
+    if unders:
+        LOG.warning(_("Change will make usage less than 0 for the following "
+                      "resources: %s") % unders)
+
+    return reservations
+
+
+def _apply_reservations_atomic(context, reservations, commit):
+    session = get_session()
+    with session.begin():
+        rows = model_query(context, models.Reservation,
+                           read_deleted="no",
+                           session=session).\
+            filter(models.Reservation.uuid.in_(reservations)).\
+            order_by(models.Reservation.usage_id).\
+            all()
+
+        for reservation in rows:
+            # Only the caller that deletes the reservation applies it.
+            deleted = model_query(context, models.Reservation,
+                                  read_deleted="no",
+                                  session=session).\
+                filter_by(id=reservation.id).\
+                update({'deleted': True,
+                        'deleted_at': timeutils.utcnow(),
+                        'updated_at': literal_column('updated_at')},
+                       synchronize_session=False)
+            if not deleted:
+                continue
+
+            usage_model = models.QuotaUsage
+            values = {}
+            if reservation.delta >= 0:
+                values['reserved'] = usage_model.reserved - reservation.delta
+            if commit:
+                values['in_use'] = usage_model.in_use + reservation.delta
+            if values:
+                model_query(context, usage_model, read_deleted="no",
+                            session=session).\
+                    filter_by(id=reservation.usage_id).\
+                    update(values, synchronize_session=False)
+
+
+@require_context
+@_retry_on_deadlock
+def reservation_commit_atomic(context, reservations, project_id=None):
+    """Commit reservations like reservation_commit, without locking."""
+    _apply_reservations_atomic(context, reservations, commit=True)
+
+
+@require_context
+@_retry_on_deadlock
+def reservation_rollback_atomic(context, reservations, project_id=None):
+    """Roll back reservations like reservation_rollback, without locking."""
+    _apply_reservations_atomic(context, reservations, commit=False)
+
+
+@require_admin_context
+def quota_usage_reconcile(context, resources, until_refresh, max_age):
+    """Recount the usages which need it, out of any reservation.
+
+    Those are the negative usages, the ones whose until_refresh count ran
+    out and, if max_age is set, the ones not updated for max_age seconds.
+    Each project's usages are recounted in their own transaction, with its
+    usages locked.
+
+    :returns: the number of recounted usages
+    """
+    usage_model = models.QuotaUsage
+    conditions = [usage_model.in_use < 0, usage_model.until_refresh <= 0]
+    if max_age:
+        stale = timeutils.utcnow() - datetime.timedelta(seconds=max_age)
+        conditions.append(usage_model.updated_at < stale)
+    rows = model_query(context, usage_model.project_id, usage_model.resource,
+                       read_deleted="no").\
+        filter(usage_model.resource.in_(resources.keys())).\
+        filter(or_(*conditions)).\
+        all()
+
+    by_project = {}
+    for project_id, resource in rows:
+        by_project.setdefault(project_id, set()).add(resource)
+
+    count = 0
+    for project_id, work in by_project.iteritems():
+        count += _quota_usages_reconcile(context, project_id, resources,
+                                         work, until_refresh)
+    return count
+
+
+@_retry_on_deadlock
+def _quota_usages_reconcile(context, project_id, resources, work,
+                            until_refresh):
+    work = set(work)
+    count = 0
+    session = get_session()
+    with session.begin():
+        usages = _get_quota_usages(context, session, project_id)
+        while work:
+            resource = work.pop()
+            refreshed = _sync_quota_usages(context, session, project_id,
+                                           usages, resources[resource],
+                                           until_refresh)
+            work -= refreshed
+            count += len(refreshed)
+    return count
+
+
 @require_admin_context
 @_retry_on_deadlock
 def quota_destroy_all_by_project(context, project_id):
@@ -1078,6 +1294,28 @@ def volume_data_get_for_host(context, host, count_only=False):
         return (result[0] or 0, result[1] or 0)
 
 
+@require_admin_context
+def volume_data_get_for_hosts(context, hosts, count_only=False):
+    hosts = list(hosts)
+    if not hosts:
+        return {}
+    columns = [models.Volume.host, func.count(models.Volume.id)]
+    if not count_only:
+        columns.append(func.sum(models.Volume.size))
+    rows = model_query(context, *columns, read_deleted="no").\
+        filter(models.Volume.host.in_(hosts)).\
+        group_by(models.Volume.host).\
+        all()
+    if count_only:
+        result = dict.fromkeys(hosts, 0)
+        result.update((row[0], row[1]) for row in rows)
+    else:
+        result = dict.fromkeys(hosts, (0, 0))
+        # NOTE(vish): convert None to 0
+        result.update((row[0], (row[1], row[2] or 0)) for row in rows)
+    return result
+
+
 @require_admin_context
 def _volume_data_get_for_project(context, project_id, volume_type_id=None,
                                  session=None):
@@ -1194,20 +1432,34 @@ def volume_detached(context, volume_id):
 
 
 @require_context
-def _volume_get_query(context, session=None, project_only=False):
+def _volume_get_query(context, session=None, project_only=False,
+                      load=joinedload, fields=None):
+    """Query volumes along with their related rows.
+
+    :param load: loader strategy of the related rows, joinedload or, for
+                 lists of volumes, subqueryload to fetch them in one
+                 batched select per relationship rather than a join
+    :param fields: names of the only columns to query, no related rows are
+                   loaded then
+    """
+    if fields:
+        return model_query(context,
+                           *[getattr(models.Volume, field)
+                             for field in fields],
+                           session=session, project_only=project_only)
     if is_admin_context(context):
         return model_query(context, models.Volume, session=session,
                            project_only=project_only).\
-            options(joinedload('volume_metadata')).\
-            options(joinedload('volume_admin_metadata')).\
-            options(joinedload('volume_type')).\
-            options(joinedload('consistencygroup'))
+            options(load('volume_metadata')).\
+            options(load('volume_admin_metadata')).\
+            options(load('volume_type')).\
+            options(load('consistencygroup'))
     else:
         return model_query(context, models.Volume, session=session,
                            project_only=project_only).\
-            options(joinedload('volume_metadata')).\
-            options(joinedload('volume_type')).\
-            options(joinedload('consistencygroup'))
+            options(load('volume_metadata')).\
+            options(load('volume_type')).\
+            options(load('consistencygroup'))
 
 
 @require_context
@@ -1229,7 +1481,7 @@ def volume_get(context, volume_id):
 
 @require_admin_context
 def volume_get_all(context, marker, limit, sort_key, sort_dir,
-                   filters=None):
+                   filters=None, fields=None):
     """Retrieves all volumes.
 
     :param context: context to query under
@@ -1242,17 +1494,19 @@ def volume_get_all(context, marker, limit, sort_key, sort_dir,
                     'no_migration_targets'=True causes volumes with either
                     a NULL 'migration_status' or a 'migration_status' that
                     does not start with 'target:' to be retrieved.
+    :param fields: names of the only columns to load, see
+                   _generate_paginate_query
     :returns: list of matching volumes
     """
     session = get_session()
     with session.begin():
         # Generate the query
         query = _generate_paginate_query(context, session, marker, limit,
-                                         sort_key, sort_dir, filters)
+                                         sort_key, sort_dir, filters, fields)
         # No volumes would match, return empty list
         if query is None:
             return []
-        return query.all()
+        return _volume_list(query, fields)
 
 
 @require_admin_context
@@ -1284,7 +1538,7 @@ def volume_get_all_by_group(context, group_id):
 
 @require_context
 def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
-                              sort_dir, filters=None):
+                              sort_dir, filters=None, fields=None):
     """"Retrieves all volumes in a project.
 
     :param context: context to query under
@@ -1298,6 +1552,8 @@ def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
                     'no_migration_targets'=True causes volumes with either
                     a NULL 'migration_status' or a 'migration_status' that
                     does not start with 'target:' to be retrieved.
+    :param fields: names of the only columns to load, see
+                   _generate_paginate_query
     :returns: list of matching volumes
     """
     session = get_session()
@@ -1308,15 +1564,49 @@ def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
         filters['project_id'] = project_id
         # Generate the query
         query = _generate_paginate_query(context, session, marker, limit,
-                                         sort_key, sort_dir, filters)
+                                         sort_key, sort_dir, filters, fields)
         # No volumes would match, return empty list
         if query is None:
             return []
-        return query.all()
+        return _volume_list(query, fields)
+
+
+def _volume_list(query, fields):
+    if fields:
+        return [dict(zip(fields, row)) for row in query.all()]
+    return query.all()
+
+
+@require_context
+def volume_get_hosts_by_project(context, project_id, volume_ids,
+                                no_migration_targets=False):
+    """Retrieves the hosts of volumes of a project.
+
+    Only the ids and hosts of the volumes are loaded.
+
+    :param context: context to query under
+    :param project_id: project of the volumes
+    :param volume_ids: ids of the volumes
+    :param no_migration_targets: if True, leave out the volumes with a
+                                 'migration_status' starting with 'target:'
+    :returns: dict of the hosts of the volumes found, by volume id
+    """
+    authorize_project_context(context, project_id)
+    if not volume_ids:
+        return {}
+    query = model_query(context, models.Volume.id, models.Volume.host,
+                        read_deleted="no").\
+        filter_by(project_id=project_id).\
+        filter(models.Volume.id.in_(volume_ids))
+    if no_migration_targets:
+        migration_status = models.Volume.migration_status
+        query = query.filter(or_(migration_status == None,  # noqa
+                                 migration_status.op('NOT LIKE')('target:%')))
+    return dict(query.all())
 
 
 def _generate_paginate_query(context, session, marker, limit, sort_key,
-                             sort_dir, filters):
+                             sort_dir, filters, fields=None):
     """Generate the query to include the filters and the paginate options.
 
     Returns a query with sorting / pagination criteria added or None
@@ -1333,9 +1623,14 @@ def _generate_paginate_query(context, session, marker, limit, sort_key,
                     tuples, sets, or frozensets cause an 'IN' test to
                     be performed, while exact matching ('==' operator)
                     is used for other values
+    :param fields: names of the only columns to query, the volumes are
+                   then returned as dicts of them, without related rows;
+                   otherwise the related rows of the volumes are fetched
+                   in batched selects
     :returns: updated query or None
     """
-    query = _volume_get_query(context, session=session)
+    query = _volume_get_query(context, session=session, load=subqueryload,
+                              fields=fields)
 
     if filters:
         filters = filters.copy()
@@ -1416,6 +1711,68 @@ def _generate_paginate_query(context, session, marker, limit, sort_key,
                                           sort_dir=sort_dir)
 
 
+def _generate_model_paginate_query(context, session, query, model, get,
+                                   marker, limit, sort_key, sort_dir,
+                                   filters):
+    """Add filters and paginate options to a query of model rows.
+
+    Returns the query, with sorting / pagination criteria added, or None
+    if the given filters will not yield any results.  The rows are always
+    sorted, so that the pages sliced from them are stable.
+
+    :param context: context to query under
+    :param session: the session to use
+    :param query: query of the model rows
+    :param model: the ORM model class
+    :param get: function getting a row of model by id, taking the context,
+                the id and the session
+    :param marker: id of the last item of the previous page; we returns the
+                   next results after it.
+    :param limit: maximum number of items to return
+    :param sort_key: single attributes by which results should be sorted,
+                     created_at by default
+    :param sort_dir: direction in which results should be sorted (asc, desc),
+                     desc by default
+    :param filters: dictionary of filters; values that are lists,
+                    tuples, sets, or frozensets cause an 'IN' test to
+                    be performed, while exact matching ('==' operator)
+                    is used for other values
+    :returns: updated query or None
+    """
+    filter_dict = {}
+    for key, value in (filters or {}).iteritems():
+        try:
+            column_attr = getattr(model, key)
+            # Do not allow relationship properties since those require
+            # schema specific knowledge
+            prop = getattr(column_attr, 'property')
+            if isinstance(prop, RelationshipProperty):
+                LOG.debug("'%s' filter key is not valid, it maps to a "
+                          "relationship.", key)
+                return None
+        except AttributeError:
+            LOG.debug("'%s' filter key is not valid.", key)
+            return None
+
+        if isinstance(value, (list, tuple, set, frozenset)):
+            query = query.filter(column_attr.in_(value))
+        else:
+            filter_dict[key] = value
+
+    if filter_dict:
+        query = query.filter_by(**filter_dict)
+
+    marker_row = None
+    if marker is not None:
+        marker_row = get(context, marker, session=session)
+
+    return sqlalchemyutils.paginate_query(query, model, limit,
+                                          [sort_key or 'created_at',
+                                           'created_at', 'id'],
+                                          marker=marker_row,
+                                          sort_dir=sort_dir or 'desc')
+
+
 @require_admin_context
 def volume_get_iscsi_target_num(context, volume_id):
     result = model_query(context, models.IscsiTarget, read_deleted="yes").\
@@ -1454,6 +1811,18 @@ def volume_update(context, volume_id, values):
         return volume_ref
 
 
+@require_admin_context
+def volume_update_all(context, volume_ids, values):
+    if not volume_ids:
+        return 0
+    session = get_session()
+    with session.begin():
+        return model_query(context, models.Volume, session=session,
+                           read_deleted="no").\
+            filter(models.Volume.id.in_(volume_ids)).\
+            update(values, synchronize_session=False)
+
+
 ####################
 
 def _volume_x_metadata_get_query(context, volume_id, model, session=None):
@@ -1693,11 +2062,31 @@ def snapshot_get(context, snapshot_id):
     return _snapshot_get(context, snapshot_id)
 
 
+def _snapshot_get_all(context, filters=None, marker=None, limit=None,
+                      sort_key=None, sort_dir=None):
+    session = get_session()
+    with session.begin():
+        query = model_query(context, models.Snapshot, session=session).\
+            options(joinedload('snapshot_metadata'))
+        query = _generate_model_paginate_query(
+            context, session, query, models.Snapshot, _snapshot_get,
+            marker, limit, sort_key, sort_dir, filters)
+        # No snapshots would match, return empty list
+        if query is None:
+            return []
+        return query.all()
+
+
 @require_admin_context
-def snapshot_get_all(context):
-    return model_query(context, models.Snapshot).\
-        options(joinedload('snapshot_metadata')).\
-        all()
+def snapshot_get_all(context, filters=None, marker=None, limit=None,
+                     sort_key=None, sort_dir=None):
+    """Retrieves all snapshots.
+
+    The filters and paginate options are the ones of
+    _generate_model_paginate_query.
+    """
+    return _snapshot_get_all(context, filters, marker, limit, sort_key,
+                             sort_dir)
 
 
 @require_context
@@ -1720,12 +2109,20 @@ def snapshot_get_all_for_cgsnapshot(context, cgsnapshot_id):
 
 
 @require_context
-def snapshot_get_all_by_project(context, project_id):
+def snapshot_get_all_by_project(context, project_id, filters=None,
+                                marker=None, limit=None, sort_key=None,
+                                sort_dir=None):
+    """Retrieves all snapshots in a project.
+
+    The filters and paginate options are the ones of
+    _generate_model_paginate_query.
+    """
     authorize_project_context(context, project_id)
-    return model_query(context, models.Snapshot).\
-        filter_by(project_id=project_id).\
-        options(joinedload('snapshot_metadata')).\
-        all()
+    # Add in the project filter without modifying the given filters
+    filters = filters.copy() if filters else {}
+    filters['project_id'] = project_id
+    return _snapshot_get_all(context, filters, marker, limit, sort_key,
+                             sort_dir)
 
 
 @require_context
@@ -1923,6 +2320,23 @@ def volume_type_get_all(context, inactive=False, filters=None):
     return result
 
 
+@require_context
+def volume_type_get_all_version(context):
+    """Returns a value changing whenever a volume type is created or destroyed.
+
+    Volume types can't be renamed, so the counts of all the volume types and
+    of the destroyed ones, and when the last ones were created and destroyed,
+    tell whether the set of volume types changed.
+    """
+    volume_types = models.VolumeTypes
+    return tuple(model_query(context,
+                             func.count(volume_types.id),
+                             func.count(volume_types.deleted_at),
+                             func.max(volume_types.created_at),
+                             func.max(volume_types.deleted_at),
+                             read_deleted="yes").first())
+
+
 @require_context
 def _volume_type_get(context, id, session=None, inactive=False):
     read_deleted = "yes" if inactive else "no"
@@ -2541,10 +2955,13 @@ def volume_encryption_metadata_get(context, volume_id, session=None):
 
 
 @require_context
-def _volume_glance_metadata_get_all(context, session=None):
+def _volume_glance_metadata_get_all(context, volume_ids=None, session=None):
     query = model_query(context,
                         models.VolumeGlanceMetadata,
                         session=session)
+    if volume_ids is not None:
+        query = query.filter(
+            models.VolumeGlanceMetadata.volume_id.in_(volume_ids))
     if is_user_context(context):
         query = query.filter(
             models.Volume.id == models.VolumeGlanceMetadata.volume_id,
@@ -2553,10 +2970,11 @@ def _volume_glance_metadata_get_all(context, session=None):
 
 
 @require_context
-def volume_glance_metadata_get_all(context):
-    """Return the Glance metadata for all volumes."""
-
-    return _volume_glance_metadata_get_all(context)
+def volume_glance_metadata_get_all(context, volume_ids=None):
+    """Return the Glance metadata for all volumes, or only for volume_ids."""
+    if volume_ids is not None and not volume_ids:
+        return []
+    return _volume_glance_metadata_get_all(context, volume_ids)
 
 
 @require_context
@@ -2726,8 +3144,9 @@ def volume_glance_metadata_delete_by_snapshot(context, snapshot_id):
 
 
 @require_context
-def backup_get(context, backup_id):
-    result = model_query(context, models.Backup, project_only=True).\
+def _backup_get(context, backup_id, session=None):
+    result = model_query(context, models.Backup, session=session,
+                         project_only=True).\
         filter_by(id=backup_id).\
         first()
 
@@ -2737,20 +3156,31 @@ def backup_get(context, backup_id):
     return result
 
 
-def _backup_get_all(context, filters=None):
+@require_context
+def backup_get(context, backup_id):
+    return _backup_get(context, backup_id)
+
+
+def _backup_get_all(context, filters=None, marker=None, limit=None,
+                    sort_key=None, sort_dir=None):
     session = get_session()
     with session.begin():
         # Generate the query
-        query = model_query(context, models.Backup)
-        if filters:
-            query = query.filter_by(**filters)
-
+        query = model_query(context, models.Backup, session=session)
+        query = _generate_model_paginate_query(
+            context, session, query, models.Backup, _backup_get,
+            marker, limit, sort_key, sort_dir, filters)
+        # No backups would match, return empty list
+        if query is None:
+            return []
         return query.all()
 
 
 @require_admin_context
-def backup_get_all(context, filters=None):
-    return _backup_get_all(context, filters)
+def backup_get_all(context, filters=None, marker=None, limit=None,
+                   sort_key=None, sort_dir=None):
+    return _backup_get_all(context, filters, marker, limit, sort_key,
+                           sort_dir)
 
 
 @require_admin_context
@@ -2759,7 +3189,8 @@ def backup_get_all_by_host(context, host):
 
 
 @require_context
-def backup_get_all_by_project(context, project_id, filters=None):
+def backup_get_all_by_project(context, project_id, filters=None, marker=None,
+                              limit=None, sort_key=None, sort_dir=None):
 
     authorize_project_context(context, project_id)
     if not filters:
@@ -2769,7 +3200,8 @@ def backup_get_all_by_project(context, project_id, filters=None):
 
     filters['project_id'] = project_id
 
-    return _backup_get_all(context, filters)
+    return _backup_get_all(context, filters, marker, limit, sort_key,
+                           sort_dir)
 
 
 @require_context
@@ -0,0 +1,177 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Node-local cache of images fetched to create volumes.
+
+Creating many volumes from the same image would otherwise download and
+convert that image once per volume.  A volume backend keeps the images it
+fetched in an ImageCache instead, keyed by image id and checksum so that
+an image updated in Glance is fetched again, and evicts the least recently
+used ones once the cache grows over its size limit.
+"""
+
+import collections
+import contextlib
+import os
+
+from cinder.i18n import _
+from cinder.image import image_utils
+from cinder.openstack.common import fileutils
+from cinder.openstack.common import log as logging
+from cinder import utils
+
+LOG = logging.getLogger(__name__)
+
+
+class ImageCache(object):
+    """Size bounded LRU cache of images fetched from the image service.
+
+    The cache only does the bookkeeping: entries are created by
+    create_entry(context, image_service, image_id, key, size), which
+    returns the size of the new entry in bytes, and removed by
+    delete_entry(key).  size is the size in GB of the volume the image is
+    fetched for, or None.  Entries in use are never evicted.
+    """
+
+    def __init__(self, name, max_size, create_entry, delete_entry,
+                 entries=None):
+        self.name = name
+        self.max_size = max_size
+        self._create_entry = create_entry
+        self._delete_entry = delete_entry
+        # key -> size in bytes, least recently used first
+        self._entries = collections.OrderedDict(entries or [])
+        self._in_use = collections.defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def get_key(image_id, image_meta):
+        return '%s-%s' % (image_id, image_meta.get('checksum') or 'none')
+
+    def _lock_name(self, key):
+        return 'image-cache-%s-%s' % (self.name, key)
+
+    @contextlib.contextmanager
+    def get(self, context, image_service, image_id, size=None):
+        """Yield the key of the cache entry holding image_id.
+
+        The image is fetched on a miss, concurrent requests for the same
+        image waiting for that single fetch.  The entry can't be evicted
+        until the caller is done with it.
+        """
+        image_meta = image_service.show(context, image_id)
+        key = self.get_key(image_id, image_meta)
+
+        @utils.synchronized(self._lock_name(key))
+        def _get_entry():
+            if key in self._entries:
+                self.hits += 1
+                self._entries[key] = self._entries.pop(key)
+            else:
+                self.misses += 1
+                LOG.debug("Image cache %(name)s miss for image %(image_id)s."
+                          % {'name': self.name, 'image_id': image_id})
+                self._entries[key] = self._create_entry(
+                    context, image_service, image_id, key, size)
+            self._in_use[key] += 1
+
+        _get_entry()
+        try:
+            self._evict()
+            yield key
+        finally:
+            self._in_use[key] -= 1
+            if not self._in_use[key]:
+                del self._in_use[key]
+
+    def _evict(self):
+        size = sum(self._entries.values())
+        for key in list(self._entries):
+            if size <= self.max_size:
+                break
+            if self._in_use.get(key):
+                continue
+            size -= self._entries[key]
+            self._evict_entry(key)
+
+    def _evict_entry(self, key):
+        @utils.synchronized(self._lock_name(key))
+        def _evict_locked():
+            if key not in self._entries or self._in_use.get(key):
+                return
+            LOG.debug("Evicting %(key)s from image cache %(name)s." %
+                      {'key': key, 'name': self.name})
+            del self._entries[key]
+            self.evictions += 1
+            try:
+                self._delete_entry(key)
+            except Exception:
+                LOG.exception(_("Failed to remove %(key)s from image cache "
+                                "%(name)s.") % {'key': key, 'name': self.name})
+
+        _evict_locked()
+
+    def get_stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size': sum(self._entries.values()),
+                'max_size': self.max_size}
+
+
+class FileImageCache(ImageCache):
+    """ImageCache keeping images as raw files in a local directory."""
+
+    def __init__(self, name, max_size, cache_dir, blocksize):
+        self.cache_dir = cache_dir
+        self.blocksize = blocksize
+        fileutils.ensure_tree(cache_dir)
+
+        entries = []
+        for filename in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, filename)
+            if filename.endswith('.part'):
+                # Left behind by a fetch that was interrupted.
+                fileutils.delete_if_exists(path)
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, filename, stat.st_size))
+        entries = [(key, size) for _mtime, key, size in sorted(entries)]
+
+        super(FileImageCache, self).__init__(name, max_size,
+                                             self._fetch_image,
+                                             self._remove_image,
+                                             entries=entries)
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _fetch_image(self, context, image_service, image_id, key, size):
+        path = self.get_path(key)
+        tmp = path + '.part'
+        with fileutils.remove_path_on_error(tmp):
+            # The streaming raw image path writes to an existing file.
+            open(tmp, 'wb').close()
+            image_utils.fetch_to_raw(context, image_service, image_id, tmp,
+                                     self.blocksize, size=size)
+            os.rename(tmp, path)
+        return os.path.getsize(path)
+
+    def _remove_image(self, key):
+        fileutils.delete_if_exists(self.get_path(key))
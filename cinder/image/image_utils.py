@@ -25,6 +25,8 @@ we should look at maybe pushing this up to Oslo
 
 
 import contextlib
+import hashlib
+import math
 import os
 import tempfile
 
@@ -46,11 +48,39 @@ LOG = logging.getLogger(__name__)
 image_helper_opt = [cfg.StrOpt('image_conversion_dir',
                                default='$state_path/conversion',
                                help='Directory used for temporary storage '
-                                    'during image conversion'), ]
+                                    'during image conversion'),
+                    cfg.BoolOpt('image_stream_raw_to_volume',
+                                default=True,
+                                help='Write raw images downloaded from the '
+                                     'image service directly to the volume '
+                                     'instead of staging them in '
+                                     'image_conversion_dir first'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(image_helper_opt)
 
+# Size of the aligned writes issued while streaming a raw image to a volume.
+IMAGE_STREAM_BLOCK_SIZE = 4 * units.Mi
+
+# Leading bytes of the image formats qemu-img knows about, as
+# (offset, signature, format).  An image that claims to be raw but starts
+# with one of these goes through the 'qemu-img info' checks instead of
+# being streamed to the volume as is.
+IMAGE_SIGNATURES = (
+    (0, 'QFI\xfb', 'qcow2'),
+    (0, 'QED\x00', 'qed'),
+    (0, 'KDMV', 'vmdk'),
+    (0, '# Disk DescriptorFile', 'vmdk'),
+    (0, 'conectix', 'vpc'),
+    (0, 'vhdxfile', 'vhdx'),
+    (0x40, '\x7f\x10\xda\xbe', 'vdi'),
+    (0, 'LUKS\xba\xbe', 'luks'),
+    (0, 'WithoutFreeSpace', 'parallels'),
+    (0, 'WithouFreSpacExt', 'parallels'),
+    (0, 'Bochs Virtual HD Image', 'bochs'),
+    (0, '#!/bin/sh\n#V2.0 Format\n', 'cloop'),
+)
+
 
 def qemu_img_info(path, run_as_root=True):
     """Return a object containing the parsed output from qemu-img info."""
@@ -188,17 +218,167 @@ def fetch_to_raw(context, image_service,
                            run_as_root=run_as_root)
 
 
+def detect_image_format(header):
+    """Return the format whose signature header starts with, if any."""
+    for offset, signature, fmt in IMAGE_SIGNATURES:
+        if header[offset:offset + len(signature)] == signature:
+            return fmt
+    return None
+
+
+class _NotRawImage(Exception):
+    def __init__(self, fmt):
+        super(_NotRawImage, self).__init__(fmt)
+        self.fmt = fmt
+
+
+class _RawImageWriter(object):
+    """File-like object writing a raw image stream to a volume.
+
+    Data is buffered into aligned blocks of block_size bytes.  The first
+    block is checked against IMAGE_SIGNATURES before anything reaches the
+    volume, and the size and md5 checksum of the stream are tracked as it
+    goes by.
+    """
+
+    def __init__(self, volume_file, block_size=IMAGE_STREAM_BLOCK_SIZE):
+        self.volume_file = volume_file
+        self.block_size = block_size
+        self.checksum = hashlib.md5()
+        self.size = 0
+        self._buffer = []
+        self._buffered = 0
+        self._checked = False
+
+    def write(self, data):
+        if not data:
+            return
+        self.checksum.update(data)
+        self.size += len(data)
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.block_size:
+            self._flush_buffer()
+
+    def _flush_buffer(self, final=False):
+        data = ''.join(self._buffer)
+        if not self._checked:
+            fmt = detect_image_format(data)
+            if fmt is not None:
+                raise _NotRawImage(fmt)
+            self._checked = True
+        end = len(data)
+        if not final:
+            end -= end % self.block_size
+        self.volume_file.write(data[:end])
+        rest = data[end:]
+        self._buffer = [rest] if rest else []
+        self._buffered = len(rest)
+
+    def close(self):
+        self._flush_buffer(final=True)
+        self.volume_file.flush()
+        os.fsync(self.volume_file.fileno())
+
+
+@contextlib.contextmanager
+def _open_volume_for_write(path):
+    flags = os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+    if os.name == 'nt' or os.access(path, os.W_OK):
+        with contextlib.closing(os.fdopen(os.open(path, flags), 'wb')) as f:
+            yield f
+    else:
+        with utils.temporary_chown(path):
+            with contextlib.closing(os.fdopen(os.open(path, flags),
+                                              'wb')) as f:
+                yield f
+
+
+def _can_stream_image(image_meta, volume_format):
+    # NOTE: in-process writes can't be throttled by the blkio cgroup
+    # convert_image uses, so keep the qemu-img path when a limit is set.
+    return (CONF.image_stream_raw_to_volume and
+            not CONF.volume_copy_bps_limit and
+            volume_format == 'raw' and
+            image_meta is not None and
+            image_meta.get('disk_format') == 'raw' and
+            image_meta.get('container_format') in (None, 'bare') and
+            image_meta.get('size') is not None)
+
+
+def stream_raw_image_to_volume(context, image_service, image_id, image_meta,
+                               dest, size=None):
+    """Download a raw image straight onto the volume at dest.
+
+    Returns False, without having written anything, if the leading bytes
+    of the image show it is not raw after all.  The size and checksum
+    recorded in image_meta are checked once the download is complete.
+    """
+    image_size = image_meta['size']
+    if size is not None and image_size > size * units.Gi:
+        params = {'image_size': math.ceil(float(image_size) / units.Gi),
+                  'volume_size': size}
+        reason = _("Size is %(image_size)dGB and doesn't fit in a "
+                   "volume of size %(volume_size)dGB.") % params
+        raise exception.ImageUnacceptable(image_id=image_id, reason=reason)
+
+    start_time = timeutils.utcnow()
+    with _open_volume_for_write(dest) as volume_file:
+        writer = _RawImageWriter(volume_file)
+        try:
+            image_service.download(context, image_id, writer)
+            writer.close()
+        except _NotRawImage as e:
+            LOG.warn(_("Image %(image_id)s is marked as raw but looks like "
+                       "%(fmt)s, not streaming it to the volume.") %
+                     {'image_id': image_id, 'fmt': e.fmt})
+            return False
+
+    if writer.size != image_size:
+        raise exception.ImageUnacceptable(
+            image_id=image_id,
+            reason=_("Downloaded %(actual)d bytes but the image size is "
+                     "%(expected)d bytes.") %
+            {'actual': writer.size, 'expected': image_size})
+    checksum = image_meta.get('checksum')
+    if checksum and writer.checksum.hexdigest() != checksum:
+        raise exception.ImageUnacceptable(
+            image_id=image_id,
+            reason=_("Checksum of the downloaded data %(actual)s does not "
+                     "match the image checksum %(expected)s.") %
+            {'actual': writer.checksum.hexdigest(), 'expected': checksum})
+
+    duration = timeutils.delta_seconds(start_time, timeutils.utcnow())
+    if duration < 1:
+        duration = 1
+    fsz_mb = float(writer.size) / units.Mi
+    LOG.debug("Image stream details: image %(image_id)s, dest %(dest)s, "
+              "size %(sz).2f MB, duration %(duration).2f sec" %
+              {'image_id': image_id, 'dest': dest, 'sz': fsz_mb,
+               'duration': duration})
+    msg = _("Streamed %(sz).2f MB image to volume at %(mbps).2f MB/s")
+    LOG.info(msg % {'sz': fsz_mb, 'mbps': fsz_mb / duration})
+    return True
+
+
 def fetch_to_volume_format(context, image_service,
                            image_id, dest, volume_format, blocksize,
                            user_id=None, project_id=None, size=None,
                            run_as_root=True):
+    qemu_img = True
+    image_meta = image_service.show(context, image_id)
+
+    # Raw images need neither conversion nor scratch space, so they are
+    # written to the volume as they are downloaded.
+    if (_can_stream_image(image_meta, volume_format) and
+            stream_raw_image_to_volume(context, image_service, image_id,
+                                       image_meta, dest, size=size)):
+        return
+
     if (CONF.image_conversion_dir and not
             os.path.exists(CONF.image_conversion_dir)):
         os.makedirs(CONF.image_conversion_dir)
 
-    qemu_img = True
-    image_meta = image_service.show(context, image_id)
-
     # NOTE(avishay): I'm not crazy about creating temp files which may be
     # large and cause disk full errors which would confuse users.
     # Unfortunately it seems that you can't pipe to 'qemu-img convert' because
@@ -272,11 +452,8 @@ def fetch_to_volume_format(context, image_service,
 
         # NOTE(jdg): I'm using qemu-img convert to write
         # to the volume regardless if it *needs* conversion or not
-        # TODO(avishay): We can speed this up by checking if the image is raw
-        # and if so, writing directly to the device. However, we need to keep
-        # check via 'qemu-img info' that what we copied was in fact a raw
-        # image and not a different format with a backing file, which may be
-        # malicious.
+        # NOTE: raw images normally never get here, they are streamed to
+        # the volume by stream_raw_image_to_volume() above.
         LOG.debug("%s was %s, converting to %s " % (image_id, fmt,
                                                     volume_format))
         convert_image(tmp, dest, volume_format,
@@ -51,6 +51,7 @@ This module provides Manager, a base class for managers.
 
 """
 
+import copy
 
 from oslo.config import cfg
 from oslo import messaging
@@ -58,11 +59,23 @@ from oslo import messaging
 from cinder.db import base
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import periodic_task
+from cinder.openstack.common import timeutils
+from cinder.scheduler import capabilities as scheduler_capabilities
 from cinder.scheduler import rpcapi as scheduler_rpcapi
 from cinder import version
 
 
+manager_opts = [
+    cfg.IntOpt('capabilities_full_report_interval',
+               default=600,
+               help='Interval, in seconds, between two reports of all the '
+                    'capabilities of a service to the schedulers. Only '
+                    'the capabilities that changed are reported in '
+                    'between. 0 always reports all of them.'),
+]
+
 CONF = cfg.CONF
+CONF.register_opts(manager_opts)
 LOG = logging.getLogger(__name__)
 
 
@@ -115,19 +128,53 @@ class SchedulerDependentManager(Manager):
         self.last_capabilities = None
         self.service_name = service_name
         self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
+        # The capabilities last sent to the schedulers, numbered by
+        # generation so that they can tell when they missed a report.
+        self._published_capabilities = None
+        self._capabilities_generation = 0
+        self._last_full_report = None
         super(SchedulerDependentManager, self).__init__(host, db_driver)
 
     def update_service_capabilities(self, capabilities):
         """Remember these capabilities to send on next periodic update."""
         self.last_capabilities = capabilities
 
+    def _full_report_due(self):
+        interval = CONF.capabilities_full_report_interval
+        return (self._published_capabilities is None or interval <= 0 or
+                timeutils.is_older_than(self._last_full_report, interval))
+
     @periodic_task.periodic_task
-    def _publish_service_capabilities(self, context):
-        """Pass data back to the scheduler at a periodic interval."""
+    def _publish_service_capabilities(self, context, full=False):
+        """Pass data back to the scheduler at a periodic interval.
+
+        Only the changes since the previous report are sent, unless full
+        is set, capabilities_full_report_interval has elapsed since all
+        the capabilities were last sent, or some schedulers don't accept
+        deltas yet.
+        """
         if self.last_capabilities:
             LOG.debug('Notifying Schedulers of capabilities ...')
-            self.scheduler_rpcapi.update_service_capabilities(
-                context,
-                self.service_name,
-                self.host,
+            self._capabilities_generation += 1
+            if (full or self._full_report_due() or
+                    not self.scheduler_rpcapi.can_send_capability_deltas()):
+                self.scheduler_rpcapi.update_service_capabilities(
+                    context,
+                    self.service_name,
+                    self.host,
+                    self.last_capabilities,
+                    generation=self._capabilities_generation)
+                self._last_full_report = timeutils.utcnow()
+            else:
+                delta = scheduler_capabilities.diff_capabilities(
+                    self._published_capabilities, self.last_capabilities)
+                self.scheduler_rpcapi.update_service_capabilities(
+                    context,
+                    self.service_name,
+                    self.host,
+                    delta,
+                    generation=self._capabilities_generation,
+                    delta=True)
+            # Drivers may update the dict they report in place.
+            self._published_capabilities = copy.deepcopy(
                 self.last_capabilities)
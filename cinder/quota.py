@@ -68,7 +68,12 @@ quota_opts = [
     cfg.BoolOpt('use_default_quota_class',
                 default=True,
                 help='Enables or disables use of default quota class '
-                     'with default quota.'), ]
+                     'with default quota.'),
+    cfg.IntOpt('quota_volume_types_check_interval',
+               default=10,
+               help='Number of seconds between checks for volume types '
+                    'created or destroyed by other processes, whose quota '
+                    'resources are then built again'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(quota_opts)
@@ -359,6 +364,11 @@ class DbQuotaDriver(object):
         quotas = self._get_quotas(context, resources, deltas.keys(),
                                   has_sync=True, project_id=project_id)
 
+        return self._reserve(context, resources, quotas, deltas, expire,
+                             project_id)
+
+    def _reserve(self, context, resources, quotas, deltas, expire,
+                 project_id):
         # NOTE(Vek): Most of the work here has to be done in the DB
         #            API, because we have to do it in a transaction,
         #            which means access to the session.  Since the
@@ -422,6 +432,76 @@ class DbQuotaDriver(object):
 
         db.reservation_expire(context)
 
+    def reconcile(self, context, resources):
+        """Recount the usages that need it.
+
+        Nothing to do here, usages are recounted while reserving.
+
+        :param context: The request context, for access checks.
+        :param resources: A dictionary of the registered resources.
+        """
+        pass
+
+
+class AtomicDbQuotaDriver(DbQuotaDriver):
+    """Driver reserving quotas with atomic conditional updates.
+
+    Rather than locking all of the project's usages while reserving,
+    committing or rolling back, each usage is changed by a single UPDATE,
+    and a reservation only increases a usage if it is then still within
+    its quota.  Usages are not recounted while reserving, but by the
+    reconcile() periodic task.
+    """
+
+    def _reserve(self, context, resources, quotas, deltas, expire,
+                 project_id):
+        return db.quota_reserve_atomic(context, resources, quotas, deltas,
+                                       expire, CONF.until_refresh,
+                                       project_id=project_id)
+
+    def commit(self, context, reservations, project_id=None):
+        """Commit reservations.
+
+        :param context: The request context, for access checks.
+        :param reservations: A list of the reservation UUIDs, as
+                             returned by the reserve() method.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        """
+        db.reservation_commit_atomic(context, reservations,
+                                     project_id=project_id)
+
+    def rollback(self, context, reservations, project_id=None):
+        """Roll back reservations.
+
+        :param context: The request context, for access checks.
+        :param reservations: A list of the reservation UUIDs, as
+                             returned by the reserve() method.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        """
+        db.reservation_rollback_atomic(context, reservations,
+                                       project_id=project_id)
+
+    def reconcile(self, context, resources):
+        """Recount the usages that need it.
+
+        Those are the negative usages, the ones reserved until_refresh
+        times since they were recounted, and the ones older than max_age.
+
+        :param context: The request context, for access checks.
+        :param resources: A dictionary of the registered resources.
+        """
+        resources = dict((name, resource)
+                         for name, resource in resources.items()
+                         if isinstance(resource, ReservableResource))
+        count = db.quota_usage_reconcile(context, resources,
+                                         CONF.until_refresh, CONF.max_age)
+        if count:
+            LOG.debug("Recounted %d quota usages.", count)
+
 
 class BaseResource(object):
     """Describe a single resource for quota checking."""
@@ -825,6 +905,14 @@ class QuotaEngine(object):
 
         self._driver.expire(context)
 
+    def reconcile(self, context):
+        """Recount the usages that need it.
+
+        :param context: The request context, for access checks.
+        """
+
+        self._driver.reconcile(context, self.resources)
+
     def add_volume_type_opts(self, context, opts, volume_type_id):
         """Add volume type resource options.
 
@@ -862,10 +950,55 @@ class QuotaEngine(object):
 class VolumeTypeQuotaEngine(QuotaEngine):
     """Represent the set of all quotas."""
 
+    def __init__(self, quota_driver_class=None):
+        super(VolumeTypeQuotaEngine, self).__init__(quota_driver_class)
+        # The version of the volume types and the resources built for them.
+        self._resources_cache = (None, None)
+        self._checked_at = None
+
     @property
     def resources(self):
-        """Fetches all possible quota resources."""
+        """Fetches all possible quota resources.
+
+        The resources are built again once invalidated, when this process
+        creates or destroys volume types.  The volume types created or
+        destroyed by other processes are looked for at most every
+        quota_volume_types_check_interval seconds.
+        """
+        cached_version, resources = self._resources_cache
+        if (resources is None or self._checked_at is None or
+                timeutils.is_older_than(
+                    self._checked_at,
+                    CONF.quota_volume_types_check_interval)):
+            ctxt = context.get_admin_context()
+            version = db.volume_type_get_all_version(ctxt)
+            self._checked_at = timeutils.utcnow()
+            if resources is None or cached_version != version:
+                resources = self._build_resources(ctxt)
+                self._resources_cache = (version, resources)
+        return resources
+
+    def invalidate_resources(self):
+        """Build the resources again on their next access."""
+        self._resources_cache = (None, None)
+
+    def _check_resource_names(self, names):
+        # The volume types of resources not known yet may have been
+        # created by other processes since the last check.
+        if set(names) - set(self._resources_cache[1] or {}):
+            self._checked_at = None
+
+    def limit_check(self, context, project_id=None, **values):
+        self._check_resource_names(values)
+        return super(VolumeTypeQuotaEngine, self).limit_check(
+            context, project_id=project_id, **values)
+
+    def reserve(self, context, expire=None, project_id=None, **deltas):
+        self._check_resource_names(deltas)
+        return super(VolumeTypeQuotaEngine, self).reserve(
+            context, expire=expire, project_id=project_id, **deltas)
 
+    def _build_resources(self, ctxt):
         result = {}
         # Global quotas.
         argses = [('volumes', '_sync_volumes', 'quota_volumes'),
@@ -879,8 +1012,7 @@ class VolumeTypeQuotaEngine(QuotaEngine):
             result[resource.name] = resource
 
         # Volume type quotas.
-        volume_types = db.volume_type_get_all(context.get_admin_context(),
-                                              False)
+        volume_types = db.volume_type_get_all(ctxt, False)
         for volume_type in volume_types.values():
             for part_name in ('volumes', 'gigabytes', 'snapshots'):
                 resource = VolumeTypeResource(part_name, volume_type)
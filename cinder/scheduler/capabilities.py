@@ -0,0 +1,84 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Capability deltas sent by volume services to the schedulers.
+
+Between two full capability reports, a service only sends what changed
+since its previous report:
+
+  {'updated': {<key>: <value>, ...},    # backend level keys
+   'removed': [<key>, ...],
+   'pools': {<pool_name>: <pool>, ...},  # changed or added pools
+   'removed_pools': [<pool_name>, ...]}
+
+Pools are compared as a whole, by name, when the capabilities of both
+reports hold a list of pools.
+"""
+
+
+def _pools_by_name(capabilities):
+    pools = capabilities.get('pools')
+    if not isinstance(pools, list):
+        return None
+    try:
+        return dict((pool['pool_name'], pool) for pool in pools)
+    except (KeyError, TypeError):
+        return None
+
+
+def diff_capabilities(old, new):
+    """Return the delta turning the capabilities old into new."""
+    old_pools = _pools_by_name(old)
+    new_pools = _pools_by_name(new)
+    by_pool = old_pools is not None and new_pools is not None
+
+    delta = {'updated': {}, 'removed': [], 'pools': {}, 'removed_pools': []}
+    for key, value in new.iteritems():
+        if by_pool and key == 'pools':
+            continue
+        if key not in old or old[key] != value:
+            delta['updated'][key] = value
+    delta['removed'] = [key for key in old if key not in new]
+
+    if by_pool:
+        for name, pool in new_pools.iteritems():
+            if old_pools.get(name) != pool:
+                delta['pools'][name] = pool
+        delta['removed_pools'] = [name for name in old_pools
+                                  if name not in new_pools]
+    return delta
+
+
+def apply_capabilities_delta(capabilities, delta):
+    """Return the capabilities updated by delta, without changing them."""
+    result = dict(capabilities)
+    for key in delta.get('removed', []):
+        result.pop(key, None)
+    result.update(delta.get('updated', {}))
+
+    changed_pools = dict(delta.get('pools', {}))
+    removed_pools = set(delta.get('removed_pools', []))
+    if changed_pools or removed_pools:
+        pools = []
+        for pool in result.get('pools') or []:
+            name = pool['pool_name']
+            if name in removed_pools:
+                continue
+            pools.append(changed_pools.pop(name, pool))
+        # Pools that were added, in a stable order.
+        pools.extend(changed_pools[name] for name in sorted(changed_pools))
+        result['pools'] = pools
+    return result
@@ -19,9 +19,12 @@
 Scheduler base class that all Schedulers should inherit from
 """
 
+import copy
+
 from oslo.config import cfg
 
 from cinder import db
+from cinder import exception
 from cinder.i18n import _
 from cinder.openstack.common import importutils
 from cinder.openstack.common import timeutils
@@ -35,6 +38,11 @@ scheduler_driver_opts = [
     cfg.IntOpt('scheduler_max_attempts',
                default=3,
                help='Maximum number of attempts to schedule an volume'),
+    cfg.StrOpt('scheduler_bulk_placement',
+               default='spread',
+               help='How volumes created together are placed: "spread" '
+                    'spreads them over the best hosts, "pack" fills up '
+                    'the best host first'),
 ]
 
 CONF = cfg.CONF
@@ -69,11 +77,14 @@ class Scheduler(object):
             CONF.scheduler_host_manager)
         self.volume_rpcapi = volume_rpcapi.VolumeAPI()
 
-    def update_service_capabilities(self, service_name, host, capabilities):
+    def update_service_capabilities(self, service_name, host, capabilities,
+                                    generation=None, delta=False):
         """Process a capability update from a service node."""
         self.host_manager.update_service_capabilities(service_name,
                                                       host,
-                                                      capabilities)
+                                                      capabilities,
+                                                      generation=generation,
+                                                      delta=delta)
 
     def host_passes_filters(self, context, volume_id, host, filter_properties):
         """Check if the specified host passes the filters."""
@@ -92,6 +103,24 @@ class Scheduler(object):
         """Must override schedule method for scheduler to work."""
         raise NotImplementedError(_("Must implement schedule_create_volume"))
 
+    def schedule_create_volumes(self, context, volume_ids, request_spec,
+                                filter_properties):
+        """Schedule the creation of alike volumes.
+
+        Returns the ids of the volumes no host was found for.  Schedules
+        them one after the other unless overridden.
+        """
+        unplaced = []
+        for volume_id in volume_ids:
+            volume_spec = dict(request_spec, volume_id=volume_id)
+            try:
+                self.schedule_create_volume(
+                    context, volume_spec,
+                    copy.deepcopy(filter_properties or {}))
+            except exception.NoValidHost:
+                unplaced.append(volume_id)
+        return unplaced
+
     def schedule_create_consistencygroup(self, context, group_id,
                                          request_spec_list,
                                          filter_properties_list):
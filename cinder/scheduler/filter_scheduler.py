@@ -20,12 +20,15 @@ You can customize this scheduler by specifying your own volume Filters and
 Weighing Functions.
 """
 
+import copy
+
 from oslo.config import cfg
 
 from cinder import exception
 from cinder.i18n import _
 from cinder.openstack.common import log as logging
 from cinder.scheduler import driver
+from cinder.scheduler.filters import capacity_filter
 from cinder.scheduler import scheduler_options
 from cinder.volume import utils
 
@@ -106,6 +109,68 @@ class FilterScheduler(driver.Scheduler):
                                          snapshot_id=snapshot_id,
                                          image_id=image_id)
 
+    def schedule_create_volumes(self, context, volume_ids, request_spec,
+                                filter_properties):
+        """Place alike volumes with a single filtering and weighing pass.
+
+        Returns the ids of the volumes no host was found for.
+        """
+        filter_properties = filter_properties or {}
+        weighed_hosts = self._get_weighted_candidates(context, request_spec,
+                                                      filter_properties)
+        placements = self._place_volumes(weighed_hosts,
+                                         request_spec['volume_properties'],
+                                         len(volume_ids))
+
+        # context is not serializable
+        filter_properties.pop('context', None)
+
+        for volume_id, weighed_host in zip(volume_ids, placements):
+            host = weighed_host.obj.host
+            volume_spec = dict(request_spec, volume_id=volume_id)
+            volume_filter_properties = copy.deepcopy(filter_properties)
+            volume_filter_properties['request_spec'] = volume_spec
+
+            updated_volume = driver.volume_update_db(context, volume_id, host)
+            self._post_select_populate_filter_properties(
+                volume_filter_properties, weighed_host.obj)
+
+            self.volume_rpcapi.create_volume(context, updated_volume, host,
+                                             volume_spec,
+                                             volume_filter_properties,
+                                             allow_reschedule=True,
+                                             snapshot_id=None,
+                                             image_id=volume_spec['image_id'])
+        return volume_ids[len(placements):]
+
+    def _place_volumes(self, weighed_hosts, volume_properties, count):
+        """Choose the hosts of count alike volumes among weighed hosts.
+
+        Hosts are taken in the order of their weights, the volumes are
+        consumed from them as they get chosen and hosts are left out once
+        they are full.  Depending on scheduler_bulk_placement, a host is
+        either chosen for one volume in turn or until it is full.
+        """
+        capacity = capacity_filter.CapacityFilter()
+        size = volume_properties['size']
+        spread = CONF.scheduler_bulk_placement == 'spread'
+        candidates = list(weighed_hosts)
+        placements = []
+        index = 0
+        while candidates and len(placements) < count:
+            index %= len(candidates)
+            weighed_host = candidates[index]
+            host_state = weighed_host.obj
+            if not capacity._has_capacity(host_state, size, None):
+                del candidates[index]
+                continue
+            LOG.debug("Choosing %s" % host_state.host)
+            host_state.consume_from_volume(volume_properties)
+            placements.append(weighed_host)
+            if spread:
+                index += 1
+        return placements
+
     def host_passes_filters(self, context, host, request_spec,
                             filter_properties):
         """Check if the specified host passes the filters."""
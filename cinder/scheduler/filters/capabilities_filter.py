@@ -0,0 +1,175 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import operator
+
+import six
+
+from cinder.openstack.common import log as logging
+from cinder.openstack.common.scheduler import filters
+from cinder.openstack.common import strutils
+
+
+LOG = logging.getLogger(__name__)
+
+# Compiled extra specs are cached by content, up to this many of them.
+SPECS_CACHE_SIZE = 128
+
+_float_ops = {'=': operator.ge,
+              '==': operator.eq,
+              '!=': operator.ne,
+              '>=': operator.ge,
+              '<=': operator.le}
+
+_string_ops = {'s==': operator.eq,
+               's!=': operator.ne,
+               's<': operator.lt,
+               's<=': operator.le,
+               's>': operator.gt,
+               's>=': operator.ge,
+               '<in>': lambda x, y: y in x}
+
+
+def compile_requirement(req):
+    """Return a function matching a capability against an extra spec.
+
+    compile_requirement(req)(value) is extra_specs_ops.match(value, req),
+    but req is only parsed once.
+    """
+    words = req.split()
+    op = words[0] if words else None
+    operands = words[1:]
+
+    if op == '<or>':
+        # Ex: <or> v1 <or> v2 <or> v3
+        choices = operands[0::2]
+        return lambda value: value in choices
+
+    if op in _float_ops:
+        compare = _float_ops[op]
+        try:
+            operand = float(operands[0]) if operands else None
+        except ValueError:
+            operand = None
+        if operand is None:
+            return lambda value: False
+
+        def _match_float(value):
+            try:
+                return compare(float(value), operand)
+            except ValueError:
+                return False
+        return _match_float
+
+    if op == '<is>':
+        if not operands:
+            return lambda value: False
+        operand = strutils.bool_from_string(operands[0])
+        return lambda value: strutils.bool_from_string(value) is operand
+
+    if op in _string_ops:
+        if not operands:
+            return lambda value: False
+        compare = _string_ops[op]
+        operand = operands[0]
+        return lambda value: compare(value, operand)
+
+    return lambda value: value == req
+
+
+def compile_extra_specs(extra_specs):
+    """Compile extra specs into a list of (scope, req, match) tuples.
+
+    scope is the path of the capability the spec applies to, and match
+    the function returned by compile_requirement(req).  Specs scoped to
+    something else than capabilities are left out.
+    """
+    compiled = []
+    for key, req in six.iteritems(extra_specs):
+        # Either not scope format, or in capabilities scope
+        scope = key.split(':')
+        if len(scope) > 1 and scope[0] != "capabilities":
+            continue
+        elif scope[0] == "capabilities":
+            del scope[0]
+        compiled.append((tuple(scope), req, compile_requirement(req)))
+    return compiled
+
+
+class CapabilitiesFilter(filters.BaseHostFilter):
+    """HostFilter to work with resource (instance & volume) type records.
+
+    The extra specs of a type are compiled once, and cached, rather than
+    parsed again for every host.
+    """
+
+    _specs_cache = {}
+
+    def _get_compiled_specs(self, resource_type):
+        extra_specs = (resource_type or {}).get('extra_specs')
+        if not extra_specs:
+            return []
+        try:
+            key = frozenset(six.iteritems(extra_specs))
+        except TypeError:
+            # Not strings, which extra specs should be.
+            return compile_extra_specs(extra_specs)
+        compiled = self._specs_cache.get(key)
+        if compiled is None:
+            if len(self._specs_cache) >= SPECS_CACHE_SIZE:
+                self._specs_cache.clear()
+            compiled = compile_extra_specs(extra_specs)
+            self._specs_cache[key] = compiled
+        return compiled
+
+    def _satisfies_extra_specs(self, capabilities, compiled_specs):
+        """Check that the capabilities provided by the services satisfy
+        the compiled extra specs associated with the resource type.
+        """
+        for scope, req, match in compiled_specs:
+            cap = capabilities
+            for name in scope:
+                try:
+                    cap = cap.get(name, None)
+                except AttributeError:
+                    return False
+                if cap is None:
+                    return False
+            if not match(cap):
+                LOG.debug("extra_spec requirement '%(req)s' does not match "
+                          "'%(cap)s'", {'req': req, 'cap': cap})
+                return False
+        return True
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        """Return the hosts that can create resource_type."""
+        compiled_specs = self._get_compiled_specs(
+            filter_properties.get('resource_type'))
+        if not compiled_specs:
+            return list(filter_obj_list)
+        return [host_state for host_state in filter_obj_list
+                if self._satisfies_extra_specs(host_state.capabilities,
+                                               compiled_specs)]
+
+    def host_passes(self, host_state, filter_properties):
+        """Return a list of hosts that can create resource_type."""
+        compiled_specs = self._get_compiled_specs(
+            filter_properties.get('resource_type'))
+        if not self._satisfies_extra_specs(host_state.capabilities,
+                                           compiled_specs):
+            LOG.debug("%(host_state)s fails resource_type extra_specs "
+                      "requirements", {'host_state': host_state})
+            return False
+        return True
@@ -29,16 +29,25 @@ LOG = logging.getLogger(__name__)
 class CapacityFilter(filters.BaseHostFilter):
     """CapacityFilter filters based on volume host's capacity utilization."""
 
+    def filter_all(self, filter_obj_list, filter_properties):
+        """Return the hosts that have sufficient capacity."""
+        volume_size = filter_properties.get('size')
+        vol_exists_on = filter_properties.get('vol_exists_on')
+        return [host_state for host_state in filter_obj_list
+                if self._has_capacity(host_state, volume_size, vol_exists_on)]
+
     def host_passes(self, host_state, filter_properties):
         """Return True if host has sufficient capacity."""
+        return self._has_capacity(host_state,
+                                  filter_properties.get('size'),
+                                  filter_properties.get('vol_exists_on'))
 
+    def _has_capacity(self, host_state, volume_size, vol_exists_on):
         # If the volume already exists on this host, don't fail it for
         # insufficient capacity (e.g., if we are retyping)
-        if host_state.host == filter_properties.get('vol_exists_on'):
+        if host_state.host == vol_exists_on:
             return True
 
-        volume_size = filter_properties.get('size')
-
         if host_state.free_capacity_gb is None:
             # Fail Safe
             LOG.error(_("Free capacity not set: "
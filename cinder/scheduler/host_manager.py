@@ -17,18 +17,24 @@
 Manage hosts in the current zone.
 """
 
+import os
 import UserDict
 
 from oslo.config import cfg
 
+from cinder import context as cinder_context
 from cinder import db
 from cinder import exception
 from cinder.i18n import _
+from cinder.openstack.common import fileutils
+from cinder.openstack.common import jsonutils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common.scheduler import filters
 from cinder.openstack.common.scheduler import weights
 from cinder.openstack.common import timeutils
+from cinder.scheduler import capabilities as scheduler_capabilities
 from cinder import utils
+from cinder.volume import rpcapi as volume_rpcapi
 from cinder.volume import utils as vol_utils
 
 
@@ -45,7 +51,22 @@ host_manager_opts = [
                 default=[
                     'CapacityWeigher'
                 ],
-                help='Which weigher class names to use for weighing hosts.')
+                help='Which weigher class names to use for weighing hosts.'),
+    cfg.IntOpt('scheduler_service_refresh_interval',
+               default=10,
+               help='Seconds the scheduler caches the list of enabled and '
+                    'running volume services for before reading it from '
+                    'the database again. 0 reads it for every request.'),
+    cfg.StrOpt('scheduler_capabilities_file',
+               default=None,
+               help='File the scheduler periodically saves the capabilities '
+                    'reported by volume services to, and loads them from '
+                    'when it starts, so that volumes can be scheduled '
+                    'before every volume service has reported again.'),
+    cfg.IntOpt('scheduler_capabilities_max_age',
+               default=3600,
+               help='Capabilities reported more than this many seconds ago '
+                    'are not loaded from scheduler_capabilities_file.'),
 ]
 
 CONF = cfg.CONF
@@ -54,6 +75,10 @@ CONF.import_opt('scheduler_driver', 'cinder.scheduler.manager')
 
 LOG = logging.getLogger(__name__)
 
+# Seconds before a full capability report is requested again from a host
+# whose deltas are dropped.
+FULL_REPORT_REQUEST_INTERVAL = 60
+
 
 class ReadOnlyDict(UserDict.IterableUserDict):
     """A read-only dict."""
@@ -320,6 +345,20 @@ class HostManager(object):
     def __init__(self):
         self.service_states = {}  # { <host>: {<service>: {cap k : v}}}
         self.host_state_map = {}
+        # When the volume services were last read from the database.
+        self._services_refreshed_at = None
+        # Tuple of the PoolStates of all active hosts, None when it has to
+        # be rebuilt.
+        self._pool_snapshot = None
+        # Hosts whose capabilities were loaded from
+        # scheduler_capabilities_file and haven't been reported since.
+        self.stale_hosts = set()
+        self._capabilities_changed = False
+        # { <host>: (<generation>, <capabilities as reported>) }
+        self._reported_capabilities = {}
+        # { <host>: when a full capability report was requested from it }
+        self._full_reports_requested = {}
+        self._volume_rpcapi = None
         self.filter_handler = filters.HostFilterHandler('cinder.scheduler.'
                                                         'filters')
         self.filter_classes = self.filter_handler.get_all_classes()
@@ -409,39 +448,178 @@ class HostManager(object):
 
     def get_weighed_hosts(self, hosts, weight_properties,
                           weigher_class_names=None):
-        """Weigh the hosts."""
-        weigher_classes = self._choose_host_weighers(weigher_class_names)
-        return self.weight_handler.get_weighed_objects(weigher_classes,
-                                                       hosts,
-                                                       weight_properties)
+        """Weigh the hosts.
 
-    def update_service_capabilities(self, service_name, host, capabilities):
-        """Update the per-service capabilities based on this notification."""
+        Hosts whose capabilities were loaded from
+        scheduler_capabilities_file, and haven't been reported since, come
+        after all the others, whatever their weights.
+        """
+        weigher_classes = self._choose_host_weighers(weigher_class_names)
+        weighed_hosts = self.weight_handler.get_weighed_objects(
+            weigher_classes, hosts, weight_properties)
+        if self.stale_hosts:
+            # The sort is stable, which keeps the order of the weights.
+            weighed_hosts.sort(key=lambda weighed_host: (
+                vol_utils.extract_host(weighed_host.obj.host) in
+                self.stale_hosts))
+        return weighed_hosts
+
+    def update_service_capabilities(self, service_name, host, capabilities,
+                                    generation=None, delta=False):
+        """Update the per-service capabilities based on this notification.
+
+        generation numbers the reports of a service.  When delta is set,
+        capabilities only holds the changes since the report numbered
+        generation - 1, see cinder.scheduler.capabilities; deltas that
+        don't follow the last report received are dropped, and a full
+        report is requested from the host.
+        """
         if service_name != 'volume':
             LOG.debug('Ignoring %(service_name)s service update '
                       'from %(host)s',
                       {'service_name': service_name, 'host': host})
             return
 
+        if delta:
+            reported = self._reported_capabilities.get(host)
+            if (reported is None or generation is None or
+                    reported[0] != generation - 1):
+                LOG.debug("Dropping capability update %(generation)s from "
+                          "%(host)s, waiting for a full one." %
+                          {'generation': generation, 'host': host})
+                self._request_full_report(host)
+                return
+            capabilities = scheduler_capabilities.apply_capabilities_delta(
+                reported[1], capabilities)
+        else:
+            self._full_reports_requested.pop(host, None)
+        if generation is not None:
+            self._reported_capabilities[host] = (generation, capabilities)
+        else:
+            self._reported_capabilities.pop(host, None)
+
         # Copy the capabilities, so we don't modify the original dict
         capab_copy = dict(capabilities)
+        if isinstance(capab_copy.get('pools'), list):
+            # Host states add backend level info to the pools.
+            capab_copy['pools'] = [dict(pool) for pool in capab_copy['pools']]
         capab_copy["timestamp"] = timeutils.utcnow()  # Reported time
+        if host not in self.service_states:
+            # Likely a new volume service, which won't be scheduled to
+            # before the services are read from the database again.
+            self._services_refreshed_at = None
         self.service_states[host] = capab_copy
+        self.stale_hosts.discard(host)
+        self._capabilities_changed = True
+
+        host_state = self.host_state_map.get(host)
+        if host_state is not None:
+            host_state.update_from_volume_capability(
+                capab_copy, service=dict(host_state.service))
+            # Pools may have been added or removed.
+            self._pool_snapshot = None
 
         LOG.debug("Received %(service_name)s service update from "
                   "%(host)s: %(cap)s" %
                   {'service_name': service_name, 'host': host,
                    'cap': capabilities})
 
+    def _request_full_report(self, host):
+        """Ask host for all of its capabilities, at most once a while."""
+        requested_at = self._full_reports_requested.get(host)
+        if (requested_at is not None and
+                not timeutils.is_older_than(requested_at,
+                                            FULL_REPORT_REQUEST_INTERVAL)):
+            return
+        self._full_reports_requested[host] = timeutils.utcnow()
+        if self._volume_rpcapi is None:
+            self._volume_rpcapi = volume_rpcapi.VolumeAPI()
+        LOG.info(_("Requesting a full capability report from %s.") % host)
+        self._volume_rpcapi.publish_service_capabilities(
+            cinder_context.get_admin_context(), host=host)
+
+    def save_capabilities(self):
+        """Save the capabilities to scheduler_capabilities_file."""
+        path = CONF.scheduler_capabilities_file
+        if not path or not self._capabilities_changed:
+            return
+        states = {}
+        for host, capabilities in self.service_states.iteritems():
+            capabilities = dict(capabilities)
+            timestamp = capabilities.pop('timestamp', None)
+            if timestamp is not None:
+                timestamp = timeutils.strtime(timestamp)
+            states[host] = {'timestamp': timestamp,
+                            'capabilities': capabilities}
+        directory = os.path.dirname(os.path.abspath(path))
+        fileutils.ensure_tree(directory)
+        tmp_path = fileutils.write_to_tempfile(jsonutils.dumps(states),
+                                               path=directory,
+                                               prefix='.capabilities')
+        os.rename(tmp_path, path)
+        self._capabilities_changed = False
+
+    def load_capabilities(self):
+        """Load the capabilities saved by save_capabilities().
+
+        Capabilities are only loaded for hosts that haven't reported
+        theirs yet, and are marked stale until they do.
+        """
+        path = CONF.scheduler_capabilities_file
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                states = jsonutils.loads(f.read())
+        except (IOError, ValueError) as e:
+            LOG.warn(_("Failed to load scheduler capabilities from "
+                       "%(path)s: %(error)s") % {'path': path, 'error': e})
+            return
+
+        for host, state in states.iteritems():
+            if host in self.service_states or state['timestamp'] is None:
+                continue
+            timestamp = timeutils.parse_strtime(state['timestamp'])
+            if timeutils.is_older_than(timestamp,
+                                       CONF.scheduler_capabilities_max_age):
+                continue
+            capabilities = state['capabilities']
+            capabilities['timestamp'] = timestamp
+            self.service_states[host] = capabilities
+            self.stale_hosts.add(host)
+        self._services_refreshed_at = None
+        LOG.info(_("Loaded capabilities of %(count)d volume services from "
+                   "%(path)s.") % {'count': len(self.stale_hosts),
+                                   'path': path})
+
     def get_all_host_states(self, context):
-        """Returns a dict of all the hosts the HostManager knows about.
+        """Returns an iterator over the pools of all active hosts.
 
         Each of the consumable resources in HostState are
         populated with capabilities scheduler received from RPC.
 
-        For example:
-          {'192.168.1.100': HostState(), ...}
+        Host states are updated as capabilities are received, and the
+        volume services are read from the database at most every
+        scheduler_service_refresh_interval seconds, so this usually only
+        returns the pools collected by an earlier call.
         """
+        if (self._services_refreshed_at is None or
+                CONF.scheduler_service_refresh_interval <= 0 or
+                timeutils.is_older_than(
+                    self._services_refreshed_at,
+                    CONF.scheduler_service_refresh_interval)):
+            self._refresh_host_states(context)
+
+        if self._pool_snapshot is None:
+            pools = []
+            for state in self.host_state_map.itervalues():
+                pools.extend(state.pools.itervalues())
+            self._pool_snapshot = tuple(pools)
+        return iter(self._pool_snapshot)
+
+    def _refresh_host_states(self, context):
+        """Update host_state_map from the volume services in the DB."""
+        self._services_refreshed_at = timeutils.utcnow()
 
         # Get resource usage across the available volume nodes:
         topic = CONF.volume_topic
@@ -475,17 +653,7 @@ class HostManager(object):
                        "scheduler cache.") % {'host': host})
             del self.host_state_map[host]
 
-        # build a pool_state map and return that map instead of host_state_map
-        all_pools = {}
-        for host in active_hosts:
-            state = self.host_state_map[host]
-            for key in state.pools:
-                pool = state.pools[key]
-                # use host.pool_name to make sure key is unique
-                pool_key = '.'.join([host, pool.pool_name])
-                all_pools[pool_key] = pool
-
-        return all_pools.itervalues()
+        self._pool_snapshot = None
 
     def get_pools(self, context):
         """Returns a dict of all pools on all hosts HostManager knows about."""
@@ -31,6 +31,7 @@ from cinder import manager
 from cinder.openstack.common import excutils
 from cinder.openstack.common import importutils
 from cinder.openstack.common import log as logging
+from cinder.openstack.common import periodic_task
 from cinder import quota
 from cinder import rpc
 from cinder.scheduler.flows import create_volume
@@ -53,7 +54,7 @@ LOG = logging.getLogger(__name__)
 class SchedulerManager(manager.Manager):
     """Chooses a host to create volumes."""
 
-    RPC_API_VERSION = '1.7'
+    RPC_API_VERSION = '1.9'
 
     target = messaging.Target(version=RPC_API_VERSION)
 
@@ -76,16 +77,29 @@ class SchedulerManager(manager.Manager):
 
     def init_host(self):
         ctxt = context.get_admin_context()
+        self.driver.host_manager.load_capabilities()
         self.request_service_capabilities(ctxt)
 
+    @periodic_task.periodic_task
+    def _save_capabilities(self, context):
+        self.driver.host_manager.save_capabilities()
+
+    @periodic_task.periodic_task
+    def _reconcile_quota_usages(self, context):
+        QUOTAS.reconcile(context)
+        quota.CGQUOTAS.reconcile(context)
+
     def update_service_capabilities(self, context, service_name=None,
-                                    host=None, capabilities=None, **kwargs):
+                                    host=None, capabilities=None,
+                                    generation=None, delta=False, **kwargs):
         """Process a capability update from a service node."""
         if capabilities is None:
             capabilities = {}
         self.driver.update_service_capabilities(service_name,
                                                 host,
-                                                capabilities)
+                                                capabilities,
+                                                generation=generation,
+                                                delta=delta)
 
     def create_consistencygroup(self, context, topic,
                                 group_id,
@@ -131,6 +145,32 @@ class SchedulerManager(manager.Manager):
         with flow_utils.DynamicLogListener(flow_engine, logger=LOG):
             flow_engine.run()
 
+    def create_volumes(self, context, topic, volume_ids, image_id=None,
+                       request_spec=None, filter_properties=None):
+        """Place alike volumes, filtering and weighing hosts once."""
+        try:
+            unplaced = self.driver.schedule_create_volumes(context,
+                                                           volume_ids,
+                                                           request_spec,
+                                                           filter_properties)
+        except Exception as ex:
+            with excutils.save_and_reraise_exception():
+                self._create_volumes_set_error(context, ex, request_spec,
+                                               volume_ids)
+        if unplaced:
+            ex = exception.NoValidHost(reason=_("No weighed hosts available"))
+            self._create_volumes_set_error(context, ex, request_spec,
+                                           unplaced)
+
+    def _create_volumes_set_error(self, context, ex, request_spec,
+                                  volume_ids):
+        for volume_id in volume_ids:
+            volume_spec = dict(request_spec, volume_id=volume_id)
+            self._set_volume_state_and_notify('create_volume',
+                                              {'volume_state':
+                                               {'status': 'error'}},
+                                              context, ex, volume_spec)
+
     def request_service_capabilities(self, context):
         volume_rpcapi.VolumeAPI().publish_service_capabilities(context)
 
@@ -23,7 +23,16 @@ from cinder.openstack.common import jsonutils
 from cinder import rpc
 
 
+rpcapi_opts = [
+    cfg.StrOpt('scheduler_rpc_version_cap',
+               default='1.9',
+               help='Highest version of the scheduler RPC API used by '
+                    'services. While schedulers are upgraded, set it to the '
+                    'version of the oldest of them.'),
+]
+
 CONF = cfg.CONF
+CONF.register_opts(rpcapi_opts)
 
 
 class SchedulerAPI(object):
@@ -40,6 +49,9 @@ class SchedulerAPI(object):
         1.5 - Add manage_existing method
         1.6 - Add create_consistencygroup method
         1.7 - Add get_active_pools method
+        1.8 - Add generation and delta arguments to
+              update_service_capabilities()
+        1.9 - Add create_volumes method
     '''
 
     RPC_API_VERSION = '1.0'
@@ -48,7 +60,12 @@ class SchedulerAPI(object):
         super(SchedulerAPI, self).__init__()
         target = messaging.Target(topic=CONF.scheduler_topic,
                                   version=self.RPC_API_VERSION)
-        self.client = rpc.get_client(target, version_cap='1.7')
+        self.client = rpc.get_client(
+            target, version_cap=CONF.scheduler_rpc_version_cap)
+
+    def can_send_capability_deltas(self):
+        """Whether all the schedulers accept capability deltas."""
+        return self.client.can_send_version('1.8')
 
     def create_consistencygroup(self, ctxt, topic, group_id,
                                 request_spec_list=None,
@@ -80,6 +97,18 @@ class SchedulerAPI(object):
                           request_spec=request_spec_p,
                           filter_properties=filter_properties)
 
+    def create_volumes(self, ctxt, topic, volume_ids, image_id=None,
+                       request_spec=None, filter_properties=None):
+
+        cctxt = self.client.prepare(version='1.9')
+        request_spec_p = jsonutils.to_primitive(request_spec)
+        return cctxt.cast(ctxt, 'create_volumes',
+                          topic=topic,
+                          volume_ids=volume_ids,
+                          image_id=image_id,
+                          request_spec=request_spec_p,
+                          filter_properties=filter_properties)
+
     def migrate_volume_to_host(self, ctxt, topic, volume_id, host,
                                force_host_copy=False, request_spec=None,
                                filter_properties=None):
@@ -122,9 +151,18 @@ class SchedulerAPI(object):
 
     def update_service_capabilities(self, ctxt,
                                     service_name, host,
-                                    capabilities):
+                                    capabilities, generation=None,
+                                    delta=False):
         # FIXME(flaper87): What to do with fanout?
-        cctxt = self.client.prepare(fanout=True)
-        cctxt.cast(ctxt, 'update_service_capabilities',
-                   service_name=service_name, host=host,
-                   capabilities=capabilities)
+        msg_args = dict(service_name=service_name, host=host,
+                        capabilities=capabilities)
+        if delta:
+            # Schedulers older than 1.8 would take deltas for full
+            # reports, deltas are only sent once they all accept them.
+            cctxt = self.client.prepare(fanout=True, version='1.8')
+            msg_args.update(generation=generation, delta=True)
+        else:
+            cctxt = self.client.prepare(fanout=True)
+            if generation is not None and self.can_send_capability_deltas():
+                msg_args['generation'] = generation
+        cctxt.cast(ctxt, 'update_service_capabilities', **msg_args)
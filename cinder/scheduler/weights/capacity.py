@@ -60,21 +60,34 @@ class CapacityWeigher(weights.BaseHostWeigher):
         """Override the weight multiplier."""
         return CONF.capacity_weight_multiplier
 
-    def _weigh_object(self, host_state, weight_properties):
-        """Higher weights win.  We want spreading to be the default."""
-        reserved = float(host_state.reserved_percentage) / 100
+    def weigh_objects(self, weighed_obj_list, weight_properties):
+        """Weigh all hosts in one pass, reading the options only once."""
+        constant = self._weight_multiplier()
+        unknown_free = self._unknown_free()
+        for obj in weighed_obj_list:
+            obj.weight += constant * self._free(obj.obj, unknown_free)
+
+    @staticmethod
+    def _unknown_free():
+        #(zhiteng) 'infinite' and 'unknown' are treated the same
+        # here, for sorting purpose.
+
+        # As a partial fix for bug #1350638, 'infinite' and 'unknown' are
+        # given the lowest weight to discourage driver from report such
+        # capacity anymore.
+        return -1 if CONF.capacity_weight_multiplier > 0 else float('inf')
+
+    @staticmethod
+    def _free(host_state, unknown_free):
         free_space = host_state.free_capacity_gb
         if free_space == 'infinite' or free_space == 'unknown':
-            #(zhiteng) 'infinite' and 'unknown' are treated the same
-            # here, for sorting purpose.
-
-            # As a partial fix for bug #1350638, 'infinite' and 'unknown' are
-            # given the lowest weight to discourage driver from report such
-            # capacity anymore.
-            free = -1 if CONF.capacity_weight_multiplier > 0 else float('inf')
-        else:
-            free = math.floor(host_state.free_capacity_gb * (1 - reserved))
-        return free
+            return unknown_free
+        reserved = float(host_state.reserved_percentage) / 100
+        return math.floor(free_space * (1 - reserved))
+
+    def _weigh_object(self, host_state, weight_properties):
+        """Higher weights win.  We want spreading to be the default."""
+        return self._free(host_state, self._unknown_free())
 
 
 class AllocatedCapacityWeigher(weights.BaseHostWeigher):
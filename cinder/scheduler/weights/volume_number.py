@@ -49,12 +49,18 @@ class VolumeNumberWeigher(weights.BaseHostWeigher):
         """Override the weight multiplier."""
         return CONF.volume_number_multiplier
 
-    def _weigh_object(self, host_state, weight_properties):
+    def weigh_objects(self, weighed_obj_list, weight_properties):
         """Less volume number weights win.
         We want spreading to be the default.
+
+        The volume numbers of all hosts are counted in a single query.
         """
+        if not weighed_obj_list:
+            return
         context = weight_properties['context']
-        volume_number = db.volume_data_get_for_host(context=context,
-                                                    host=host_state.host,
-                                                    count_only=True)
-        return volume_number
+        volume_numbers = db.volume_data_get_for_hosts(
+            context, set(obj.obj.host for obj in weighed_obj_list),
+            count_only=True)
+        constant = self._weight_multiplier()
+        for obj in weighed_obj_list:
+            obj.weight += constant * volume_numbers[obj.obj.host]
@@ -42,6 +42,7 @@ from cinder.db.sqlalchemy import api as sqla_api
 from cinder.openstack.common import log as oslo_logging
 from cinder.openstack.common import strutils
 from cinder.openstack.common import timeutils
+from cinder import quota
 from cinder import rpc
 from cinder import service
 from cinder.tests import conf_fixture
@@ -169,6 +170,9 @@ class TestCase(testtools.TestCase):
                                  sqlite_db=CONF.database.sqlite_db,
                                  sqlite_clean_db=CONF.sqlite_clean_db)
         self.useFixture(_DB_CACHE)
+        # The quota resources built for the volume types of the previous
+        # tests are gone with their database.
+        quota.QUOTAS.invalidate_resources()
 
         # emulate some of the mox stuff, we can't use the metaclass
         # because it screws with our generators
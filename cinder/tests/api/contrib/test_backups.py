@@ -17,6 +17,7 @@
 Tests for Backup code.
 """
 
+import datetime
 import json
 from xml.dom import minidom
 
@@ -58,12 +59,15 @@ class BackupsAPITestCase(test.TestCase):
                        display_description='this is a test backup',
                        container='volumebackups',
                        status='creating',
-                       size=0, object_count=0, host='testhost'):
+                       size=0, object_count=0, host='testhost',
+                       parent_id=None, project_id='fake',
+                       service='cinder.tests.backup.fake_service'):
         """Create a backup object."""
         backup = {}
         backup['volume_id'] = volume_id
         backup['user_id'] = 'fake'
-        backup['project_id'] = 'fake'
+        backup['project_id'] = project_id
+        backup['service'] = service
         backup['host'] = host
         backup['availability_zone'] = 'az1'
         backup['display_name'] = display_name
@@ -73,6 +77,7 @@ class BackupsAPITestCase(test.TestCase):
         backup['fail_reason'] = ''
         backup['size'] = size
         backup['object_count'] = object_count
+        backup['parent_id'] = parent_id
         return db.backup_create(context.get_admin_context(), backup)['id']
 
     @staticmethod
@@ -139,9 +144,10 @@ class BackupsAPITestCase(test.TestCase):
                          'Backup 9999 could not be found.')
 
     def test_list_backups_json(self):
-        backup_id1 = self._create_backup()
-        backup_id2 = self._create_backup()
+        # The backups are listed from the newest one.
         backup_id3 = self._create_backup()
+        backup_id2 = self._create_backup()
+        backup_id1 = self._create_backup()
 
         req = webob.Request.blank('/v2/fake/backups')
         req.method = 'GET'
@@ -165,9 +171,10 @@ class BackupsAPITestCase(test.TestCase):
         db.backup_destroy(context.get_admin_context(), backup_id1)
 
     def test_list_backups_xml(self):
-        backup_id1 = self._create_backup()
-        backup_id2 = self._create_backup()
+        # The backups are listed from the newest one.
         backup_id3 = self._create_backup()
+        backup_id2 = self._create_backup()
+        backup_id1 = self._create_backup()
 
         req = webob.Request.blank('/v2/fake/backups')
         req.method = 'GET'
@@ -193,10 +200,32 @@ class BackupsAPITestCase(test.TestCase):
         db.backup_destroy(context.get_admin_context(), backup_id2)
         db.backup_destroy(context.get_admin_context(), backup_id1)
 
+    def test_list_backups_with_marker_and_sort(self):
+        backup_id1 = self._create_backup(display_name='backup1')
+        backup_id2 = self._create_backup(display_name='backup2')
+        backup_id3 = self._create_backup(display_name='backup3')
+
+        req = webob.Request.blank('/v2/fake/backups?sort_key=display_name'
+                                  '&sort_dir=desc&limit=1&marker=%s' %
+                                  backup_id3)
+        req.method = 'GET'
+        req.headers['Content-Type'] = 'application/json'
+        res = req.get_response(fakes.wsgi_app())
+        res_dict = json.loads(res.body)
+
+        self.assertEqual(200, res.status_int)
+        self.assertEqual([backup_id2],
+                         [backup['id'] for backup in res_dict['backups']])
+
+        db.backup_destroy(context.get_admin_context(), backup_id3)
+        db.backup_destroy(context.get_admin_context(), backup_id2)
+        db.backup_destroy(context.get_admin_context(), backup_id1)
+
     def test_list_backups_detail_json(self):
-        backup_id1 = self._create_backup()
-        backup_id2 = self._create_backup()
+        # The backups are listed from the newest one.
         backup_id3 = self._create_backup()
+        backup_id2 = self._create_backup()
+        backup_id1 = self._create_backup()
 
         req = webob.Request.blank('/v2/fake/backups/detail')
         req.method = 'GET'
@@ -295,9 +324,10 @@ class BackupsAPITestCase(test.TestCase):
         db.backup_destroy(context.get_admin_context(), backup_id1)
 
     def test_list_backups_detail_xml(self):
-        backup_id1 = self._create_backup()
-        backup_id2 = self._create_backup()
+        # The backups are listed from the newest one.
         backup_id3 = self._create_backup()
+        backup_id2 = self._create_backup()
+        backup_id1 = self._create_backup()
 
         req = webob.Request.blank('/v2/fake/backups/detail')
         req.method = 'GET'
@@ -406,6 +436,105 @@ class BackupsAPITestCase(test.TestCase):
 
         db.volume_destroy(context.get_admin_context(), volume_id)
 
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_create_incremental_backup_json(self,
+                                            _mock_service_get_all_by_topic):
+        _mock_service_get_all_by_topic.return_value = [
+            {'availability_zone': "fake_az", 'host': 'test_host',
+             'disabled': 0, 'updated_at': timeutils.utcnow()}]
+
+        volume_id = utils.create_volume(self.context, size=5)['id']
+        parent_id = self._create_backup(volume_id, status='available',
+                                        container='nightlybackups')
+
+        body = {"backup": {"display_name": "nightly001",
+                           "display_description":
+                           "Nightly Backup 03-Sep-2012",
+                           "volume_id": volume_id,
+                           "incremental": True,
+                           }
+                }
+        req = webob.Request.blank('/v2/fake/backups')
+        req.method = 'POST'
+        req.headers['Content-Type'] = 'application/json'
+        req.body = json.dumps(body)
+        res = req.get_response(fakes.wsgi_app())
+
+        res_dict = json.loads(res.body)
+        self.assertEqual(res.status_int, 202)
+        backup_id = res_dict['backup']['id']
+        self.assertEqual(parent_id,
+                         self._get_backup_attrib(backup_id, 'parent_id'))
+        self.assertEqual('nightlybackups',
+                         self._get_backup_attrib(backup_id, 'container'))
+
+        db.backup_destroy(context.get_admin_context(), backup_id)
+        db.backup_destroy(context.get_admin_context(), parent_id)
+        db.volume_destroy(context.get_admin_context(), volume_id)
+
+    def test_get_latest_backup_of_other_project(self):
+        volume = utils.create_volume(self.context, size=5)
+        db.volume_update(self.context, volume['id'],
+                         {'project_id': 'other'})
+        volume = db.volume_get(self.context, volume['id'])
+        self._create_backup(volume['id'], status='available')
+        parent_id = self._create_backup(volume['id'], status='available',
+                                        project_id='other')
+
+        # The admin backing up the volume gets the backups of its project.
+        latest_backup = self.backup_api._get_latest_backup(self.context,
+                                                           volume)
+        self.assertEqual(parent_id, latest_backup['id'])
+
+    def test_get_latest_backup_of_other_driver(self):
+        self.flags(backup_driver='cinder.backup.drivers.swift')
+        volume = utils.create_volume(self.context, size=5)
+        parent_id = self._create_backup(
+            volume['id'], status='available',
+            service='cinder.backup.services.swift')
+        timeutils.set_time_override(timeutils.utcnow() +
+                                    datetime.timedelta(seconds=10))
+        self.addCleanup(timeutils.clear_time_override)
+        self._create_backup(volume['id'], status='available',
+                            service='cinder.backup.drivers.ceph')
+
+        latest_backup = self.backup_api._get_latest_backup(self.context,
+                                                           volume)
+        self.assertEqual(parent_id, latest_backup['id'])
+
+        self.flags(backup_driver='cinder.backup.drivers.tsm')
+        self.assertIsNone(self.backup_api._get_latest_backup(self.context,
+                                                             volume))
+
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_create_incremental_backup_without_parent(
+            self, _mock_service_get_all_by_topic):
+        _mock_service_get_all_by_topic.return_value = [
+            {'availability_zone': "fake_az", 'host': 'test_host',
+             'disabled': 0, 'updated_at': timeutils.utcnow()}]
+
+        volume_id = utils.create_volume(self.context, size=5)['id']
+
+        body = {"backup": {"display_name": "nightly001",
+                           "volume_id": volume_id,
+                           "incremental": True,
+                           }
+                }
+        req = webob.Request.blank('/v2/fake/backups')
+        req.method = 'POST'
+        req.headers['Content-Type'] = 'application/json'
+        req.body = json.dumps(body)
+        res = req.get_response(fakes.wsgi_app())
+        res_dict = json.loads(res.body)
+
+        self.assertEqual(res.status_int, 400)
+        self.assertEqual(res_dict['badRequest']['code'], 400)
+        self.assertEqual(res_dict['badRequest']['message'],
+                         'Invalid backup: No backups available to do an '
+                         'incremental backup.')
+
+        db.volume_destroy(context.get_admin_context(), volume_id)
+
     @mock.patch('cinder.db.service_get_all_by_topic')
     def test_create_backup_xml(self, _mock_service_get_all_by_topic):
         _mock_service_get_all_by_topic.return_value = [
@@ -637,6 +766,45 @@ class BackupsAPITestCase(test.TestCase):
 
         db.backup_destroy(context.get_admin_context(), backup_id)
 
+    def test_delete_backup_with_dependent_backups(self):
+        backup_id = self._create_backup(status='available')
+        child_id = self._create_backup(status='available',
+                                       parent_id=backup_id)
+        req = webob.Request.blank('/v2/fake/backups/%s' %
+                                  backup_id)
+        req.method = 'DELETE'
+        req.headers['Content-Type'] = 'application/json'
+        res = req.get_response(fakes.wsgi_app())
+        res_dict = json.loads(res.body)
+
+        self.assertEqual(res.status_int, 400)
+        self.assertEqual(res_dict['badRequest']['message'],
+                         'Invalid backup: Incremental backups exist for '
+                         'this backup.')
+        self.assertEqual(self._get_backup_attrib(backup_id, 'status'),
+                         'available')
+
+        db.backup_destroy(context.get_admin_context(), child_id)
+        db.backup_destroy(context.get_admin_context(), backup_id)
+
+    def test_delete_backup_with_dependent_backups_of_other_project(self):
+        backup_id = self._create_backup(status='available')
+        child_id = self._create_backup(status='available',
+                                       parent_id=backup_id,
+                                       project_id='admin')
+        req = webob.Request.blank('/v2/fake/backups/%s' %
+                                  backup_id)
+        req.method = 'DELETE'
+        req.headers['Content-Type'] = 'application/json'
+        res = req.get_response(fakes.wsgi_app())
+
+        self.assertEqual(res.status_int, 400)
+        self.assertEqual(self._get_backup_attrib(backup_id, 'status'),
+                         'available')
+
+        db.backup_destroy(context.get_admin_context(), child_id)
+        db.backup_destroy(context.get_admin_context(), backup_id)
+
     def test_delete_backup_with_backup_NotFound(self):
         req = webob.Request.blank('/v2/fake/backups/9999')
         req.method = 'DELETE'
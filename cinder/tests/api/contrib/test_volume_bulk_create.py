@@ -0,0 +1,80 @@
+#   Copyright (c) 2014 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+import mock
+import webob
+
+from cinder import context
+from cinder.openstack.common import jsonutils
+from cinder import test
+from cinder.tests.api import fakes
+from cinder.tests.api.v2 import stubs
+
+
+def app():
+    # no auth, just let environ['cinder.context'] pass through
+    api = fakes.router.APIRouter()
+    mapper = fakes.urlmap.URLMap()
+    mapper['/v2'] = api
+    return mapper
+
+
+def api_create_many(context, count, size, name, description, **kwargs):
+    """Replacement for cinder.volume.api.API.create_many."""
+    return [stubs.stub_volume('volume%d' % index, size=size,
+                              display_name=name, created_at=None)
+            for index in range(count)]
+
+
+class VolumeBulkCreateTest(test.TestCase):
+    """Test cases for cinder/api/contrib/volume_bulk_create.py"""
+
+    def _get_resp(self, body):
+        req = webob.Request.blank('/v2/fake/os-volume-bulk-create')
+        req.method = 'POST'
+        req.headers['Content-Type'] = 'application/json'
+        req.environ['cinder.context'] = context.RequestContext('fake',
+                                                               'fake')
+        req.body = jsonutils.dumps(body)
+        return req.get_response(app())
+
+    @mock.patch('cinder.volume.api.API.create_many',
+                side_effect=api_create_many)
+    def test_bulk_create(self, mock_create_many):
+        body = {'volume': {'count': 2, 'size': 1, 'name': 'vol',
+                           'scheduler_hints': {'different_host': ['id']}}}
+        res = self._get_resp(body)
+        self.assertEqual(202, res.status_int, res)
+
+        volumes = jsonutils.loads(res.body)['volumes']
+        self.assertEqual(['volume0', 'volume1'],
+                         [volume['id'] for volume in volumes])
+        mock_create_many.assert_called_once_with(
+            mock.ANY, 2, 1, 'vol', None, metadata=None,
+            availability_zone=None,
+            scheduler_hints={'different_host': ['id']})
+
+    def test_bulk_create_missing_count(self):
+        res = self._get_resp({'volume': {'size': 1}})
+        self.assertEqual(400, res.status_int)
+
+    def test_bulk_create_too_many(self):
+        self.flags(volume_bulk_create_max_count=2)
+        res = self._get_resp({'volume': {'count': 3, 'size': 1}})
+        self.assertEqual(400, res.status_int)
+
+    def test_bulk_create_from_snapshot(self):
+        res = self._get_resp({'volume': {'count': 2, 'size': 1,
+                                         'snapshot_id': 'fake'}})
+        self.assertEqual(400, res.status_int)
@@ -17,9 +17,11 @@ import json
 import uuid
 from xml.dom import minidom
 
+import mock
 import webob
 
 from cinder.api import common
+from cinder.api.contrib import volume_image_metadata
 from cinder.api.openstack.wsgi import MetadataXMLDeserializer
 from cinder.api.openstack.wsgi import XMLDeserializer
 from cinder import db
@@ -106,6 +108,19 @@ class VolumeImageMetadataTest(test.TestCase):
         self.assertEqual(self._get_image_metadata_list(res.body)[0],
                          fake_image_metadata)
 
+    @mock.patch.object(volume.API, 'get_volumes_image_metadata',
+                       return_value={'fake': fake_image_metadata})
+    def test_list_detail_volumes_only_page_metadata(self, mock_get):
+        res = self._make_request('/v2/fake/volumes/detail')
+        self.assertEqual(res.status_int, 200)
+        mock_get.assert_called_once_with(mock.ANY, volume_ids=['fake'])
+
+    @mock.patch.object(volume.API, 'get_volumes_image_metadata')
+    def test_list_detail_empty_page_no_metadata(self, mock_get):
+        controller = volume_image_metadata.VolumeImageMetadataController()
+        self.assertEqual({}, controller._get_images_metadata(None, []))
+        self.assertFalse(mock_get.called)
+
 
 class ImageMetadataXMLDeserializer(common.MetadataXMLDeserializer):
     metadata_node_name = "volume_image_metadata"
@@ -0,0 +1,160 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+
+import eventlet
+import mock
+
+from cinder import context
+from cinder import exception
+from cinder.image import cache as image_cache
+from cinder.image import image_utils
+from cinder import test
+
+
+class FakeImageService(object):
+    def show(self, context, image_id):
+        return {'checksum': 'sum-%s' % image_id}
+
+
+class ImageCacheTestCase(test.TestCase):
+    def setUp(self):
+        super(ImageCacheTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.image_service = FakeImageService()
+        self.created = []
+        self.deleted = []
+        self.cache = image_cache.ImageCache('fake', 10, self._create,
+                                            self._delete)
+
+    def _create(self, context, image_service, image_id, key, size):
+        self.created.append(key)
+        eventlet.sleep(0)
+        return size
+
+    def _delete(self, key):
+        self.deleted.append(key)
+
+    def _get(self, image_id, size=4):
+        with self.cache.get(self.context, self.image_service, image_id,
+                            size=size) as key:
+            return key
+
+    def test_get_key(self):
+        self.assertEqual('img1-sum-img1', self._get('img1'))
+        self.assertEqual('img1-none',
+                         image_cache.ImageCache.get_key('img1', {}))
+
+    def test_hit_and_miss(self):
+        self._get('img1')
+        self._get('img1')
+        self._get('img2')
+
+        self.assertEqual(['img1-sum-img1', 'img2-sum-img2'], self.created)
+        stats = self.cache.get_stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(2, stats['misses'])
+        self.assertEqual(2, stats['entries'])
+        self.assertEqual(8, stats['size'])
+
+    def test_evicts_least_recently_used(self):
+        self._get('img1')
+        self._get('img2')
+        self._get('img1')
+        self._get('img3')
+
+        self.assertEqual(['img2-sum-img2'], self.deleted)
+        self.assertEqual(1, self.cache.get_stats()['evictions'])
+
+    def test_entry_in_use_not_evicted(self):
+        with self.cache.get(self.context, self.image_service, 'img1',
+                            size=8):
+            self._get('img2')
+            self._get('img3')
+            self.assertEqual(['img2-sum-img2'], self.deleted)
+        self._get('img4')
+        self.assertEqual(['img2-sum-img2', 'img1-sum-img1'], self.deleted)
+
+    def test_concurrent_gets_fetch_once(self):
+        threads = [eventlet.spawn(self._get, 'img1') for _i in range(5)]
+        keys = [thread.wait() for thread in threads]
+
+        self.assertEqual(['img1-sum-img1'] * 5, keys)
+        self.assertEqual(['img1-sum-img1'], self.created)
+        self.assertEqual(4, self.cache.get_stats()['hits'])
+
+    def test_failed_fetch_not_cached(self):
+        self.cache._create_entry = mock.Mock(
+            side_effect=exception.ImageUnacceptable(image_id='img1',
+                                                    reason='bad'))
+        self.assertRaises(exception.ImageUnacceptable, self._get, 'img1')
+        self.assertEqual(0, self.cache.get_stats()['entries'])
+
+
+class FileImageCacheTestCase(test.TestCase):
+    def setUp(self):
+        super(FileImageCacheTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def _write(self, name, data):
+        with open(os.path.join(self.cache_dir, name), 'wb') as f:
+            f.write(data)
+
+    def test_existing_entries(self):
+        self._write('img1-sum', 'abc')
+        self._write('img2-sum.part', 'abcdef')
+
+        cache = image_cache.FileImageCache('fake', 10, self.cache_dir, '1M')
+
+        self.assertEqual(['img1-sum'], os.listdir(self.cache_dir))
+        self.assertEqual(1, cache.get_stats()['entries'])
+        self.assertEqual(3, cache.get_stats()['size'])
+
+    @mock.patch.object(image_utils, 'fetch_to_raw')
+    def test_fetch_image(self, mock_fetch):
+
+        def _fetch(context, image_service, image_id, path, blocksize,
+                   size=None):
+            with open(path, 'wb') as f:
+                f.write('raw data')
+
+        mock_fetch.side_effect = _fetch
+        cache = image_cache.FileImageCache('fake', 10, self.cache_dir, '1M')
+
+        with cache.get(self.context, FakeImageService(), 'img1',
+                       size=1) as key:
+            with open(cache.get_path(key)) as f:
+                self.assertEqual('raw data', f.read())
+
+        mock_fetch.assert_called_once_with(
+            self.context, mock.ANY, 'img1',
+            os.path.join(self.cache_dir, 'img1-sum-img1.part'), '1M', size=1)
+        self.assertEqual(['img1-sum-img1'], os.listdir(self.cache_dir))
+
+    @mock.patch.object(image_utils, 'fetch_to_raw')
+    def test_fetch_image_error(self, mock_fetch):
+        mock_fetch.side_effect = exception.ImageUnacceptable(image_id='img1',
+                                                             reason='bad')
+        cache = image_cache.FileImageCache('fake', 10, self.cache_dir, '1M')
+
+        self.assertRaises(exception.ImageUnacceptable,
+                          cache.get(self.context, FakeImageService(),
+                                    'img1').__enter__)
+        self.assertEqual([], os.listdir(self.cache_dir))
@@ -0,0 +1,183 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For capability deltas.
+"""
+
+import copy
+
+import mock
+
+from cinder import context
+from cinder import manager
+from cinder.scheduler import capabilities
+from cinder.scheduler import host_manager
+from cinder.scheduler import rpcapi
+from cinder import test
+
+
+def _pool(name, free):
+    return {'pool_name': name, 'free_capacity_gb': free,
+            'total_capacity_gb': 100, 'reserved_percentage': 0}
+
+
+OLD_CAPABILITIES = {'volume_backend_name': 'lvm',
+                    'vendor_name': 'OpenStack',
+                    'QoS_support': False,
+                    'pools': [_pool('pool1', 10), _pool('pool2', 20),
+                              _pool('pool3', 30)]}
+
+NEW_CAPABILITIES = {'volume_backend_name': 'lvm',
+                    'vendor_name': 'Open Source',
+                    'driver_version': '2.0',
+                    'pools': [_pool('pool1', 10), _pool('pool3', 5),
+                              _pool('pool4', 40)]}
+
+
+class CapabilitiesDeltaTestCase(test.TestCase):
+
+    def test_diff_capabilities(self):
+        delta = capabilities.diff_capabilities(OLD_CAPABILITIES,
+                                               NEW_CAPABILITIES)
+        self.assertEqual({'updated': {'vendor_name': 'Open Source',
+                                      'driver_version': '2.0'},
+                          'removed': ['QoS_support'],
+                          'pools': {'pool3': _pool('pool3', 5),
+                                    'pool4': _pool('pool4', 40)},
+                          'removed_pools': ['pool2']}, delta)
+
+    def test_apply_capabilities_delta(self):
+        old = copy.deepcopy(OLD_CAPABILITIES)
+        delta = capabilities.diff_capabilities(OLD_CAPABILITIES,
+                                               NEW_CAPABILITIES)
+
+        self.assertEqual(NEW_CAPABILITIES,
+                         capabilities.apply_capabilities_delta(old, delta))
+        self.assertEqual(OLD_CAPABILITIES, old)
+
+    def test_no_pools(self):
+        old = {'free_capacity_gb': 10, 'total_capacity_gb': 100}
+        new = {'free_capacity_gb': 5, 'total_capacity_gb': 100}
+        delta = capabilities.diff_capabilities(old, new)
+
+        self.assertEqual({'free_capacity_gb': 5}, delta['updated'])
+        self.assertEqual(new,
+                         capabilities.apply_capabilities_delta(old, delta))
+
+
+class HostManagerDeltaTestCase(test.TestCase):
+
+    def setUp(self):
+        super(HostManagerDeltaTestCase, self).setUp()
+        self.host_manager = host_manager.HostManager()
+
+    def _update(self, caps, generation, delta=False):
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', caps, generation=generation, delta=delta)
+
+    def _pools(self):
+        return self.host_manager.service_states['host1']['pools']
+
+    def test_delta_merged(self):
+        self._update(OLD_CAPABILITIES, 1)
+        delta = capabilities.diff_capabilities(OLD_CAPABILITIES,
+                                               NEW_CAPABILITIES)
+        self._update(delta, 2, delta=True)
+
+        self.assertEqual(NEW_CAPABILITIES['pools'], self._pools())
+        self.assertEqual('Open Source',
+                         self.host_manager.service_states['host1'][
+                             'vendor_name'])
+
+    def test_delta_out_of_sequence_dropped(self):
+        self._update(OLD_CAPABILITIES, 1)
+        delta = capabilities.diff_capabilities(OLD_CAPABILITIES,
+                                               NEW_CAPABILITIES)
+        self._update(delta, 3, delta=True)
+        self.assertEqual(OLD_CAPABILITIES['pools'], self._pools())
+
+        # Full reports always apply.
+        self._update(NEW_CAPABILITIES, 4)
+        self.assertEqual(NEW_CAPABILITIES['pools'], self._pools())
+
+    def test_delta_without_full_report_dropped(self):
+        self._update({'updated': {'free_capacity_gb': 1}}, 1, delta=True)
+        self.assertEqual({}, self.host_manager.service_states)
+
+    @mock.patch('cinder.volume.rpcapi.VolumeAPI.'
+                'publish_service_capabilities')
+    def test_delta_out_of_sequence_requests_full_report(self, mock_publish):
+        self._update(OLD_CAPABILITIES, 1)
+        delta = capabilities.diff_capabilities(OLD_CAPABILITIES,
+                                               NEW_CAPABILITIES)
+        self._update(delta, 3, delta=True)
+        self._update(delta, 4, delta=True)
+        mock_publish.assert_called_once_with(mock.ANY, host='host1')
+
+        # Once the full report is in, the next gap is reported again.
+        self._update(NEW_CAPABILITIES, 5)
+        self._update(delta, 7, delta=True)
+        self.assertEqual(2, mock_publish.call_count)
+
+
+class SchedulerDependentManagerTestCase(test.TestCase):
+
+    def setUp(self):
+        super(SchedulerDependentManagerTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.manager = manager.SchedulerDependentManager(
+            host='host1', service_name='volume')
+        self.mock_update = mock.Mock()
+        self.manager.scheduler_rpcapi.update_service_capabilities = (
+            self.mock_update)
+
+    def _publish(self, caps, full=False):
+        self.manager.update_service_capabilities(copy.deepcopy(caps))
+        self.manager._publish_service_capabilities(self.context, full=full)
+
+    def test_publish_deltas(self):
+        self._publish(OLD_CAPABILITIES)
+        self._publish(NEW_CAPABILITIES)
+        self._publish(NEW_CAPABILITIES, full=True)
+
+        delta = capabilities.diff_capabilities(OLD_CAPABILITIES,
+                                               NEW_CAPABILITIES)
+        self.assertEqual(
+            [mock.call(self.context, 'volume', 'host1', OLD_CAPABILITIES,
+                       generation=1),
+             mock.call(self.context, 'volume', 'host1', delta,
+                       generation=2, delta=True),
+             mock.call(self.context, 'volume', 'host1', NEW_CAPABILITIES,
+                       generation=3)],
+            self.mock_update.call_args_list)
+
+    def test_publish_full_reports_to_old_schedulers(self):
+        self.flags(scheduler_rpc_version_cap='1.7')
+        self.manager.scheduler_rpcapi = rpcapi.SchedulerAPI()
+        self.manager.scheduler_rpcapi.update_service_capabilities = (
+            self.mock_update)
+        self._publish(OLD_CAPABILITIES)
+        self._publish(NEW_CAPABILITIES)
+
+        self.mock_update.assert_called_with(self.context, 'volume', 'host1',
+                                            NEW_CAPABILITIES, generation=2)
+
+    def test_publish_full_reports(self):
+        self.flags(capabilities_full_report_interval=0)
+        self._publish(OLD_CAPABILITIES)
+        self._publish(NEW_CAPABILITIES)
+
+        self.mock_update.assert_called_with(self.context, 'volume', 'host1',
+                                            NEW_CAPABILITIES, generation=2)
@@ -20,6 +20,7 @@ import mock
 
 from cinder import context
 from cinder import exception
+from cinder.openstack.common.scheduler import base_weight
 from cinder.scheduler import filter_scheduler
 from cinder.scheduler import host_manager
 from cinder.tests.scheduler import fakes
@@ -162,6 +163,64 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.assertIsNotNone(weighed_host.obj)
         self.assertTrue(_mock_service_get_all_by_topic.called)
 
+    @mock.patch('cinder.scheduler.driver.volume_update_db')
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_schedule_create_volumes(self, _mock_service_get_all_by_topic,
+                                     _mock_volume_update_db):
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = fakes.FakeHostManager()
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
+        request_spec = {'volume_type': {'name': 'LVM_iSCSI'},
+                        'volume_properties': {'project_id': 1,
+                                              'size': 1},
+                        'volume_id': None,
+                        'image_id': None}
+
+        with mock.patch.object(sched.host_manager, 'get_weighed_hosts',
+                               wraps=sched.host_manager.get_weighed_hosts
+                               ) as mock_weigh:
+            with mock.patch.object(sched.volume_rpcapi,
+                                   'create_volume') as mock_create:
+                unplaced = sched.schedule_create_volumes(
+                    fake_context, ['vol1', 'vol2', 'vol3'], request_spec, {})
+
+        self.assertEqual([], unplaced)
+        self.assertEqual(1, mock_weigh.call_count)
+        self.assertEqual(3, mock_create.call_count)
+        self.assertEqual(['vol1', 'vol2', 'vol3'],
+                         [call[0][3]['volume_id']
+                          for call in mock_create.call_args_list])
+        # Every volume has its own retry history.
+        for call in mock_create.call_args_list:
+            self.assertEqual(1, len(call[0][4]['retry']['hosts']))
+
+    def _weighed_hosts(self):
+        return [base_weight.WeighedObject(
+            fakes.FakeHostState(host, {'free_capacity_gb': 10,
+                                       'reserved_percentage': 0,
+                                       'allocated_capacity_gb': 0}),
+            weight)
+            for host, weight in (('host1', 2.0), ('host2', 1.0))]
+
+    def _test_place_volumes(self, placement, expected):
+        self.flags(scheduler_bulk_placement=placement)
+        sched = fakes.FakeFilterScheduler()
+        placements = sched._place_volumes(self._weighed_hosts(),
+                                          {'size': 4}, 5)
+        self.assertEqual(expected,
+                         [weighed_host.obj.host
+                          for weighed_host in placements])
+
+    def test_place_volumes_spread(self):
+        self._test_place_volumes('spread',
+                                 ['host1', 'host2', 'host1', 'host2'])
+
+    def test_place_volumes_pack(self):
+        self._test_place_volumes('pack',
+                                 ['host1', 'host1', 'host2', 'host2'])
+
     def test_max_attempts(self):
         self.flags(scheduler_max_attempts=4)
 
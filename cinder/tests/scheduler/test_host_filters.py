@@ -21,6 +21,8 @@ from cinder import context
 from cinder import db
 from cinder.openstack.common import jsonutils
 from cinder.openstack.common.scheduler import filters
+from cinder.openstack.common.scheduler.filters import extra_specs_ops
+from cinder.scheduler.filters import capabilities_filter
 from cinder import test
 from cinder.tests.scheduler import fakes
 from cinder.tests import utils
@@ -317,3 +319,85 @@ class HostFiltersTestCase(test.TestCase):
             'same_host': "NOT-a-valid-UUID", }}
 
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
+
+    def test_affinity_filter_all(self):
+        hosts = [fakes.FakeHostState(host, {})
+                 for host in ('host1#pool0', 'host1#pool1', 'host2')]
+        volume1 = utils.create_volume(self.context, host='host1#pool0')
+        volume2 = utils.create_volume(self.context, host='host2')
+        filter_properties = {'context': self.context.elevated(),
+                             'scheduler_hints': {
+            'different_host': [volume1.id, volume2.id],
+            'same_host': [volume1.id]}}
+
+        different_filter = self.class_map['DifferentBackendFilter']()
+        same_filter = self.class_map['SameBackendFilter']()
+        with mock.patch.object(db, 'volume_get_hosts_by_project',
+                               wraps=db.volume_get_hosts_by_project) as get:
+            self.assertEqual(
+                ['host1#pool1'],
+                [host.host for host in different_filter.filter_all(
+                    hosts, filter_properties)])
+            self.assertEqual(
+                ['host1#pool0'],
+                [host.host for host in same_filter.filter_all(
+                    hosts, filter_properties)])
+        self.assertEqual(2, get.call_count)
+
+    def test_capacity_filter_all(self):
+        filt_cls = self.class_map['CapacityFilter']()
+        hosts = [fakes.FakeHostState('host%d' % i,
+                                     {'free_capacity_gb': free,
+                                      'reserved_percentage': 0})
+                 for i, free in enumerate([50, 200, 'unknown', None])]
+        filter_properties = {'size': 100, 'vol_exists_on': 'host0'}
+
+        self.assertEqual(hosts[:3],
+                         filt_cls.filter_all(hosts, filter_properties))
+
+    def test_capabilities_filter_all(self):
+        filt_cls = self.class_map['CapabilitiesFilter']()
+        hosts = []
+        for thin, iops in [('True', 1000), ('False', 1000), ('True', 10)]:
+            capabilities = {'thin': thin, 'opts': {'iops': iops}}
+            hosts.append(fakes.FakeHostState('host%d' % len(hosts),
+                                             {'capabilities': capabilities}))
+        resource_type = {'extra_specs': {'capabilities:thin': '<is> True',
+                                         'capabilities:opts:iops': '>= 100',
+                                         'qos:iops': '5000'}}
+        filter_properties = {'resource_type': resource_type}
+
+        self.assertEqual(hosts[:1],
+                         filt_cls.filter_all(hosts, filter_properties))
+        self.assertTrue(filt_cls.host_passes(hosts[0], filter_properties))
+        self.assertFalse(filt_cls.host_passes(hosts[1], filter_properties))
+        self.assertEqual(hosts, filt_cls.filter_all(hosts, {}))
+
+
+class CompiledExtraSpecsTestCase(test.TestCase):
+    """Test compiled extra specs against extra_specs_ops.match()."""
+
+    def test_compile_requirement(self):
+        cases = [(10, '= 5'), (10, '= 50'), ('10', '== 10'), (10, '!= 10'),
+                 (10, '>= 10'), (10, '<= 5'), (10, '>= foo'),
+                 ('foo', '>= 10'), ('abc', 's== abc'), ('abc', 's!= abc'),
+                 ('abc', 's< abd'), ('abc', 's<= abc'), ('abc', 's> abd'),
+                 ('abc', 's>= abd'), ('abc def', '<in> def'),
+                 ('abc', '<in> x'), ('True', '<is> True'), (False, '<is> t'),
+                 ('b', '<or> a <or> b <or> c'), ('d', '<or> a <or> b'),
+                 ('abc', 'abc'), ('abc', 'abd'), ('abc', 'foo abc'),
+                 ('12', '>='), ('12', ''), ('', '')]
+        for value, req in cases:
+            self.assertEqual(extra_specs_ops.match(value, req),
+                             capabilities_filter.compile_requirement(req)(
+                                 value),
+                             '%r %r' % (value, req))
+
+    def test_compiled_specs_cached(self):
+        filt = capabilities_filter.CapabilitiesFilter()
+        specs = {'extra_specs': {'thin': '<is> True'}}
+        with mock.patch.object(capabilities_filter, 'compile_extra_specs',
+                               return_value=[]) as mock_compile:
+            filt._get_compiled_specs(specs)
+            filt._get_compiled_specs({'extra_specs': {'thin': '<is> True'}})
+        self.assertEqual(1, mock_compile.call_count)
@@ -16,6 +16,11 @@
 Tests For HostManager
 """
 
+import datetime
+import os
+import shutil
+import tempfile
+
 import mock
 from oslo.config import cfg
 
@@ -120,6 +125,7 @@ class HostManagerTestCase(test.TestCase):
     @mock.patch('cinder.utils.service_is_up')
     def test_get_all_host_states(self, _mock_service_is_up,
                                  _mock_service_get_all_by_topic):
+        self.flags(scheduler_service_refresh_interval=0)
         context = 'fake_context'
         topic = CONF.volume_topic
 
@@ -271,6 +277,113 @@ class HostManagerTestCase(test.TestCase):
             self.assertEqual(len(expected), len(res))
             self.assertEqual(sorted(expected), sorted(res))
 
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    @mock.patch('cinder.utils.service_is_up', return_value=True)
+    def test_get_all_host_states_cached(self, _mock_service_is_up,
+                                        _mock_service_get_all_by_topic):
+        context = 'fake_context'
+        services = [
+            dict(id=1, host='host1', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow()),
+        ]
+        _mock_service_get_all_by_topic.return_value = services
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', dict(free_capacity_gb=100,
+                                    total_capacity_gb=200,
+                                    reserved_percentage=0))
+
+        pools = list(self.host_manager.get_all_host_states(context))
+        self.assertEqual(1, len(pools))
+        self.assertEqual(100, pools[0].free_capacity_gb)
+        self.assertEqual('zone1', pools[0].service['availability_zone'])
+
+        # Capability updates are applied without reading the services.
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', dict(free_capacity_gb=50,
+                                    total_capacity_gb=200,
+                                    reserved_percentage=0))
+        self.assertEqual(pools,
+                         list(self.host_manager.get_all_host_states(context)))
+        self.assertEqual(50, pools[0].free_capacity_gb)
+        self.assertEqual('zone1', pools[0].service['availability_zone'])
+        self.assertEqual(1, _mock_service_get_all_by_topic.call_count)
+
+        # A new service is picked up as soon as it reports.
+        services.append(dict(id=2, host='host2', topic='volume',
+                             disabled=False, availability_zone='zone1',
+                             updated_at=timeutils.utcnow()))
+        self.host_manager.update_service_capabilities(
+            'volume', 'host2', dict(free_capacity_gb=10,
+                                    total_capacity_gb=20,
+                                    reserved_percentage=0))
+        pools = list(self.host_manager.get_all_host_states(context))
+        self.assertEqual(2, len(pools))
+        self.assertEqual(2, _mock_service_get_all_by_topic.call_count)
+
+    def test_save_and_load_capabilities(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.flags(scheduler_capabilities_file=os.path.join(tmp_dir,
+                                                            'caps.json'))
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', dict(free_capacity_gb=100,
+                                    pools=[{'pool_name': 'pool1'}]))
+        self.host_manager.update_service_capabilities(
+            'volume', 'host2', dict(free_capacity_gb=200))
+        self.host_manager.service_states['host2']['timestamp'] = (
+            timeutils.utcnow() - datetime.timedelta(hours=2))
+        self.host_manager.save_capabilities()
+
+        new_manager = host_manager.HostManager()
+        new_manager.update_service_capabilities(
+            'volume', 'host3', dict(free_capacity_gb=300))
+        new_manager.load_capabilities()
+
+        self.assertEqual(['host1', 'host3'],
+                         sorted(new_manager.service_states))
+        self.assertEqual(self.host_manager.service_states['host1'],
+                         new_manager.service_states['host1'])
+        self.assertEqual(set(['host1']), new_manager.stale_hosts)
+
+        new_manager.update_service_capabilities(
+            'volume', 'host1', dict(free_capacity_gb=50))
+        self.assertEqual(set(), new_manager.stale_hosts)
+
+    def test_get_weighed_hosts_stale_last(self):
+        self.flags(scheduler_default_weighers=['CapacityWeigher'])
+        hosts = []
+        for host, free in (('host1@lvm', 100), ('host2@lvm', 50),
+                           ('host3@lvm', 10)):
+            pool = host_manager.PoolState(host, None, 'pool')
+            pool.total_capacity_gb = 200
+            pool.free_capacity_gb = free
+            pool.reserved_percentage = 0
+            hosts.append(pool)
+
+        weighed = self.host_manager.get_weighed_hosts(hosts, {})
+        self.assertEqual(['host1@lvm#pool', 'host2@lvm#pool',
+                          'host3@lvm#pool'],
+                         [weighed_host.obj.host for weighed_host in weighed])
+
+        # Hosts with loaded capabilities only get picked when no host that
+        # reported its own passes the filters.
+        self.host_manager.stale_hosts.add('host1@lvm')
+        weighed = self.host_manager.get_weighed_hosts(hosts, {})
+        self.assertEqual(['host2@lvm#pool', 'host3@lvm#pool',
+                          'host1@lvm#pool'],
+                         [weighed_host.obj.host for weighed_host in weighed])
+
+    def test_load_capabilities_bad_file(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'caps.json')
+        with open(path, 'w') as f:
+            f.write('{not json')
+        self.flags(scheduler_capabilities_file=path)
+
+        self.host_manager.load_capabilities()
+        self.assertEqual({}, self.host_manager.service_states)
+
 
 class HostStateTestCase(test.TestCase):
     """Test case for HostState class."""
@@ -59,6 +59,15 @@ class SchedulerManagerTestCase(test.TestCase):
         manager = self.manager
         self.assertIsInstance(manager.driver, self.driver_cls)
 
+    @mock.patch('cinder.volume.rpcapi.VolumeAPI.'
+                'publish_service_capabilities')
+    @mock.patch('cinder.scheduler.host_manager.HostManager.'
+                'load_capabilities')
+    def test_init_host(self, _mock_load, _mock_publish):
+        self.manager.init_host()
+        _mock_load.assert_called_once_with()
+        self.assertTrue(_mock_publish.called)
+
     @mock.patch('cinder.scheduler.driver.Scheduler.'
                 'update_service_capabilities')
     def test_update_service_capabilities_empty_dict(self, _mock_update_cap):
@@ -69,7 +78,9 @@ class SchedulerManagerTestCase(test.TestCase):
         self.manager.update_service_capabilities(self.context,
                                                  service_name=service,
                                                  host=host)
-        _mock_update_cap.assert_called_once_with(service, host, {})
+        _mock_update_cap.assert_called_once_with(service, host, {},
+                                                 generation=None,
+                                                 delta=False)
 
     @mock.patch('cinder.scheduler.driver.Scheduler.'
                 'update_service_capabilities')
@@ -82,8 +93,10 @@ class SchedulerManagerTestCase(test.TestCase):
         self.manager.update_service_capabilities(self.context,
                                                  service_name=service,
                                                  host=host,
-                                                 capabilities=capabilities)
-        _mock_update_cap.assert_called_once_with(service, host, capabilities)
+                                                 capabilities=capabilities,
+                                                 generation=2, delta=True)
+        _mock_update_cap.assert_called_once_with(service, host, capabilities,
+                                                 generation=2, delta=True)
 
     @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volume')
     @mock.patch('cinder.db.volume_update')
@@ -105,6 +118,22 @@ class SchedulerManagerTestCase(test.TestCase):
         _mock_sched_create.assert_called_once_with(self.context, request_spec,
                                                    {})
 
+    @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volumes')
+    @mock.patch('cinder.db.volume_update')
+    def test_create_volumes_puts_unplaced_volumes_in_error_state(
+            self, _mock_volume_update, _mock_sched_create):
+        _mock_sched_create.return_value = ['vol3']
+        request_spec = {'volume_id': None}
+
+        self.manager.create_volumes(self.context, 'fake_topic',
+                                    ['vol1', 'vol2', 'vol3'],
+                                    request_spec=request_spec,
+                                    filter_properties={})
+        _mock_sched_create.assert_called_once_with(
+            self.context, ['vol1', 'vol2', 'vol3'], request_spec, {})
+        _mock_volume_update.assert_called_once_with(self.context, 'vol3',
+                                                    {'status': 'error'})
+
     @mock.patch('cinder.scheduler.driver.Scheduler.host_passes_filters')
     @mock.patch('cinder.db.volume_update')
     def test_migrate_volume_exception_returns_volume_state(
@@ -261,6 +290,18 @@ class SchedulerDriverBaseTestCase(SchedulerTestCase):
        that can't will fail if the driver is changed.
     """
 
+    @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volume')
+    def test_schedule_create_volumes(self, _mock_sched_create):
+        _mock_sched_create.side_effect = [None,
+                                          exception.NoValidHost(reason="")]
+        unplaced = self.driver.schedule_create_volumes(
+            self.context, ['vol1', 'vol2'], {'volume_id': None}, {})
+
+        self.assertEqual(['vol2'], unplaced)
+        self.assertEqual([mock.call(self.context, {'volume_id': 'vol1'}, {}),
+                          mock.call(self.context, {'volume_id': 'vol2'}, {})],
+                         _mock_sched_create.call_args_list)
+
     def test_unimplemented_schedule(self):
         fake_args = (1, 2, 3)
         fake_kwargs = {'cat': 'meow'}
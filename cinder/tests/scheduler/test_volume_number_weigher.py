@@ -46,6 +46,11 @@ def fake_volume_data_get_for_host(context, host, count_only=False):
         return 6
 
 
+def fake_volume_data_get_for_hosts(context, hosts, count_only=False):
+    return dict((host, fake_volume_data_get_for_host(context, host))
+                for host in hosts)
+
+
 class VolumeNumberWeigherTestCase(test.TestCase):
     def setUp(self):
         super(VolumeNumberWeigherTestCase, self).setUp()
@@ -80,10 +85,12 @@ class VolumeNumberWeigherTestCase(test.TestCase):
         # host4: 4 volumes
         # host5: 5 volumes
         # so, host1 should win:
-        with mock.patch.object(api, 'volume_data_get_for_host',
-                               fake_volume_data_get_for_host):
+        with mock.patch.object(api, 'volume_data_get_for_hosts',
+                               side_effect=fake_volume_data_get_for_hosts
+                               ) as mock_get:
             weighed_host = self._get_weighed_host(hostinfo_list)
             self.assertEqual(weighed_host.weight, -1.0)
+            self.assertEqual(1, mock_get.call_count)
             self.assertEqual(utils.extract_host(weighed_host.obj.host),
                              'host1')
 
@@ -97,9 +104,11 @@ class VolumeNumberWeigherTestCase(test.TestCase):
         # host4: 4 volumes
         # host5: 5 volumes
         # so, host5 should win:
-        with mock.patch.object(api, 'volume_data_get_for_host',
-                               fake_volume_data_get_for_host):
+        with mock.patch.object(api, 'volume_data_get_for_hosts',
+                               side_effect=fake_volume_data_get_for_hosts
+                               ) as mock_get:
             weighed_host = self._get_weighed_host(hostinfo_list)
             self.assertEqual(weighed_host.weight, 5.0)
+            self.assertEqual(1, mock_get.call_count)
             self.assertEqual(utils.extract_host(weighed_host.obj.host),
                              'host5')
@@ -363,6 +363,27 @@ class BackupCephTestCase(test.TestCase):
             # Ensure the files are equal
             self.assertEqual(checksum.digest(), self.checksum.digest())
 
+    @common_mocks
+    def test_transfer_data_sparse_from_file_to_rbd(self):
+        self.mock_rbd.Image.write = mock.Mock()
+        self.mock_rbd.Image.discard = mock.Mock()
+        self.service.chunk_size = self.chunk_size
+
+        # Zero out the second chunk of the source.
+        self.volume_file.seek(self.chunk_size)
+        self.volume_file.write('\0' * self.chunk_size)
+        self.volume_file.seek(0)
+
+        rbd_io = self._get_wrapped_rbd_io(self.service.rbd.Image())
+        self.service._transfer_data(self.volume_file, 'src_foo',
+                                    rbd_io, 'dest_foo', self.data_length)
+
+        self.assertEqual(self.num_chunks - 1,
+                         self.mock_rbd.Image.write.call_count)
+        self.mock_rbd.Image.discard.assert_called_once_with(self.chunk_size,
+                                                            self.chunk_size)
+        self.assertEqual(self.data_length, rbd_io.tell())
+
     @common_mocks
     def test_backup_volume_from_file(self):
         checksum = hashlib.sha256()
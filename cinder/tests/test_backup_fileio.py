@@ -0,0 +1,75 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Tests for the volume file I/O of backup drivers."""
+
+import StringIO
+
+import mock
+
+from cinder.backup import fileio
+from cinder import test
+
+
+class ReadAheadTestCase(test.TestCase):
+
+    def test_read(self):
+        volume_file = StringIO.StringIO('abcdefg')
+
+        with fileio.ReadAhead(volume_file, 3, depth=2) as reader:
+            self.assertEqual(('abc', 3), reader.read())
+            self.assertEqual(('def', 6), reader.read())
+            self.assertEqual(('g', 7), reader.read())
+            self.assertEqual(('', 7), reader.read())
+            self.assertEqual(('', 7), reader.read())
+
+    def test_read_length(self):
+        volume_file = StringIO.StringIO('abcdefg')
+
+        with fileio.ReadAhead(volume_file, 3, length=5) as reader:
+            self.assertEqual(('abc', 3), reader.read())
+            self.assertEqual(('de', 5), reader.read())
+            self.assertEqual('', reader.read()[0])
+        self.assertEqual(5, volume_file.tell())
+
+    def test_read_error(self):
+        volume_file = mock.Mock()
+        volume_file.read.side_effect = IOError
+
+        with fileio.ReadAhead(volume_file, 3) as reader:
+            self.assertRaises(IOError, reader.read)
+            self.assertEqual('', reader.read()[0])
+
+
+class WriteBehindTestCase(test.TestCase):
+
+    def test_submit(self):
+        volume_file = StringIO.StringIO()
+
+        with fileio.WriteBehind(depth=2) as writer:
+            for data in ('abc', 'def', 'g'):
+                writer.submit(volume_file.write, data)
+            writer.wait()
+        self.assertEqual('abcdefg', volume_file.getvalue())
+
+    def test_submit_error(self):
+        write = mock.Mock(side_effect=[None, IOError, None])
+
+        with fileio.WriteBehind() as writer:
+            for data in ('abc', 'def', 'g'):
+                writer.submit(write, data)
+            self.assertRaises(IOError, writer.wait)
+        # The writes after the failed one are dropped.
+        self.assertEqual([mock.call('abc'), mock.call('def')],
+                         write.call_args_list)
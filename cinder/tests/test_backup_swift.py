@@ -17,12 +17,14 @@ Tests for Backup swift code.
 
 """
 
+import __builtin__
 import bz2
 import hashlib
 import os
 import tempfile
 import zlib
 
+import eventlet
 from oslo.config import cfg
 from swiftclient import client as swift
 
@@ -34,6 +36,7 @@ from cinder.i18n import _
 from cinder.openstack.common import log as logging
 from cinder import test
 from cinder.tests.backup.fake_swift_client import FakeSwiftClient
+from cinder.tests.backup.fake_swift_client import FakeSwiftConnection
 
 
 LOG = logging.getLogger(__name__)
@@ -59,11 +62,15 @@ class BackupSwiftTestCase(test.TestCase):
                'status': 'available'}
         return db.volume_create(self.ctxt, vol)['id']
 
-    def _create_backup_db_entry(self, container='test-container'):
-        backup = {'id': 123,
+    def _create_backup_db_entry(self, container='test-container',
+                                backup_id=123, parent_id=None,
+                                project_id=None):
+        backup = {'id': backup_id,
                   'size': 1,
                   'container': container,
-                  'volume_id': '1234-5678-1234-8888'}
+                  'volume_id': '1234-5678-1234-8888',
+                  'project_id': project_id,
+                  'parent_id': parent_id}
         return db.backup_create(self.ctxt, backup)['id']
 
     def setUp(self):
@@ -136,6 +143,146 @@ class BackupSwiftTestCase(test.TestCase):
         backup = db.backup_get(self.ctxt, 123)
         service.backup(backup, self.volume_file)
 
+    def test_backup_concurrent_object_list_ordered(self):
+        self._create_backup_db_entry()
+        self.flags(backup_swift_object_size=16 * 1024)
+        self.flags(backup_swift_object_concurrency=4)
+        service = SwiftBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+
+        # Make earlier objects take longer to upload than later ones.
+        delays = {}
+        put_object = FakeSwiftConnection.put_object
+
+        def fake_put_object(conn, container, name, reader, **kwargs):
+            delays.setdefault('next', 0.05)
+            delays['next'] = max(0, delays['next'] - 0.01)
+            eventlet.sleep(delays['next'])
+            return put_object(conn, container, name, reader, **kwargs)
+
+        self.stubs.Set(FakeSwiftConnection, 'put_object', fake_put_object)
+
+        written = {}
+
+        def fake_write_metadata(self, backup, volume_id, container,
+                                object_list, volume_meta):
+            written['objects'] = object_list
+
+        self.stubs.Set(SwiftBackupDriver, '_write_metadata',
+                       fake_write_metadata)
+        service.backup(backup, self.volume_file)
+
+        object_names = [obj.keys()[0] for obj in written['objects']]
+        self.assertEqual(8, len(object_names))
+        self.assertEqual(sorted(object_names), object_names)
+        offsets = [obj.values()[0]['offset'] for obj in written['objects']]
+        self.assertEqual(sorted(offsets), offsets)
+        backup = db.backup_get(self.ctxt, 123)
+        self.assertEqual(9, backup['object_count'])
+
+    def test_backup_incremental(self):
+        self._create_backup_db_entry()
+        self._create_backup_db_entry(backup_id=124, parent_id=123)
+        self.flags(backup_swift_object_size=16 * 1024)
+        self.flags(backup_compression_algorithm='none')
+        service = SwiftBackupDriver(self.ctxt)
+
+        written = {}
+
+        def fake_write_metadata(self, backup, volume_id, container,
+                                object_list, volume_meta):
+            written[backup['id']] = {'objects': object_list,
+                                     'parent_id': backup['parent_id']}
+
+        def fake_read_metadata(self, backup):
+            return written[backup['id']]
+
+        self.stubs.Set(SwiftBackupDriver, '_write_metadata',
+                       fake_write_metadata)
+        self.stubs.Set(SwiftBackupDriver, '_read_metadata',
+                       fake_read_metadata)
+
+        uploaded = []
+        put_object = FakeSwiftConnection.put_object
+
+        def fake_put_object(conn, container, name, reader, **kwargs):
+            uploaded.append(name)
+            return put_object(conn, container, name, reader, **kwargs)
+
+        self.stubs.Set(FakeSwiftConnection, 'put_object', fake_put_object)
+
+        self.volume_file.seek(0)
+        service.backup(db.backup_get(self.ctxt, 123), self.volume_file)
+        self.assertEqual(8, len(uploaded))
+        parent_names = [obj.keys()[0] for obj in written['123']['objects']]
+
+        # Change the third chunk of the volume only.
+        self.volume_file.seek(2 * 16 * 1024)
+        self.volume_file.write(os.urandom(1024))
+        self.volume_file.seek(0)
+        del uploaded[:]
+        service.backup(db.backup_get(self.ctxt, 124), self.volume_file)
+
+        self.assertEqual(1, len(uploaded))
+        child_names = [obj.keys()[0] for obj in written['124']['objects']]
+        self.assertEqual(8, len(child_names))
+        self.assertEqual(uploaded, [child_names[2]])
+        self.assertNotIn(child_names[2], parent_names)
+        self.assertEqual(parent_names[:2] + parent_names[3:],
+                         child_names[:2] + child_names[3:])
+        self.assertEqual('123', written['124']['parent_id'])
+
+    def test_backup_incremental_container_mismatch(self):
+        self._create_backup_db_entry()
+        self._create_backup_db_entry(container='other-container',
+                                     backup_id=124, parent_id=123)
+        service = SwiftBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 124)
+        self.assertRaises(exception.InvalidBackup,
+                          service.backup,
+                          backup, self.volume_file)
+
+    def test_backup_sparse(self):
+        self._create_backup_db_entry()
+        self.flags(backup_swift_object_size=16 * 1024)
+        service = SwiftBackupDriver(self.ctxt)
+
+        # Zero out the second and the last chunk of the volume.
+        self.volume_file.seek(16 * 1024)
+        self.volume_file.write('\0' * 16 * 1024)
+        self.volume_file.seek(7 * 16 * 1024)
+        self.volume_file.write('\0' * 16 * 1024)
+        self.volume_file.seek(0)
+
+        written = {}
+
+        def fake_write_metadata(self, backup, volume_id, container,
+                                object_list, volume_meta):
+            written['objects'] = object_list
+
+        self.stubs.Set(SwiftBackupDriver, '_write_metadata',
+                       fake_write_metadata)
+
+        uploaded = []
+        put_object = FakeSwiftConnection.put_object
+
+        def fake_put_object(conn, container, name, reader, **kwargs):
+            uploaded.append(name)
+            return put_object(conn, container, name, reader, **kwargs)
+
+        self.stubs.Set(FakeSwiftConnection, 'put_object', fake_put_object)
+        service.backup(db.backup_get(self.ctxt, 123), self.volume_file)
+
+        self.assertEqual(6, len(uploaded))
+        self.assertEqual(8, len(written['objects']))
+        holes = [obj.keys()[0] for obj in written['objects']
+                 if obj.values()[0].get('hole')]
+        self.assertEqual(2, len(holes))
+        self.assertNotIn(holes[0], uploaded)
+        self.assertNotIn(holes[1], uploaded)
+
     def test_backup_default_container(self):
         self._create_backup_db_entry(container=None)
         service = SwiftBackupDriver(self.ctxt)
@@ -165,6 +312,18 @@ class BackupSwiftTestCase(test.TestCase):
                           service.backup,
                           backup, self.volume_file)
 
+    def test_create_backup_concurrent_put_object_wraps_socket_error(self):
+        container_name = 'socket_error_on_put'
+        self._create_backup_db_entry(container=container_name)
+        self.flags(backup_swift_object_size=16 * 1024)
+        self.flags(backup_swift_object_concurrency=4)
+        service = SwiftBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+        self.assertRaises(exception.SwiftConnectionFailed,
+                          service.backup,
+                          backup, self.volume_file)
+
     def test_backup_backup_metadata_fail(self):
         """Test of when an exception occurs in backup().
 
@@ -229,6 +388,65 @@ class BackupSwiftTestCase(test.TestCase):
             backup = db.backup_get(self.ctxt, 123)
             service.restore(backup, '1234-5678-1234-8888', volume_file)
 
+    def test_restore_concurrent_writes_in_order(self):
+        self._create_backup_db_entry()
+        self.flags(backup_swift_object_concurrency=3)
+        service = SwiftBackupDriver(self.ctxt)
+        backup = db.backup_get(self.ctxt, 123)
+        names = ['backup_%03d' % i for i in range(1, 7)]
+        metadata = {'objects': [{name: {'compression': 'none'}}
+                                for name in names]}
+
+        def fake_generate_object_names(self, backup):
+            return names
+
+        self.stubs.Set(SwiftBackupDriver, '_generate_object_names',
+                       fake_generate_object_names)
+
+        # Make earlier objects take longer to download than later ones.
+        def fake_get_object(conn, container, name):
+            eventlet.sleep(0.01 * (7 - int(name[-3:])))
+            return None, name
+
+        self.stubs.Set(FakeSwiftConnection, 'get_object', fake_get_object)
+
+        with tempfile.NamedTemporaryFile() as volume_file:
+            service._restore_v1(backup, '1234-5678-1234-8888', metadata,
+                                volume_file)
+            volume_file.seek(0)
+            self.assertEqual(''.join(names), volume_file.read())
+
+    def test_restore_sparse(self):
+        self._create_backup_db_entry()
+        service = SwiftBackupDriver(self.ctxt)
+        backup = db.backup_get(self.ctxt, 123)
+        metadata = {'objects': [
+            {'backup_001': {'compression': 'none'}},
+            {'backup_002': {'length': 4096, 'hole': True}},
+            {'backup_003': {'compression': 'none'}}]}
+
+        def fake_generate_object_names(self, backup):
+            return ['backup_001', 'backup_003']
+
+        self.stubs.Set(SwiftBackupDriver, '_generate_object_names',
+                       fake_generate_object_names)
+
+        def fake_get_object(conn, container, name):
+            self.assertNotEqual('backup_002', name)
+            return None, 'x' * 4096
+
+        self.stubs.Set(FakeSwiftConnection, 'get_object', fake_get_object)
+
+        with tempfile.NamedTemporaryFile() as volume_file:
+            volume_file.write('y' * 3 * 4096)
+            volume_file.seek(0)
+            service._restore_v1(backup, '1234-5678-1234-8888', metadata,
+                                volume_file)
+            self.assertEqual(3 * 4096, volume_file.tell())
+            volume_file.seek(0)
+            self.assertEqual('x' * 4096 + '\0' * 4096 + 'x' * 4096,
+                             volume_file.read())
+
     def test_restore_wraps_socket_error(self):
         container_name = 'socket_error_on_get'
         self._create_backup_db_entry(container=container_name)
@@ -257,6 +475,25 @@ class BackupSwiftTestCase(test.TestCase):
         backup = db.backup_get(self.ctxt, 123)
         service.delete(backup)
 
+    def test_delete_with_dependent_backups(self):
+        self._create_backup_db_entry()
+        self._create_backup_db_entry(backup_id=124, parent_id=123)
+        service = SwiftBackupDriver(self.ctxt)
+        backup = db.backup_get(self.ctxt, 123)
+        self.assertRaises(exception.InvalidBackup,
+                          service.delete,
+                          backup)
+
+    def test_delete_with_dependent_backups_of_other_project(self):
+        self._create_backup_db_entry(project_id='fake')
+        self._create_backup_db_entry(backup_id=124, parent_id=123,
+                                     project_id='admin')
+        service = SwiftBackupDriver(self.ctxt)
+        backup = db.backup_get(self.ctxt, 123)
+        self.assertRaises(exception.InvalidBackup,
+                          service.delete,
+                          backup)
+
     def test_delete_wraps_socket_error(self):
         container_name = 'socket_error_on_delete'
         self._create_backup_db_entry(container=container_name)
@@ -271,7 +508,49 @@ class BackupSwiftTestCase(test.TestCase):
         compressor = service._get_compressor('None')
         self.assertIsNone(compressor)
         compressor = service._get_compressor('zlib')
-        self.assertEqual(compressor, zlib)
+        self.assertEqual('zlib', compressor.name)
+        self.assertEqual('data', zlib.decompress(compressor.compress('data')))
+        compressor = service._get_compressor('gzip')
+        self.assertEqual('zlib', compressor.name)
         compressor = service._get_compressor('bz2')
-        self.assertEqual(compressor, bz2)
+        self.assertEqual('bz2', compressor.name)
+        self.assertEqual('data', bz2.decompress(compressor.compress('data')))
         self.assertRaises(ValueError, service._get_compressor, 'fake')
+
+    def test_get_compressor_level(self):
+        self.flags(backup_compression_levels={'zlib': '1'})
+        service = SwiftBackupDriver(self.ctxt)
+        compressor = service._get_compressor('zlib')
+        data = os.urandom(1024) * 64
+        self.assertEqual(zlib.compress(data, 1), compressor.compress(data))
+
+    def test_get_compressor_not_installed(self):
+        real_import = __builtin__.__import__
+
+        def fake_import(name, *args, **kwargs):
+            if name == 'zstandard':
+                raise ImportError(name)
+            return real_import(name, *args, **kwargs)
+
+        self.stubs.Set(__builtin__, '__import__', fake_import)
+        service = SwiftBackupDriver(self.ctxt)
+        self.assertRaises(ValueError, service._get_compressor, 'zstd')
+
+    def test_backup_records_codec_name(self):
+        self._create_backup_db_entry()
+        self.flags(backup_compression_algorithm='bzip2')
+        service = SwiftBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+
+        written = {}
+
+        def fake_write_metadata(self, backup, volume_id, container,
+                                object_list, volume_meta):
+            written['objects'] = object_list
+
+        self.stubs.Set(SwiftBackupDriver, '_write_metadata',
+                       fake_write_metadata)
+        service.backup(backup, self.volume_file)
+        for obj in written['objects']:
+            self.assertEqual('bz2', obj.values()[0]['compression'])
@@ -82,7 +82,8 @@ class TestBlockDeviceDriver(cinder.test.TestCase):
         size = self.drv._get_device_size(path).AndReturn(1024)
         volutils.clear_volume(size, path,
                               volume_clear=mox.IgnoreArg(),
-                              volume_clear_size=mox.IgnoreArg())
+                              volume_clear_size=mox.IgnoreArg(),
+                              bps_limit=mox.IgnoreArg())
         self.mox.ReplayAll()
         self.drv.delete_volume(TEST_VOLUME1)
 
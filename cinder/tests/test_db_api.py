@@ -304,6 +304,39 @@ class DBAPIVolumeTestCase(BaseTest):
                              db.volume_data_get_for_host(
                                  self.ctxt, 'h%d' % i))
 
+    def test_volume_data_get_for_hosts(self):
+        for i in xrange(3):
+            for j in xrange(i + 1):
+                db.volume_create(self.ctxt, {'host': 'h%d' % i, 'size': 100})
+        self.assertEqual({'h0': (1, 100), 'h1': (2, 200), 'h3': (0, 0)},
+                         db.volume_data_get_for_hosts(self.ctxt,
+                                                      ['h0', 'h1', 'h3']))
+        self.assertEqual({'h1': 2, 'h2': 3},
+                         db.volume_data_get_for_hosts(self.ctxt,
+                                                      ['h1', 'h2'],
+                                                      count_only=True))
+        self.assertEqual({}, db.volume_data_get_for_hosts(self.ctxt, []))
+
+    def test_volume_get_hosts_by_project(self):
+        volumes = [db.volume_create(self.ctxt, {'project_id': project_id,
+                                                'host': host})
+                   for project_id, host in (('p1', 'h1'), ('p1', 'h2#pool'),
+                                            ('p2', 'h3'), ('p1', 'h4'))]
+        db.volume_update(self.ctxt, volumes[3]['id'],
+                         {'migration_status': 'target:fake'})
+        volume_ids = [volume['id'] for volume in volumes]
+
+        self.assertEqual({volume_ids[0]: 'h1', volume_ids[1]: 'h2#pool',
+                          volume_ids[3]: 'h4'},
+                         db.volume_get_hosts_by_project(self.ctxt, 'p1',
+                                                        volume_ids))
+        self.assertEqual({volume_ids[0]: 'h1', volume_ids[1]: 'h2#pool'},
+                         db.volume_get_hosts_by_project(
+                             self.ctxt, 'p1', volume_ids,
+                             no_migration_targets=True))
+        self.assertEqual({}, db.volume_get_hosts_by_project(self.ctxt, 'p1',
+                                                            []))
+
     def test_volume_data_get_for_project(self):
         for i in xrange(3):
             for j in xrange(3):
@@ -406,6 +439,26 @@ class DBAPIVolumeTestCase(BaseTest):
                                             self.ctxt, 'p%d' % i, None,
                                             None, 'host', None))
 
+    def test_volume_get_all_by_project_fields(self):
+        volumes = [db.volume_create(self.ctxt, {'project_id': 'p1',
+                                                'display_name': 'vol%d' % i,
+                                                'metadata': {'k': 'v%d' % i}})
+                   for i in xrange(3)]
+        marker = volumes[0]['id']
+
+        result = db.volume_get_all_by_project(self.ctxt, 'p1', None, None,
+                                              'display_name', 'asc',
+                                              fields=('id', 'display_name'))
+        self.assertEqual([{'id': volume['id'],
+                           'display_name': volume['display_name']}
+                          for volume in volumes], result)
+
+        result = db.volume_get_all_by_project(self.ctxt, 'p1', marker, 1,
+                                              'display_name', 'asc',
+                                              {'metadata': {'k': 'v2'}},
+                                              fields=('id',))
+        self.assertEqual([{'id': volumes[2]['id']}], result)
+
     def test_volume_get_by_name(self):
         db.volume_create(self.ctxt, {'display_name': 'vol1'})
         db.volume_create(self.ctxt, {'display_name': 'vol2'})
@@ -680,6 +733,18 @@ class DBAPIVolumeTestCase(BaseTest):
         self.assertEqual('h2', volume['host'])
         self.assertEqual(dict(ref_a), dict(volume))
 
+    def test_volume_update_all(self):
+        volumes = [db.volume_create(self.ctxt, {'host': 'h1'})
+                   for i in range(3)]
+
+        self.assertEqual(2, db.volume_update_all(
+            self.ctxt, [volumes[0]['id'], volumes[1]['id']], {'host': 'h2'}))
+        self.assertEqual(0, db.volume_update_all(self.ctxt, [],
+                                                 {'host': 'h2'}))
+        self.assertEqual(['h2', 'h2', 'h1'],
+                         [db.volume_get(self.ctxt, volume['id'])['host']
+                          for volume in volumes])
+
     def test_volume_update_nonexistent(self):
         self.assertRaises(exception.VolumeNotFound, db.volume_update,
                           self.ctxt, 42, {})
@@ -741,6 +806,51 @@ class DBAPISnapshotTestCase(BaseTest):
                                         db.snapshot_get_all(self.ctxt),
                                         ignored_keys=['metadata', 'volume'])
 
+    def test_snapshot_get_all_by_project_paginated(self):
+        db.volume_create(self.ctxt, {'id': 1})
+        snapshots = [db.snapshot_create(self.ctxt,
+                                        {'id': i, 'volume_id': 1,
+                                         'project_id': 'project1',
+                                         'display_name': 'snap%d' % i,
+                                         'status': status})
+                     for i, status in ((1, 'available'), (2, 'error'),
+                                       (3, 'available'))]
+
+        page = db.snapshot_get_all_by_project(
+            self.ctxt, 'project1', filters={'status': 'available'},
+            limit=1, sort_key='display_name', sort_dir='asc')
+        self._assertEqualListsOfObjects([snapshots[0]], page,
+                                        ignored_keys=['metadata', 'volume'])
+        page = db.snapshot_get_all_by_project(
+            self.ctxt, 'project1', filters={'status': 'available'},
+            marker=page[-1]['id'], limit=1, sort_key='display_name',
+            sort_dir='asc')
+        self._assertEqualListsOfObjects([snapshots[2]], page,
+                                        ignored_keys=['metadata', 'volume'])
+
+        self.assertEqual([], db.snapshot_get_all_by_project(
+            self.ctxt, 'project1', filters={'fake_key': 'fake'}))
+        self.assertEqual([], db.snapshot_get_all_by_project(
+            self.ctxt, 'project2'))
+
+    def test_snapshot_get_all_by_project_limited(self):
+        db.volume_create(self.ctxt, {'id': 1})
+        created_at = datetime.datetime(2014, 1, 1)
+        snapshots = [db.snapshot_create(self.ctxt,
+                                        {'id': i, 'volume_id': 1,
+                                         'project_id': 'project1',
+                                         'created_at': created_at + delta})
+                     for i, delta in ((1, datetime.timedelta(0)),
+                                      (2, datetime.timedelta(days=1)),
+                                      (3, datetime.timedelta(0)))]
+
+        # Without a sort key the rows are sorted by created_at then id,
+        # in descending order, before being limited.
+        page = db.snapshot_get_all_by_project(self.ctxt, 'project1',
+                                              limit=2)
+        self._assertEqualListsOfObjects([snapshots[1], snapshots[2]], page,
+                                        ignored_keys=['metadata', 'volume'])
+
     def test_snapshot_metadata_get(self):
         metadata = {'a': 'b', 'c': 'd'}
         db.volume_create(self.ctxt, {'id': 1})
@@ -1079,6 +1189,77 @@ class DBAPIQuotaTestCase(BaseTest):
                           'volumes': {'reserved': 1, 'in_use': 0}},
                          quota_usage)
 
+    def _quota_reserve_atomic(self, deltas, until_refresh=None):
+        resources = {'volumes': ReservableResource('volumes',
+                                                   '_sync_volumes'),
+                     'gigabytes': ReservableResource('gigabytes',
+                                                     '_sync_gigabytes')}
+        quotas = {'volumes': 2, 'gigabytes': 100}
+        expire = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+        return db.quota_reserve_atomic(self.ctxt, resources, quotas, deltas,
+                                       expire, until_refresh, 'project1')
+
+    def _assertUsages(self, volumes, gigabytes):
+        self.assertEqual({'project_id': 'project1',
+                          'volumes': dict(zip(('in_use', 'reserved'),
+                                              volumes)),
+                          'gigabytes': dict(zip(('in_use', 'reserved'),
+                                                gigabytes))},
+                         db.quota_usage_get_all_by_project(self.ctxt,
+                                                           'project1'))
+
+    def test_quota_reserve_atomic(self):
+        deltas = {'volumes': 1, 'gigabytes': 5}
+        reservations1 = self._quota_reserve_atomic(deltas)
+        reservations2 = self._quota_reserve_atomic(deltas)
+        self._assertUsages((0, 2), (0, 10))
+
+        # Over quota, the usages within quota aren't changed either.
+        self.assertRaises(exception.OverQuota,
+                          self._quota_reserve_atomic, deltas)
+        self._assertUsages((0, 2), (0, 10))
+
+        db.reservation_commit_atomic(self.ctxt, reservations1, 'project1')
+        self._assertUsages((1, 1), (5, 5))
+        # Reservations only apply once.
+        db.reservation_commit_atomic(self.ctxt, reservations1, 'project1')
+        self._assertUsages((1, 1), (5, 5))
+
+        db.reservation_rollback_atomic(self.ctxt, reservations2,
+                                       'project1')
+        self._assertUsages((1, 0), (5, 0))
+
+    def test_quota_reserve_atomic_until_refresh(self):
+        def _until_refresh(resource):
+            return db.quota_usage_get(self.ctxt, 'project1',
+                                      resource).until_refresh
+
+        # The volumes usage doesn't count, the gigabytes one counts down
+        # from 1, and stops at 0.
+        for i in range(2):
+            self._quota_reserve_atomic({'volumes': 0})
+            self.assertIsNone(_until_refresh('volumes'))
+            self._quota_reserve_atomic({'gigabytes': 0}, until_refresh=1)
+            self.assertEqual(0, _until_refresh('gigabytes'))
+
+    def test_quota_usage_reconcile(self):
+        resources = {'volumes': ReservableResource('volumes',
+                                                   '_sync_volumes'),
+                     'gigabytes': ReservableResource('gigabytes',
+                                                     '_sync_gigabytes')}
+        # The usages are created with until_refresh=1, then reserved once.
+        reservations = self._quota_reserve_atomic(
+            {'volumes': 1, 'gigabytes': 3}, until_refresh=1)
+        db.volume_create(self.ctxt, {'project_id': 'project1', 'size': 3})
+        db.reservation_rollback_atomic(self.ctxt, reservations, 'project1')
+        self._assertUsages((0, 0), (0, 0))
+
+        self.assertEqual(2, db.quota_usage_reconcile(self.ctxt, resources,
+                                                     1, 0))
+        self._assertUsages((1, 0), (3, 0))
+        self.assertEqual(0, db.quota_usage_reconcile(self.ctxt, resources,
+                                                     1, 0))
+
     def test_quota_destroy(self):
         db.quota_create(self.ctxt, 'project1', 'resource1', 41)
         self.assertIsNone(db.quota_destroy(self.ctxt, 'project1',
@@ -1174,7 +1355,8 @@ class DBAPIBackupTestCase(BaseTest):
             'service_metadata': 'metadata',
             'service': 'service',
             'size': 1000,
-            'object_count': 100}
+            'object_count': 100,
+            'parent_id': 'parent'}
         if one:
             return base_values
 
@@ -1214,6 +1396,20 @@ class DBAPIBackupTestCase(BaseTest):
         filtered_backups = db.backup_get_all(self.ctxt, filters=filters)
         self._assertEqualListsOfObjects([self.created[1]], filtered_backups)
 
+    def tests_backup_get_all_paginated(self):
+        filters = {'status': [self.created[0]['status'],
+                              self.created[2]['status']]}
+        page = db.backup_get_all(self.ctxt, filters=filters, limit=1,
+                                 sort_key='display_name', sort_dir='desc')
+        self._assertEqualListsOfObjects([self.created[2]], page)
+        page = db.backup_get_all(self.ctxt, filters=filters,
+                                 marker=page[-1]['id'], limit=1,
+                                 sort_key='display_name', sort_dir='desc')
+        self._assertEqualListsOfObjects([self.created[0]], page)
+
+        self.assertEqual([], db.backup_get_all(self.ctxt,
+                                               filters={'fake_key': 'fake'}))
+
     def test_backup_get_all_by_host(self):
         byhost = db.backup_get_all_by_host(self.ctxt,
                                            self.created[1]['host'])
@@ -16,6 +16,7 @@
 """Unit tests for image utils."""
 
 import contextlib
+import hashlib
 import tempfile
 
 import mock
@@ -552,6 +553,112 @@ class TestUtils(test.TestCase):
         m.VerifyAll()
 
 
+class FakeRawImageService(FakeImageService):
+    def __init__(self, data, chunk_size=3):
+        FakeImageService.__init__(self)
+        self.data = data
+        self.chunk_size = chunk_size
+        self.image_meta = {'size': len(data),
+                           'checksum': hashlib.md5(data).hexdigest(),
+                           'disk_format': 'raw',
+                           'container_format': 'bare'}
+
+    def download(self, context, image_id, data):
+        for i in range(0, len(self.data), self.chunk_size):
+            data.write(self.data[i:i + self.chunk_size])
+
+    def show(self, context, image_id):
+        return self.image_meta
+
+
+class FakeVolumeFile(object):
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+    def flush(self):
+        pass
+
+    def fileno(self):
+        return -1
+
+
+class TestStreamRawImage(test.TestCase):
+    TEST_IMAGE_ID = 321
+
+    def setUp(self):
+        super(TestStreamRawImage, self).setUp()
+        self.dest = tempfile.NamedTemporaryFile()
+        self.dest.write('\xff' * 64)
+        self.dest.flush()
+        self.addCleanup(self.dest.close)
+
+    def _read_dest(self):
+        with open(self.dest.name, 'rb') as f:
+            return f.read()
+
+    def test_fetch_to_raw_streams_raw_image(self):
+        image_service = FakeRawImageService('raw image data')
+        self.mox.StubOutWithMock(utils, 'execute')
+        self.mox.ReplayAll()
+
+        image_utils.fetch_to_raw(context, image_service, self.TEST_IMAGE_ID,
+                                 self.dest.name, mox.IgnoreArg(), size=1)
+
+        self.mox.VerifyAll()
+        self.assertEqual('raw image data' + '\xff' * 50, self._read_dest())
+
+    def test_stream_raw_image_not_raw(self):
+        image_service = FakeRawImageService('QFI\xfb' + '\0' * 100)
+
+        self.assertFalse(image_utils.stream_raw_image_to_volume(
+            context, image_service, self.TEST_IMAGE_ID,
+            image_service.image_meta, self.dest.name))
+        self.assertEqual('\xff' * 64, self._read_dest())
+
+    def test_stream_raw_image_bad_checksum(self):
+        image_service = FakeRawImageService('raw image data')
+        image_service.image_meta['checksum'] = 'bad'
+
+        self.assertRaises(exception.ImageUnacceptable,
+                          image_utils.stream_raw_image_to_volume,
+                          context, image_service, self.TEST_IMAGE_ID,
+                          image_service.image_meta, self.dest.name)
+
+    def test_stream_raw_image_bad_size(self):
+        image_service = FakeRawImageService('raw image data')
+        image_service.image_meta['size'] = 100
+
+        self.assertRaises(exception.ImageUnacceptable,
+                          image_utils.stream_raw_image_to_volume,
+                          context, image_service, self.TEST_IMAGE_ID,
+                          image_service.image_meta, self.dest.name)
+
+    def test_stream_raw_image_too_big(self):
+        image_service = FakeRawImageService('raw image data')
+        image_service.image_meta['size'] = 2 * units.Gi
+
+        self.assertRaises(exception.ImageUnacceptable,
+                          image_utils.stream_raw_image_to_volume,
+                          context, image_service, self.TEST_IMAGE_ID,
+                          image_service.image_meta, self.dest.name, size=1)
+
+    @mock.patch('os.fsync')
+    def test_raw_image_writer_aligned_writes(self, mock_fsync):
+        volume_file = FakeVolumeFile()
+        writer = image_utils._RawImageWriter(volume_file, block_size=4)
+        for chunk in ('abc', 'def', 'ghijk', 'l', 'mn'):
+            writer.write(chunk)
+        writer.close()
+
+        self.assertEqual(['abcd', 'efgh', 'ijkl', 'mn'], volume_file.writes)
+        self.assertEqual(14, writer.size)
+        self.assertEqual(hashlib.md5('abcdefghijklmn').hexdigest(),
+                         writer.checksum.hexdigest())
+
+
 class TestExtractTo(test.TestCase):
     def test_extract_to_calls_tar(self):
         mox = self.mox
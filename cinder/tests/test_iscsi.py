@@ -18,6 +18,7 @@ import shutil
 import string
 import tempfile
 
+import mock
 from oslo.config import cfg
 
 from cinder.brick.iscsi import iscsi
@@ -158,6 +159,92 @@ class TgtAdmTestCase(test.TestCase, TargetAdminTestCase):
                          (self.chap_username, self.chap_password))
 
 
+class TgtAdmTargetIndexTestCase(test.TestCase):
+
+    TARGETS = """Target 1: iqn.2010-10.org.openstack:volume-1
+    System information:
+        Driver: iscsi
+    LUN information:
+        LUN: 0
+            Type: controller
+        LUN: 1
+            Type: disk
+Target 2: iqn.2010-10.org.openstack:volume-2
+    LUN information:
+        LUN: 0
+            Type: controller
+"""
+
+    def setUp(self):
+        super(TgtAdmTargetIndexTestCase, self).setUp()
+        self.volumes_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.volumes_dir, True)
+        self.execute = mock.Mock(return_value=(self.TARGETS, ''))
+        self.target_helper = iscsi.TgtAdm('sudo', self.volumes_dir,
+                                          execute=self.execute)
+
+    def _shows(self):
+        return [call for call in self.execute.call_args_list
+                if 'show' in call[0]]
+
+    def test_get_targets(self):
+        self.assertEqual(
+            {'iqn.2010-10.org.openstack:volume-1': {'tid': '1',
+                                                    'luns': ['0', '1']},
+             'iqn.2010-10.org.openstack:volume-2': {'tid': '2',
+                                                    'luns': ['0']}},
+            self.target_helper._get_targets())
+        self.assertEqual('1', self.target_helper._get_target(
+            'iqn.2010-10.org.openstack:volume-1'))
+        self.assertTrue(self.target_helper._verify_backing_lun(
+            'iqn.2010-10.org.openstack:volume-1', '1'))
+        self.assertFalse(self.target_helper._verify_backing_lun(
+            'iqn.2010-10.org.openstack:volume-2', '2'))
+        self.assertEqual(1, len(self._shows()))
+
+    def test_create_iscsi_target_already_exported(self):
+        name = 'iqn.2010-10.org.openstack:volume-1'
+        self.assertEqual('1', self.target_helper.create_iscsi_target(
+            name, 1, 0, '/dev/vg/volume-1'))
+        self.assertEqual(1, self.execute.call_args_list.count(
+            mock.call('tgt-admin', '--update', name, run_as_root=True)))
+
+        self.execute.reset_mock()
+        self.assertEqual('1', self.target_helper.create_iscsi_target(
+            name, 1, 0, '/dev/vg/volume-1'))
+        self.assertFalse(self.execute.called)
+
+    def test_create_iscsi_targets(self):
+        targets = [{'name': 'iqn.2010-10.org.openstack:volume-%d' % index,
+                    'tid': 1, 'lun': 0, 'path': '/dev/vg/volume-%d' % index}
+                   for index in (1, 2, 3)]
+        # The first target is already exported as configured.
+        self.target_helper.create_iscsi_target(**targets[0])
+        self.execute.reset_mock()
+
+        with mock.patch.object(self.target_helper,
+                               '_recreate_backing_lun') as mock_recreate:
+            results = self.target_helper.create_iscsi_targets(targets)
+
+        self.assertEqual('1', results[0])
+        # No backing LUN, even after trying to recreate it.
+        self.assertIsInstance(results[1], Exception)
+        mock_recreate.assert_called_once_with(
+            targets[1]['name'], '2', targets[1]['name'], targets[1]['path'])
+        # Not created at all.
+        self.assertIsInstance(results[2], Exception)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.volumes_dir, 'volume-3')))
+
+        self.assertEqual(
+            [mock.call('tgt-admin', '--update', 'ALL', run_as_root=True)],
+            [call for call in self.execute.call_args_list
+             if 'tgt-admin' in call[0]])
+        # Refreshed after the update, after recreating the backing LUN and
+        # when looking for the missing target.
+        self.assertEqual(3, len(self._shows()))
+
+
 class IetAdmTestCase(test.TestCase, TargetAdminTestCase):
 
     def setUp(self):
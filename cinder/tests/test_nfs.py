@@ -14,6 +14,7 @@
 #    under the License.
 """Unit tests for the NFS driver module."""
 
+import datetime
 import errno
 import os
 
@@ -26,6 +27,7 @@ from mox import stubout
 from cinder import context
 from cinder import exception
 from cinder.image import image_utils
+from cinder.openstack.common import timeutils
 from cinder.openstack.common import units
 from cinder import test
 from cinder.volume import configuration as conf
@@ -365,6 +367,7 @@ class NfsDriverTestCase(test.TestCase):
         self.configuration.nfs_oversub_ratio = 1.0
         self.configuration.nfs_mount_point_base = self.TEST_MNT_POINT_BASE
         self.configuration.nfs_mount_options = None
+        self.configuration.nfs_allocated_rescan_interval = 600
         self.configuration.nas_secure_file_permissions = 'false'
         self.configuration.nas_secure_file_operations = 'false'
         self.configuration.volume_dd_blocksize = '1M'
@@ -502,6 +505,88 @@ class NfsDriverTestCase(test.TestCase):
 
         mox.VerifyAll()
 
+    @mock.patch('cinder.volume.drivers.nfs.greenthread.spawn_n')
+    def test_get_capacity_info_allocated_tracked(self, mock_spawn_n):
+        drv = self._driver
+        volume = {'provider_location': self.TEST_NFS_EXPORT1, 'size': 2,
+                  'name': 'volume_name'}
+
+        self.stubs.Set(drv, '_get_mount_point_for_share',
+                       lambda share: self.TEST_MNT_POINT)
+        self.stubs.Set(drv, '_ensure_share_mounted', lambda share: None)
+        outputs = {'stat': ('1 100 50', None), 'du': ('10 /mnt', None)}
+        with mock.patch.object(drv, '_execute',
+                               side_effect=lambda *cmd, **kw:
+                               outputs.get(cmd[0], ('', None))) as \
+                mock_execute:
+            self.assertEqual((100, 50, 10),
+                             drv._get_capacity_info(self.TEST_NFS_EXPORT1))
+
+            drv._do_create_volume(volume)
+            self.assertEqual((100, 50, 10 + 2 * units.Gi),
+                             drv._get_capacity_info(self.TEST_NFS_EXPORT1))
+
+            drv.delete_volume(volume)
+            self.assertEqual((100, 50, 10),
+                             drv._get_capacity_info(self.TEST_NFS_EXPORT1))
+
+        du_calls = [call for call in mock_execute.call_args_list
+                    if call[0][0] == 'du']
+        self.assertEqual(1, len(du_calls))
+        self.assertFalse(mock_spawn_n.called)
+
+    @mock.patch('cinder.volume.drivers.nfs.greenthread.spawn_n')
+    def test_get_capacity_info_allocated_recounted(self, mock_spawn_n):
+        drv = self._driver
+        self.stubs.Set(drv, '_get_mount_point_for_share',
+                       lambda share: self.TEST_MNT_POINT)
+        drv._allocated[self.TEST_NFS_EXPORT1] = [
+            10, timeutils.utcnow() - datetime.timedelta(seconds=601)]
+
+        with mock.patch.object(drv, '_execute',
+                               return_value=('1 100 50', None)):
+            self.assertEqual((100, 50, 10),
+                             drv._get_capacity_info(self.TEST_NFS_EXPORT1))
+            drv._get_capacity_info(self.TEST_NFS_EXPORT1)
+        mock_spawn_n.assert_called_once_with(drv._recount_allocated_capacity,
+                                             self.TEST_NFS_EXPORT1,
+                                             self.TEST_MNT_POINT)
+
+        with mock.patch.object(drv, '_execute',
+                               return_value=('20 /mnt', None)) as mock_exec:
+            drv._recount_allocated_capacity(self.TEST_NFS_EXPORT1,
+                                            self.TEST_MNT_POINT)
+        mock_exec.assert_called_once_with(
+            'ionice', '-c3', 'du', '-sb', '--apparent-size',
+            '--exclude', '*snapshot*', self.TEST_MNT_POINT,
+            run_as_root=True)
+        self.assertEqual(20, drv._allocated[self.TEST_NFS_EXPORT1][0])
+        self.assertEqual(set(), drv._recounting)
+
+    @mock.patch('cinder.volume.drivers.nfs.greenthread.spawn_n')
+    def test_get_capacity_info_allocated_recount_failed(self, mock_spawn_n):
+        drv = self._driver
+        self.stubs.Set(drv, '_get_mount_point_for_share',
+                       lambda share: self.TEST_MNT_POINT)
+        counted_at = timeutils.utcnow() - datetime.timedelta(seconds=601)
+        drv._allocated[self.TEST_NFS_EXPORT1] = [10, counted_at]
+
+        with mock.patch.object(drv, '_execute',
+                               side_effect=OSError):
+            drv._recount_allocated_capacity(self.TEST_NFS_EXPORT1,
+                                            self.TEST_MNT_POINT)
+        self.assertEqual(10, drv._allocated[self.TEST_NFS_EXPORT1][0])
+        self.assertGreater(drv._allocated[self.TEST_NFS_EXPORT1][1],
+                           counted_at)
+        self.assertEqual(set(), drv._recounting)
+
+        # The failed recount isn't started again right away.
+        with mock.patch.object(drv, '_execute',
+                               return_value=('1 100 50', None)):
+            self.assertEqual((100, 50, 10),
+                             drv._get_capacity_info(self.TEST_NFS_EXPORT1))
+        self.assertFalse(mock_spawn_n.called)
+
     def test_load_shares_config(self):
         mox = self._mox
         drv = self._driver
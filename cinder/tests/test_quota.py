@@ -32,6 +32,7 @@ from cinder import quota
 from cinder import test
 import cinder.tests.image.fake
 from cinder import volume
+from cinder.volume import volume_types
 
 
 CONF = cfg.CONF
@@ -792,6 +793,62 @@ class VolumeTypeQuotaEngineTestCase(test.TestCase):
         db.volume_type_destroy(ctx, vtype['id'])
         db.volume_type_destroy(ctx, vtype2['id'])
 
+    def test_resources_cached(self):
+        ctx = context.RequestContext('admin', 'admin', is_admin=True)
+        engine = quota.VolumeTypeQuotaEngine()
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        mock_version = mock.Mock(wraps=db.volume_type_get_all_version)
+        self.mock_object(db, 'volume_type_get_all_version', mock_version)
+        with mock.patch.object(db, 'volume_type_get_all',
+                               wraps=db.volume_type_get_all) as mock_vtga:
+            resources = engine.resources
+            self.assertEqual(resources, engine.resources)
+            self.assertEqual(1, mock_version.call_count)
+            self.assertEqual(1, mock_vtga.call_count)
+
+            # The volume types of other processes are only looked for
+            # once the check interval passed.
+            vtype = db.volume_type_create(ctx, {'name': 'type1'})
+            self.assertNotIn('volumes_type1', engine.resources)
+            timeutils.advance_time_seconds(
+                CONF.quota_volume_types_check_interval + 1)
+            self.assertIn('volumes_type1', engine.resources)
+            self.assertEqual(2, mock_version.call_count)
+            self.assertEqual(2, mock_vtga.call_count)
+
+            # Unchanged volume types aren't loaded again.
+            timeutils.advance_time_seconds(
+                CONF.quota_volume_types_check_interval + 1)
+            self.assertIn('volumes_type1', engine.resources)
+            self.assertEqual(3, mock_version.call_count)
+            self.assertEqual(2, mock_vtga.call_count)
+
+            db.volume_type_destroy(ctx, vtype['id'])
+            engine.invalidate_resources()
+            self.assertNotIn('volumes_type1', engine.resources)
+            self.assertEqual(3, mock_vtga.call_count)
+
+    def test_reserve_unknown_resources_checked(self):
+        ctx = context.RequestContext('admin', 'admin', is_admin=True)
+        engine = quota.VolumeTypeQuotaEngine()
+        engine.resources
+        vtype = db.volume_type_create(ctx, {'name': 'type1'})
+
+        reservations = engine.reserve(ctx, volumes_type1=1)
+        engine.rollback(ctx, reservations)
+        db.volume_type_destroy(ctx, vtype['id'])
+
+    def test_resources_invalidated_by_volume_types(self):
+        ctx = context.RequestContext('admin', 'admin', is_admin=True)
+        resources = quota.QUOTAS.resources
+        self.assertNotIn('volumes_type1', resources)
+
+        vtype = volume_types.create(ctx, 'type1')
+        self.assertIn('volumes_type1', quota.QUOTAS.resources)
+        volume_types.destroy(ctx, vtype['id'])
+        self.assertNotIn('volumes_type1', quota.QUOTAS.resources)
+
 
 class DbQuotaDriverTestCase(test.TestCase):
     def setUp(self):
@@ -1198,6 +1255,49 @@ class DbQuotaDriverTestCase(test.TestCase):
                                       ('test_project')), ])
 
 
+class AtomicDbQuotaDriverTestCase(test.TestCase):
+    def setUp(self):
+        super(AtomicDbQuotaDriverTestCase, self).setUp()
+        self.flags(quota_volumes=10, until_refresh=5, max_age=60)
+        self.driver = quota.AtomicDbQuotaDriver()
+        self.context = FakeContext('test_project', 'test_class')
+
+    @mock.patch.object(db, 'quota_reserve_atomic',
+                       return_value=['resv-1'])
+    @mock.patch.object(quota.DbQuotaDriver, 'get_project_quotas',
+                       return_value={'volumes': dict(limit=10)})
+    def test_reserve(self, mock_get_quotas, mock_reserve):
+        expire = timeutils.utcnow() + datetime.timedelta(seconds=120)
+        resources = {'volumes': quota.ReservableResource('volumes',
+                                                         '_sync_volumes')}
+        result = self.driver.reserve(self.context, resources,
+                                     dict(volumes=2), expire=expire)
+
+        self.assertEqual(['resv-1'], result)
+        mock_reserve.assert_called_once_with(
+            self.context, resources, dict(volumes=10), dict(volumes=2),
+            expire, 5, project_id='test_project')
+
+    @mock.patch.object(db, 'reservation_rollback_atomic')
+    @mock.patch.object(db, 'reservation_commit_atomic')
+    def test_commit_rollback(self, mock_commit, mock_rollback):
+        self.driver.commit(self.context, ['resv-1'])
+        mock_commit.assert_called_once_with(self.context, ['resv-1'],
+                                            project_id=None)
+        self.driver.rollback(self.context, ['resv-2'], project_id='p')
+        mock_rollback.assert_called_once_with(self.context, ['resv-2'],
+                                              project_id='p')
+
+    @mock.patch.object(db, 'quota_usage_reconcile', return_value=1)
+    def test_reconcile(self, mock_reconcile):
+        volumes = quota.ReservableResource('volumes', '_sync_volumes')
+        resources = {'volumes': volumes,
+                     'absolute': quota.AbsoluteResource('absolute')}
+        self.driver.reconcile(self.context, resources)
+        mock_reconcile.assert_called_once_with(
+            self.context, {'volumes': volumes}, 5, 60)
+
+
 class FakeSession(object):
     def begin(self):
         return self
@@ -1136,3 +1136,32 @@ class StringLengthTestCase(test.TestCase):
         self.assertRaises(exception.InvalidInput,
                           utils.check_string_length,
                           'a' * 256, 'name', max_length=255)
+
+
+class ZeroDataTestCase(test.TestCase):
+    def test_is_all_zero(self):
+        self.assertTrue(utils.is_all_zero(''))
+        self.assertTrue(utils.is_all_zero('\0' * 4096))
+        self.assertFalse(utils.is_all_zero('\1' + '\0' * 4095))
+        self.assertFalse(utils.is_all_zero('\0' * 4095 + '\1'))
+        self.assertFalse(utils.is_all_zero('\0' * 2048 + '\1' + '\0' * 2047))
+
+    def test_punch_hole_regular_file(self):
+        with tempfile.TemporaryFile() as test_file:
+            test_file.write('x' * 8192)
+            test_file.seek(1024)
+            if not utils.punch_hole(test_file, 4096, 4096):
+                self.skipTest('filesystem does not support punching holes')
+            self.assertEqual(1024, test_file.tell())
+            test_file.seek(0)
+            self.assertEqual('x' * 4096 + '\0' * 4096, test_file.read())
+
+    def test_punch_hole_unsupported(self):
+        self.assertFalse(utils.punch_hole(six.StringIO('x' * 8192),
+                                          0, 4096))
+
+    @mock.patch('os.fstat')
+    def test_punch_hole_block_device_unaligned(self, mock_fstat):
+        mock_fstat.return_value = mock.Mock(st_mode=0o60660)
+        with tempfile.TemporaryFile() as test_file:
+            self.assertFalse(utils.punch_hole(test_file, 0, 1000))
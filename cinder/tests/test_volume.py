@@ -236,7 +236,8 @@ class VolumeTestCase(BaseVolumeTestCase):
         self.stubs.Set(volutils, 'clear_volume',
                        lambda a, b, volume_clear=mox.IgnoreArg(),
                        volume_clear_size=mox.IgnoreArg(),
-                       lvm_type=mox.IgnoreArg(): None)
+                       lvm_type=mox.IgnoreArg(),
+                       bps_limit=mox.IgnoreArg(): None)
 
     def test_init_host_clears_downloads(self):
         """Test that init_host will unwedge a volume stuck in downloading."""
@@ -248,6 +249,49 @@ class VolumeTestCase(BaseVolumeTestCase):
         self.assertEqual(volume['status'], "error")
         self.volume.delete_volume(self.context, volume_id)
 
+    def test_init_host_ensure_exports(self):
+        """init_host recreates the exports of in-use volumes at once."""
+        vol0 = tests_utils.create_volume(self.context, status='in-use',
+                                         size=0, host=CONF.host)
+        vol1 = tests_utils.create_volume(self.context, status='in-use',
+                                         size=0, host=CONF.host)
+        tests_utils.create_volume(self.context, status='available',
+                                  size=0, host=CONF.host)
+
+        with mock.patch.object(self.volume.driver, 'ensure_exports',
+                               return_value={vol1['id']: Exception()}) as \
+                mock_ensure_exports:
+            self.volume.init_host()
+
+        volumes = mock_ensure_exports.call_args[0][1]
+        self.assertEqual(set([vol0['id'], vol1['id']]),
+                         set(volume['id'] for volume in volumes))
+        ctxt = context.get_admin_context()
+        self.assertEqual('in-use', db.volume_get(ctxt, vol0['id'])['status'])
+        self.assertEqual('error', db.volume_get(ctxt, vol1['id'])['status'])
+
+    def test_init_host_publishes_capabilities_once_initialized(self):
+        """init_host publishes capabilities as the driver is initialized."""
+        calls = []
+        self.volume.driver._initialized = False
+
+        def _publish(context, full=False):
+            calls.append(('publish', full, self.volume.driver.initialized))
+
+        def _ensure_exports(context, volumes, concurrency=1):
+            calls.append(('ensure_exports', concurrency))
+            return {}
+
+        with mock.patch.object(self.volume, '_publish_service_capabilities',
+                               side_effect=_publish):
+            with mock.patch.object(self.volume.driver, 'ensure_exports',
+                                   side_effect=_ensure_exports):
+                self.volume.init_host()
+
+        self.assertEqual([('ensure_exports', 1), ('publish', True, True)],
+                         calls)
+        self.assertIn('pools', self.volume.last_capabilities)
+
     def test_init_host_resumes_deletes(self):
         """init_host will resume deleting volume in deleting status."""
         volume = tests_utils.create_volume(self.context, status='deleting',
@@ -541,6 +585,58 @@ class VolumeTestCase(BaseVolumeTestCase):
                                    volume_type=db_vol_type)
         self.assertEqual(volume['volume_type_id'], db_vol_type.get('id'))
 
+    def test_create_many_volumes(self):
+        """Test volumes created together are reserved and cast at once."""
+        reserved = []
+
+        def fake_reserve(context, expire=None, project_id=None, **deltas):
+            reserved.append(deltas)
+            return ["RESERVATION"]
+
+        self.stubs.Set(QUOTAS, "reserve", fake_reserve)
+        self.stubs.Set(QUOTAS, "commit", lambda *args, **kwargs: None)
+        volume_api = cinder.volume.api.API()
+
+        with mock.patch.object(volume_api.scheduler_rpcapi,
+                               'create_volumes') as mock_create:
+            volumes = volume_api.create_many(self.context, 3, 2, 'name',
+                                             'description')
+
+        self.assertEqual([{'volumes': 3, 'gigabytes': 6}], reserved)
+        volume_ids = [volume['id'] for volume in volumes]
+        self.assertEqual(3, len(set(volume_ids)))
+        for volume_id in volume_ids:
+            volume = db.volume_get(self.context, volume_id)
+            self.assertEqual('creating', volume['status'])
+            self.assertEqual(2, volume['size'])
+        self.assertEqual(1, mock_create.call_count)
+        self.assertEqual(volume_ids, mock_create.call_args[0][2])
+        request_spec = mock_create.call_args[1]['request_spec']
+        self.assertEqual(2, request_spec['volume_properties']['size'])
+        self.assertNotIn('id', request_spec['volume_properties'])
+
+    def test_create_many_volumes_invalid_count(self):
+        volume_api = cinder.volume.api.API()
+        self.assertRaises(exception.InvalidInput, volume_api.create_many,
+                          self.context, 0, 1, 'name', 'description')
+
+    def test_create_many_volumes_too_many(self):
+        self.flags(volume_bulk_create_max_count=2)
+        volume_api = cinder.volume.api.API()
+        self.assertRaises(exception.InvalidInput, volume_api.create_many,
+                          self.context, 3, 1, 'name', 'description')
+
+    def test_create_many_volumes_policy(self):
+        volume_api = cinder.volume.api.API()
+        with mock.patch.object(cinder.policy, 'enforce',
+                               side_effect=exception.PolicyNotAuthorized(
+                                   action='volume:create')) as mock_enforce:
+            self.assertRaises(exception.PolicyNotAuthorized,
+                              volume_api.create_many,
+                              self.context, 2, 1, 'name', 'description')
+        mock_enforce.assert_called_once_with(self.context, 'volume:create',
+                                             mock.ANY)
+
     def test_create_volume_with_encrypted_volume_type(self):
         self.stubs.Set(keymgr, "API", fake_keymgr.fake_api)
 
@@ -3823,7 +3919,7 @@ class LVMISCSIVolumeDriverTestCase(DriverTestCase):
 
         self.stubs.Set(volutils, 'copy_volume',
                        lambda x, y, z, sync=False, execute='foo',
-                       blocksize=mox.IgnoreArg(): None)
+                       blocksize=mox.IgnoreArg(), sparse=False: None)
 
         self.stubs.Set(volutils, 'get_all_volume_groups',
                        get_all_volume_groups)
@@ -3976,6 +4072,189 @@ class LVMVolumeDriverTestCase(DriverTestCase):
 
         lvm_driver._delete_volume(fake_snapshot, is_snapshot=True)
 
+    @mock.patch.object(volutils, 'clear_volume')
+    @mock.patch('eventlet.greenthread.spawn_n')
+    def test_delete_volume_clear_background(self, mock_spawn, mock_clear):
+        configuration = conf.Configuration(fake_opt, 'fake_group')
+        vg = mock.Mock()
+        lvm_driver = lvm.LVMVolumeDriver(configuration=configuration,
+                                         vg_obj=vg)
+        self.override_config('volume_clear_background', True, 'fake_group')
+        self.override_config('volume_clear_bps_limit', 100, 'fake_group')
+        volume = dict(self.FAKE_VOLUME, size=1)
+
+        lvm_driver._delete_volume(volume)
+
+        vg.rename_volume.assert_called_once_with('test1',
+                                                 'clear-pending-test1')
+        self.assertFalse(vg.delete.called)
+        self.assertFalse(mock_clear.called)
+        job, pending = mock_spawn.call_args[0]
+        self.assertEqual('clear-pending-test1', pending['name'])
+
+        with mock.patch.object(os.path, 'exists', return_value=True):
+            job(pending)
+        mock_clear.assert_called_once_with(
+            units.Ki, lvm_driver.local_path(pending), volume_clear='zero',
+            volume_clear_size=0, bps_limit=100)
+        vg.delete.assert_called_once_with('clear-pending-test1')
+
+    def test_ensure_exports_concurrency(self):
+        lvm_driver = lvm.LVMVolumeDriver(
+            configuration=conf.Configuration(fake_opt, 'fake_group'),
+            vg_obj=mock.Mock())
+        running = []
+        max_running = []
+
+        def _ensure_export(context, volume):
+            running.append(volume['id'])
+            max_running.append(len(running))
+            eventlet.sleep(0)
+            running.remove(volume['id'])
+            if volume['id'] == 'fail':
+                raise exception.VolumeBackendAPIException(data='fail')
+
+        volumes = [{'id': str(index)} for index in range(5)]
+        volumes.append({'id': 'fail'})
+        with mock.patch.object(lvm_driver, 'ensure_export',
+                               side_effect=_ensure_export):
+            failures = lvm_driver.ensure_exports(self.context, volumes,
+                                                 concurrency=2)
+
+        self.assertEqual(['fail'], failures.keys())
+        self.assertEqual(6, len(max_running))
+        self.assertEqual(2, max(max_running))
+
+    def test_ensure_exports_concurrency_ietadm(self):
+        self.flags(iscsi_helper='ietadm')
+        lvm_driver = lvm.LVMISCSIDriver(
+            configuration=conf.Configuration(fake_opt, 'fake_group'),
+            vg_obj=mock.Mock())
+        running = []
+        max_running = []
+
+        def _ensure_export(context, volume, iscsi_name, volume_path,
+                           vg_name, conf):
+            running.append(volume['id'])
+            max_running.append(len(running))
+            eventlet.sleep(0)
+            running.remove(volume['id'])
+
+        volumes = [{'id': str(index), 'name': 'volume-%d' % index}
+                   for index in range(4)]
+        with mock.patch.object(lvm_driver.target_helper, 'ensure_export',
+                               side_effect=_ensure_export):
+            failures = lvm_driver.ensure_exports(self.context, volumes,
+                                                 concurrency=2)
+
+        self.assertEqual({}, failures)
+        self.assertEqual(4, len(max_running))
+        self.assertEqual(2, max(max_running))
+
+    @mock.patch.object(image_utils, 'fetch_to_raw')
+    def test_copy_image_to_volume_thinlvm_image_cache(self, mock_fetch):
+        configuration = conf.Configuration(fake_opt, 'fake_group')
+        configuration.lvm_type = 'thin'
+        vg = mock.Mock()
+        vg.get_volumes.return_value = []
+        vg.get_volume.return_value = {'name': 'cache', 'size': '1.00'}
+        lvm_driver = lvm.LVMVolumeDriver(configuration=configuration,
+                                         vg_obj=vg)
+        self.override_config('image_cache_enabled', True, 'fake_group')
+        image_service = mock.Mock()
+        image_service.show.return_value = {'checksum': 'abc',
+                                           'disk_format': 'raw',
+                                           'size': units.Gi}
+        cache_lv = 'image-cache-%s-abc' % FAKE_UUID
+
+        for index in range(2):
+            volume = {'name': 'volume-%d' % index, 'size': index + 1}
+            lvm_driver.copy_image_to_volume(self.context, volume,
+                                            image_service, FAKE_UUID)
+            vg.create_lv_snapshot.assert_called_with(volume['name'],
+                                                     cache_lv, 'thin')
+
+        self.assertEqual(1, mock_fetch.call_count)
+        vg.create_volume.assert_called_once_with(cache_lv, '1g', 'thin', 0)
+        vg.extend_volume.assert_called_once_with('volume-1', '2g')
+        self.assertEqual(1, lvm_driver.image_cache.get_stats()['hits'])
+
+    @mock.patch.object(image_utils, 'convert_image')
+    @mock.patch.object(image_utils, 'qemu_img_info')
+    @mock.patch.object(image_utils, 'fetch_verify_image')
+    @mock.patch.object(image_utils, 'fetch_to_raw')
+    def test_copy_image_to_volume_thinlvm_image_cache_smaller_volume(
+            self, mock_fetch, mock_fetch_verify, mock_info, mock_convert):
+        configuration = conf.Configuration(fake_opt, 'fake_group')
+        configuration.lvm_type = 'thin'
+        vg = mock.Mock()
+        vg.get_volumes.return_value = []
+        vg.get_volume.return_value = {'name': 'cache', 'size': '2.00'}
+        lvm_driver = lvm.LVMVolumeDriver(configuration=configuration,
+                                         vg_obj=vg)
+        self.override_config('image_cache_enabled', True, 'fake_group')
+        image_service = mock.Mock()
+        image_service.show.return_value = {'checksum': 'abc',
+                                           'disk_format': 'qcow2',
+                                           'size': units.Mi}
+        mock_info.return_value = mock.Mock(virtual_size=units.Gi + 1)
+        cache_lv = 'image-cache-%s-abc' % FAKE_UUID
+
+        # The cache LV is sized for the image, not for the first volume.
+        for name, size in (('volume-big', 10), ('volume-small', 2)):
+            volume = {'name': name, 'size': size}
+            lvm_driver.copy_image_to_volume(self.context, volume,
+                                            image_service, FAKE_UUID)
+            vg.create_lv_snapshot.assert_called_with(name, cache_lv, 'thin')
+
+        vg.create_volume.assert_called_once_with(cache_lv, '2g', 'thin', 0)
+        self.assertEqual(1, mock_fetch_verify.call_count)
+        self.assertEqual(1, mock_convert.call_count)
+        self.assertFalse(mock_fetch.called)
+        stats = lvm_driver.image_cache.get_stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(2 * units.Gi, stats['size'])
+
+    @mock.patch.object(volutils, 'copy_volume')
+    def test_create_cloned_volume_thinlvm(self, mock_copy):
+        configuration = conf.Configuration(fake_opt, 'fake_group')
+        configuration.lvm_type = 'thin'
+        vg = mock.Mock()
+        lvm_driver = lvm.LVMVolumeDriver(configuration=configuration,
+                                         vg_obj=vg)
+        src_vref = {'id': FAKE_UUID, 'name': 'volume-src', 'size': 1}
+        volume = {'id': 'fake', 'name': 'volume-dst', 'size': 2}
+
+        lvm_driver.create_cloned_volume(volume, src_vref)
+
+        vg.create_lv_snapshot.assert_called_once_with('volume-dst',
+                                                      'volume-src', 'thin')
+        vg.activate_lv.assert_called_once_with('volume-dst',
+                                               is_snapshot=True)
+        vg.extend_volume.assert_called_once_with('volume-dst', '2g')
+        self.assertFalse(vg.create_volume.called)
+        self.assertFalse(mock_copy.called)
+
+    @mock.patch.object(volutils, 'copy_volume')
+    def test_create_volume_from_snapshot_thinlvm(self, mock_copy):
+        configuration = conf.Configuration(fake_opt, 'fake_group')
+        configuration.lvm_type = 'thin'
+        vg = mock.Mock()
+        lvm_driver = lvm.LVMVolumeDriver(configuration=configuration,
+                                         vg_obj=vg)
+        snapshot = {'name': 'snapshot-fake', 'volume_size': 1}
+        volume = {'id': 'fake', 'name': 'volume-dst', 'size': 1}
+
+        lvm_driver.create_volume_from_snapshot(volume, snapshot)
+
+        vg.create_lv_snapshot.assert_called_once_with(
+            'volume-dst', '_snapshot-fake', 'thin')
+        vg.activate_lv.assert_called_once_with('volume-dst',
+                                               is_snapshot=True)
+        self.assertFalse(vg.extend_volume.called)
+        self.assertFalse(vg.create_volume.called)
+        self.assertFalse(mock_copy.called)
+
 
 class ISCSITestCase(DriverTestCase):
     """Test Case for ISCSIDriver"""
@@ -4060,6 +4339,7 @@ class ISCSITestCase(DriverTestCase):
             stats['pools'][0]['total_capacity_gb'], float('5.52'))
         self.assertEqual(
             stats['pools'][0]['free_capacity_gb'], float('0.52'))
+        self.assertFalse(stats['pools'][0]['fast_clone'])
 
     def test_validate_connector(self):
         iscsi_driver = self.base_driver(configuration=self.configuration)
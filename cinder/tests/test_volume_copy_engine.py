@@ -0,0 +1,145 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Tests for the native volume copy engine."""
+
+import os
+import shutil
+import tempfile
+
+import mock
+
+from cinder.openstack.common import units
+from cinder import test
+from cinder import utils
+from cinder.volume import copy_engine
+from cinder.volume import utils as volume_utils
+
+CHUNK_SIZE = 64 * units.Ki
+
+
+class CopyEngineTestCase(test.TestCase):
+    def setUp(self):
+        super(CopyEngineTestCase, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.src = os.path.join(self.tmp_dir, 'src')
+        self.dest = os.path.join(self.tmp_dir, 'dest')
+        self._write(self.dest, '\xff' * units.Mi)
+
+    def _write(self, path, data):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_copy_volume(self):
+        data = os.urandom(units.Mi)
+        self._write(self.src, data)
+        callback = mock.Mock()
+
+        progress = copy_engine.copy_volume(self.src, self.dest, 1,
+                                           CHUNK_SIZE, sync=True,
+                                           progress_callback=callback)
+
+        self.assertEqual(data, self._read(self.dest))
+        self.assertEqual(units.Mi, progress.done)
+        self.assertEqual(0, progress.skipped)
+        self.assertEqual(units.Mi / CHUNK_SIZE, callback.call_count)
+        callback.assert_called_with(units.Mi, units.Mi)
+
+    def test_copy_volume_short_source(self):
+        data = os.urandom(CHUNK_SIZE + 1000)
+        self._write(self.src, data)
+
+        progress = copy_engine.copy_volume(self.src, self.dest, 1,
+                                           CHUNK_SIZE)
+
+        self.assertEqual(len(data), progress.done)
+        dest_data = self._read(self.dest)
+        self.assertEqual(data, dest_data[:len(data)])
+        self.assertEqual('\xff' * (units.Mi - len(data)),
+                         dest_data[len(data):])
+
+    def test_copy_volume_sparse(self):
+        data = '\0' * CHUNK_SIZE + 'a' * CHUNK_SIZE
+        data += '\0' * (units.Mi - len(data))
+        self._write(self.src, data)
+        punched = []
+
+        def fake_punch_hole(fileobj, offset, length):
+            punched.append((offset, length))
+            return False
+
+        self.stubs.Set(utils, 'punch_hole', fake_punch_hole)
+        progress = copy_engine.copy_volume(self.src, self.dest, 1,
+                                           CHUNK_SIZE, sparse=True)
+
+        self.assertEqual(data, self._read(self.dest))
+        zero_chunks = [(offset, CHUNK_SIZE)
+                       for offset in range(0, units.Mi, CHUNK_SIZE)
+                       if offset != CHUNK_SIZE]
+        self.assertEqual(zero_chunks, sorted(punched))
+        self.assertEqual(0, progress.skipped)
+
+    def test_copy_volume_from_zero_device(self):
+        progress = copy_engine.copy_volume(copy_engine.ZERO_DEVICE,
+                                           self.dest, 1, CHUNK_SIZE)
+
+        self.assertEqual('\0' * units.Mi, self._read(self.dest))
+        self.assertEqual(units.Mi, progress.done)
+
+    def test_copy_volume_rate_limited(self):
+        self._write(self.src, os.urandom(units.Mi))
+        with mock.patch.object(copy_engine.TokenBucket,
+                               'consume') as mock_consume:
+            copy_engine.copy_volume(self.src, self.dest, 1, CHUNK_SIZE,
+                                    bps_limit=units.Mi)
+        self.assertEqual(units.Mi / CHUNK_SIZE, mock_consume.call_count)
+        mock_consume.assert_called_with(CHUNK_SIZE)
+
+    def test_volume_utils_copy_volume_native(self):
+        self.flags(volume_copy_engine='native')
+        data = os.urandom(units.Mi)
+        self._write(self.src, data)
+
+        volume_utils.copy_volume(self.src, self.dest, 1, '64K',
+                                 sync=True, sparse=True)
+
+        self.assertEqual(data, self._read(self.dest))
+
+
+class TokenBucketTestCase(test.TestCase):
+    @mock.patch('time.time')
+    @mock.patch('eventlet.greenthread.sleep')
+    def test_consume(self, mock_sleep, mock_time):
+        now = [100.0]
+        mock_time.side_effect = lambda: now[0]
+
+        def fake_sleep(seconds):
+            now[0] += seconds
+
+        mock_sleep.side_effect = fake_sleep
+        bucket = copy_engine.TokenBucket(100)
+
+        bucket.consume(100)
+        self.assertFalse(mock_sleep.called)
+        bucket.consume(50)
+        mock_sleep.assert_called_once_with(0.5)
+        # Bigger than the bucket: waits for it to fill up and goes in debt.
+        bucket.consume(300)
+        self.assertEqual(-200, bucket.tokens)
+        self.assertEqual(101.5, now[0])
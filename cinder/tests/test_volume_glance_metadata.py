@@ -95,6 +95,13 @@ class VolumeGlanceMetadataTestCase(test.TestCase):
         self._assert_metadata_equals('2', 'key2', 'value2', metadata[1])
         self._assert_metadata_equals('2', 'key22', 'value22', metadata[2])
 
+        metadata = db.volume_glance_metadata_get_all(ctxt,
+                                                     volume_ids=['1', '3'])
+        self.assertEqual(1, len(metadata))
+        self._assert_metadata_equals('1', 'key1', 'value1', metadata[0])
+        self.assertEqual([], db.volume_glance_metadata_get_all(
+            ctxt, volume_ids=[]))
+
     def _assert_metadata_equals(self, volume_id, key, value, observed):
         self.assertEqual(volume_id, observed.volume_id)
         self.assertEqual(key, observed.key)
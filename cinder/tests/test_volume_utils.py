@@ -15,8 +15,11 @@
 
 """Tests For miscellaneous util methods used with volume."""
 
+import __builtin__
 import os
 import re
+import stat
+import tempfile
 
 import mock
 from oslo.config import cfg
@@ -27,9 +30,11 @@ from cinder import exception
 from cinder.openstack.common import importutils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import processutils
+from cinder.openstack.common import units
 from cinder import test
 from cinder.tests import fake_notifier
 from cinder import utils
+from cinder.volume import copy_engine
 from cinder.volume import utils as volume_utils
 
 
@@ -115,7 +120,8 @@ class ClearVolumeTestCase(test.TestCase):
         self.mox.StubOutWithMock(volume_utils, 'copy_volume')
         volume_utils.copy_volume("/dev/zero", "volume_path", 1024,
                                  CONF.volume_dd_blocksize, sync=True,
-                                 ionice=None, execute=utils.execute)
+                                 ionice=None, execute=utils.execute,
+                                 bps_limit=CONF.volume_copy_bps_limit)
         self.mox.ReplayAll()
         volume_utils.clear_volume(1024, "volume_path")
 
@@ -126,7 +132,8 @@ class ClearVolumeTestCase(test.TestCase):
         self.mox.StubOutWithMock(volume_utils, 'copy_volume')
         volume_utils.copy_volume("/dev/zero", "volume_path", 1,
                                  CONF.volume_dd_blocksize, sync=True,
-                                 ionice=None, execute=utils.execute)
+                                 ionice=None, execute=utils.execute,
+                                 bps_limit=CONF.volume_copy_bps_limit)
         self.mox.ReplayAll()
         volume_utils.clear_volume(1024, "volume_path")
 
@@ -139,7 +146,8 @@ class ClearVolumeTestCase(test.TestCase):
         volume_utils.copy_volume("/dev/zero", "volume_path", 1024,
                                  CONF.volume_dd_blocksize, sync=True,
                                  ionice=CONF.volume_clear_ionice,
-                                 execute=utils.execute)
+                                 execute=utils.execute,
+                                 bps_limit=CONF.volume_copy_bps_limit)
         self.mox.ReplayAll()
         volume_utils.clear_volume(1024, "volume_path")
 
@@ -151,7 +159,8 @@ class ClearVolumeTestCase(test.TestCase):
         volume_utils.copy_volume("/dev/zero", "volume_path", 1,
                                  CONF.volume_dd_blocksize, sync=True,
                                  ionice=CONF.volume_clear_ionice,
-                                 execute=utils.execute)
+                                 execute=utils.execute,
+                                 bps_limit=CONF.volume_copy_bps_limit)
         self.mox.ReplayAll()
         volume_utils.clear_volume(1024, "volume_path")
 
@@ -201,6 +210,132 @@ class ClearVolumeTestCase(test.TestCase):
         self.stubs.Set(volume_utils, 'copy_volume', fake_copy_volume)
         volume_utils.clear_volume(123, vol_path)
 
+    @mock.patch.object(volume_utils, 'copy_volume')
+    @mock.patch.object(volume_utils, 'zero_block_device', return_value=True)
+    def test_clear_volume_discard(self, mock_zero, mock_copy):
+        CONF.volume_clear = 'discard'
+        CONF.volume_clear_size = 0
+        volume_utils.clear_volume(1024, "volume_path", bps_limit=100)
+        mock_zero.assert_called_once_with("volume_path", 1024, bps_limit=100)
+        self.assertFalse(mock_copy.called)
+
+    @mock.patch.object(volume_utils, 'copy_volume')
+    @mock.patch.object(volume_utils, 'zero_block_device', return_value=False)
+    def test_clear_volume_discard_unsupported(self, mock_zero, mock_copy):
+        CONF.volume_clear = 'discard'
+        CONF.volume_clear_size = 0
+        CONF.volume_clear_ionice = None
+        volume_utils.clear_volume(1024, "volume_path")
+        mock_copy.assert_called_once_with(
+            "/dev/zero", "volume_path", 1024, CONF.volume_dd_blocksize,
+            sync=True, execute=utils.execute, ionice=None,
+            bps_limit=CONF.volume_copy_bps_limit)
+
+    @mock.patch.object(volume_utils, 'zero_block_device', return_value=True)
+    def test_clear_volume_discard_default_bps_limit(self, mock_zero):
+        self.flags(volume_clear='discard', volume_clear_size=0,
+                   volume_copy_bps_limit=units.Mi)
+        volume_utils.clear_volume(1024, "volume_path")
+        mock_zero.assert_called_once_with("volume_path", 1024,
+                                          bps_limit=units.Mi)
+
+    def test_clear_volume_discard_native_fallback(self):
+        self.flags(volume_clear='discard', volume_clear_size=0,
+                   volume_clear_ionice=None, volume_copy_engine='native')
+        with tempfile.NamedTemporaryFile() as volume_file:
+            volume_file.write('a' * units.Mi)
+            volume_file.flush()
+            volume_utils.clear_volume(1, volume_file.name)
+            volume_file.seek(0)
+            self.assertEqual('\0' * units.Mi, volume_file.read())
+
+
+class ZeroBlockDeviceTestCase(test.TestCase):
+
+    class FakeDevice(object):
+        def __init__(self, data):
+            self.data = data
+            self.offset = 0
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+        def fileno(self):
+            return 42
+
+        def seek(self, offset):
+            self.offset = offset
+
+        def read(self, length):
+            return self.data[self.offset:self.offset + length]
+
+    def setUp(self):
+        super(ZeroBlockDeviceTestCase, self).setUp()
+        self.stubs.Set(volume_utils, 'CLEAR_CHUNK_SIZE', units.Mi)
+        self.stubs.Set(os, 'stat',
+                       lambda path: mock.Mock(st_mode=stat.S_IFBLK | 0o660,
+                                              st_rdev=os.makedev(8, 0)))
+        self.stubs.Set(utils, 'temporary_chown', mock.MagicMock())
+        self.device = self.FakeDevice('\0' * 4 * units.Mi)
+        self.stubs.Set(__builtin__, 'open',
+                       mock.Mock(return_value=self.device))
+        self.discarded = []
+        self.zeroed = []
+
+        def fake_discard(fileno, offset, length):
+            self.discarded.append((offset, length))
+
+        def fake_punch_hole(fileobj, offset, length):
+            self.zeroed.append((offset, length))
+            return True
+
+        self.stubs.Set(volume_utils, '_discard', fake_discard)
+        self.stubs.Set(utils, 'punch_hole', fake_punch_hole)
+
+    def test_not_block_device(self):
+        self.stubs.Set(os, 'stat', lambda path: mock.Mock(st_mode=0o100644))
+        self.assertFalse(volume_utils.zero_block_device('/tmp/file', 4))
+        self.assertEqual([], self.zeroed)
+
+    def test_discard(self):
+        self.stubs.Set(volume_utils, '_discard_zeroes_data', lambda st: True)
+        self.assertTrue(volume_utils.zero_block_device('/dev/sda', 3))
+        self.assertEqual([(0, units.Mi), (units.Mi, units.Mi),
+                          (2 * units.Mi, units.Mi)], self.discarded)
+        self.assertEqual([], self.zeroed)
+
+    def test_discard_not_zeroing(self):
+        self.device.data = 'a' * 4 * units.Mi
+        self.stubs.Set(volume_utils, '_discard_zeroes_data', lambda st: True)
+        self.assertTrue(volume_utils.zero_block_device('/dev/sda', 2))
+        self.assertEqual([(0, units.Mi)], self.discarded)
+        self.assertEqual([(0, units.Mi), (units.Mi, units.Mi)], self.zeroed)
+
+    def test_discard_not_zeroing_whole_range(self):
+        self.device.data = '\0' * (units.Mi - 1) + 'a' + '\0' * 3 * units.Mi
+        self.stubs.Set(volume_utils, '_discard_zeroes_data', lambda st: True)
+        self.assertTrue(volume_utils.zero_block_device('/dev/sda', 2))
+        self.assertEqual([(0, units.Mi)], self.discarded)
+        self.assertEqual([(0, units.Mi), (units.Mi, units.Mi)], self.zeroed)
+
+    def test_write_zeroes(self):
+        self.stubs.Set(volume_utils, '_discard_zeroes_data', lambda st: False)
+        with mock.patch.object(copy_engine.TokenBucket,
+                               'consume') as mock_consume:
+            self.assertTrue(volume_utils.zero_block_device(
+                '/dev/sda', 2, bps_limit=units.Mi))
+        self.assertEqual([], self.discarded)
+        self.assertEqual([(0, units.Mi), (units.Mi, units.Mi)], self.zeroed)
+        self.assertEqual(2, mock_consume.call_count)
+
+    def test_write_zeroes_unsupported(self):
+        self.stubs.Set(volume_utils, '_discard_zeroes_data', lambda st: False)
+        self.stubs.Set(utils, 'punch_hole', lambda *args: False)
+        self.assertFalse(volume_utils.zero_block_device('/dev/sda', 2))
+
 
 class CopyVolumeTestCase(test.TestCase):
 
@@ -19,7 +19,10 @@
 
 
 import contextlib
+import ctypes
+import ctypes.util
 import datetime
+import errno
 import hashlib
 import inspect
 import os
@@ -27,6 +30,7 @@ import pyclbr
 import re
 import shutil
 import stat
+import struct
 import sys
 import tempfile
 from xml.dom import minidom
@@ -767,3 +771,80 @@ def is_blk_device(dev):
     except Exception:
         LOG.debug('Path %s not found in is_blk_device check' % dev)
         return False
+
+
+def is_all_zero(data):
+    """Return True if the given chunk of data only contains zero bytes."""
+    if not data:
+        return True
+    if data[0] != '\0' or data[-1] != '\0':
+        return False
+    return data.count('\0') == len(data)
+
+
+# From <linux/falloc.h> and <linux/fs.h>
+FALLOC_FL_KEEP_SIZE = 0x01
+FALLOC_FL_PUNCH_HOLE = 0x02
+BLKDISCARD = 0x1277
+BLKZEROOUT = 0x127f
+
+_fallocate = None
+
+
+def _get_fallocate():
+    global _fallocate
+    if _fallocate is None:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        _fallocate = getattr(libc, 'fallocate64', None) or libc.fallocate
+        _fallocate.argtypes = [ctypes.c_int, ctypes.c_int,
+                               ctypes.c_int64, ctypes.c_int64]
+    return _fallocate
+
+
+def punch_hole(fileobj, offset, length):
+    """Deallocate a byte range of an open file so it reads back as zeroes.
+
+    Regular files get a hole punched with fallocate(2) and block devices
+    are zeroed with the BLKZEROOUT ioctl, which lets thin provisioned
+    storage unmap the range instead of having zeroes written to it.
+
+    The file position is not changed. Returns False if the file does not
+    support either operation, in which case the caller has to write the
+    zeroes itself.
+    """
+    try:
+        fileno = fileobj.fileno()
+    except (AttributeError, IOError):
+        return False
+    fileobj.flush()
+
+    mode = os.fstat(fileno).st_mode
+    if stat.S_ISREG(mode):
+        try:
+            fallocate = _get_fallocate()
+        except (AttributeError, OSError):
+            return False
+        ret = fallocate(fileno, FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE,
+                        offset, length)
+        if ret != 0:
+            err = ctypes.get_errno()
+            LOG.debug('fallocate punch hole failed: %s', os.strerror(err))
+            if err in (errno.EOPNOTSUPP, errno.ENOSYS):
+                return False
+            raise IOError(err, os.strerror(err))
+        return True
+    elif stat.S_ISBLK(mode):
+        if offset % 512 or length % 512:
+            return False
+        # NOTE: fcntl is not available on Windows, where there are no
+        # block device files either.
+        import fcntl
+        try:
+            fcntl.ioctl(fileno, BLKZEROOUT, struct.pack('QQ', offset, length))
+        except IOError as err:
+            LOG.debug('BLKZEROOUT failed: %s', err)
+            if err.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL):
+                return False
+            raise
+        return True
+    return False
@@ -62,11 +62,17 @@ az_cache_time_opt = cfg.IntOpt('az_cache_duration',
                                help='Cache volume availability zones in '
                                     'memory for the provided duration in '
                                     'seconds')
+bulk_create_max_count_opt = cfg.IntOpt('volume_bulk_create_max_count',
+                                       default=100,
+                                       help='Maximum number of volumes '
+                                            'created by a single bulk '
+                                            'create request')
 
 CONF = cfg.CONF
 CONF.register_opt(volume_host_opt)
 CONF.register_opt(volume_same_az_opt)
 CONF.register_opt(az_cache_time_opt)
+CONF.register_opt(bulk_create_max_count_opt)
 
 CONF.import_opt('glance_core_properties', 'cinder.image.glance')
 CONF.import_opt('storage_availability_zone', 'cinder.volume.manager')
@@ -203,13 +209,7 @@ class API(base.Base):
                         "You should omit the argument.")
                 raise exception.InvalidInput(reason=msg)
 
-        # Determine the valid availability zones that the volume could be
-        # created in (a task in the flow will/can use this information to
-        # ensure that the availability zone requested is valid).
-        raw_zones = self.list_availability_zones(enable_cache=True)
-        availability_zones = set([az['name'] for az in raw_zones])
-        if CONF.storage_availability_zone:
-            availability_zones.add(CONF.storage_availability_zone)
+        availability_zones = self._get_availability_zone_names()
 
         create_what = {
             'context': context,
@@ -248,6 +248,80 @@ class API(base.Base):
             flow_engine.run()
             return flow_engine.storage.fetch('volume')
 
+    def create_many(self, context, count, size, name, description,
+                    image_id=None, volume_type=None, metadata=None,
+                    availability_zone=None, scheduler_hints=None):
+        """Creates count alike volumes, scheduled all together.
+
+        The quota is reserved once for all of them, and the scheduler
+        filters and weighs the hosts once to place them.  Returns the
+        list of the new volumes.
+        """
+        check_policy(context, 'create')
+
+        if not utils.is_int_like(count) or int(count) <= 0:
+            msg = _('Invalid count provided for create request (count '
+                    'argument must be an integer greater than zero).')
+            raise exception.InvalidInput(reason=msg)
+
+        max_count = CONF.volume_bulk_create_max_count
+        if int(count) > max_count:
+            msg = (_('Invalid count provided for create request (count '
+                     'argument must not be greater than %d).') % max_count)
+            raise exception.InvalidInput(reason=msg)
+
+        if size and (not utils.is_int_like(size) or int(size) <= 0):
+            msg = _('Invalid volume size provided for create request '
+                    '(size argument must be an integer (or string '
+                    'represenation or an integer) and greater '
+                    'than zero).')
+            raise exception.InvalidInput(reason=msg)
+
+        create_what = {
+            'context': context,
+            'count': int(count),
+            'raw_size': size,
+            'name': name,
+            'description': description,
+            'snapshot': None,
+            'image_id': image_id,
+            'raw_volume_type': volume_type,
+            'metadata': metadata,
+            'raw_availability_zone': availability_zone,
+            'source_volume': None,
+            'scheduler_hints': scheduler_hints,
+            'key_manager': self.key_manager,
+            'backup_source_volume': None,
+            'source_replica': None,
+            'optional_args': {'is_quota_committed': False},
+            'consistencygroup': None
+        }
+        try:
+            flow_engine = create_volume.get_bulk_flow(
+                self.scheduler_rpcapi,
+                self.db,
+                self.image_service,
+                self._get_availability_zone_names(),
+                create_what)
+        except Exception:
+            LOG.exception(_("Failed to create api volume flow"))
+            raise exception.CinderException(
+                _("Failed to create api volume flow"))
+
+        with flow_utils.DynamicLogListener(flow_engine, logger=LOG):
+            flow_engine.run()
+            return flow_engine.storage.fetch('volumes')
+
+    def _get_availability_zone_names(self):
+        # Determine the valid availability zones that the volume could be
+        # created in (a task in the flow will/can use this information to
+        # ensure that the availability zone requested is valid).
+        raw_zones = self.list_availability_zones(enable_cache=True)
+        availability_zones = set([az['name'] for az in raw_zones])
+        if CONF.storage_availability_zone:
+            availability_zones.add(CONF.storage_availability_zone)
+        return availability_zones
+
     @wrap_check_policy
     def delete(self, context, volume, force=False, unmanage_only=False):
         if context.is_admin and context.project_id != volume['project_id']:
@@ -355,7 +429,9 @@ class API(base.Base):
         return b
 
     def get_all(self, context, marker=None, limit=None, sort_key='created_at',
-                sort_dir='desc', filters=None, viewable_admin_meta=False):
+                sort_dir='desc', filters=None, viewable_admin_meta=False,
+                fields=None):
+        """Get volumes, or only the given fields of them as dicts."""
         check_policy(context, 'get_all')
 
         if filters is None:
@@ -387,7 +463,8 @@ class API(base.Base):
             # Need to remove all_tenants to pass the filtering below.
             del filters['all_tenants']
             volumes = self.db.volume_get_all(context, marker, limit, sort_key,
-                                             sort_dir, filters=filters)
+                                             sort_dir, filters=filters,
+                                             fields=fields)
         else:
             if viewable_admin_meta:
                 context = context.elevated()
@@ -395,10 +472,22 @@ class API(base.Base):
                                                         context.project_id,
                                                         marker, limit,
                                                         sort_key, sort_dir,
-                                                        filters=filters)
+                                                        filters=filters,
+                                                        fields=fields)
 
         return volumes
 
+    def get_volume_hosts(self, context, volume_ids):
+        """Return the hosts of the project's volumes among volume_ids.
+
+        The volumes are looked up like get_all() would, but only their
+        hosts get loaded.  Returns a dict of the hosts by volume id.
+        """
+        check_policy(context, 'get_all')
+        return self.db.volume_get_hosts_by_project(
+            context, context.project_id, volume_ids,
+            no_migration_targets=not context.is_admin)
+
     def get_snapshot(self, context, snapshot_id):
         check_policy(context, 'get_snapshot')
         rv = self.db.snapshot_get(context, snapshot_id)
@@ -409,31 +498,30 @@ class API(base.Base):
         rv = self.db.volume_get(context, volume_id)
         return dict(rv.iteritems())
 
-    def get_all_snapshots(self, context, search_opts=None):
+    def get_all_snapshots(self, context, search_opts=None, marker=None,
+                          limit=None, sort_key=None, sort_dir=None):
+        """Get snapshots matching search_opts, filtered by the database.
+
+        marker, limit, sort_key and sort_dir are the paginate options of
+        db.snapshot_get_all, the snapshots aren't paginated without them.
+        """
         check_policy(context, 'get_all_snapshots')
 
-        search_opts = search_opts or {}
+        search_opts = dict(search_opts or {})
+
+        if search_opts:
+            LOG.debug("Searching by: %s" % search_opts)
 
         if (context.is_admin and 'all_tenants' in search_opts):
             # Need to remove all_tenants to pass the filtering below.
             del search_opts['all_tenants']
-            snapshots = self.db.snapshot_get_all(context)
+            snapshots = self.db.snapshot_get_all(context, search_opts,
+                                                 marker, limit, sort_key,
+                                                 sort_dir)
         else:
             snapshots = self.db.snapshot_get_all_by_project(
-                context, context.project_id)
-
-        if search_opts:
-            LOG.debug("Searching by: %s" % search_opts)
-
-            results = []
-            not_found = object()
-            for snapshot in snapshots:
-                for opt, value in search_opts.iteritems():
-                    if snapshot.get(opt, not_found) != value:
-                        break
-                else:
-                    results.append(snapshot)
-            snapshots = results
+                context, context.project_id, search_opts, marker, limit,
+                sort_key, sort_dir)
         return snapshots
 
     @wrap_check_policy
@@ -911,9 +999,11 @@ class API(base.Base):
     def get_snapshot_metadata_value(self, snapshot, key):
         pass
 
-    def get_volumes_image_metadata(self, context):
+    def get_volumes_image_metadata(self, context, volume_ids=None):
+        """Get the image metadata of all volumes, or only of volume_ids."""
         check_policy(context, 'get_volumes_image_metadata')
-        db_data = self.db.volume_glance_metadata_get_all(context)
+        db_data = self.db.volume_glance_metadata_get_all(
+            context, volume_ids=volume_ids)
         results = collections.defaultdict(dict)
         for meta_entry in db_data:
             results[meta_entry['volume_id']].update({meta_entry['key']:
@@ -17,17 +17,22 @@
 Drivers for volumes.
 """
 
+import math
+import os
 import time
 
+from eventlet import greenpool
 from oslo.config import cfg
 
 from cinder import exception
 from cinder.i18n import _, _LE
+from cinder.image import cache as image_cache
 from cinder.image import image_utils
 from cinder.openstack.common import excutils
 from cinder.openstack.common import fileutils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import processutils
+from cinder.openstack.common import units
 from cinder import utils
 from cinder.volume import iscsi
 from cinder.volume import rpcapi as volume_rpcapi
@@ -69,10 +74,21 @@ volume_opts = [
     cfg.StrOpt('volume_clear',
                default='zero',
                help='Method used to wipe old volumes (valid options are: '
-                    'none, zero, shred)'),
+                    'none, zero, shred, discard). discard zeroes volumes '
+                    'with block device discard or write zeroes requests '
+                    'where supported, and falls back to zero otherwise'),
     cfg.IntOpt('volume_clear_size',
                default=0,
                help='Size in MiB to wipe at start of old volumes. 0 => all'),
+    cfg.BoolOpt('volume_clear_background',
+                default=False,
+                help='Wipe deleted volumes in the background, after the '
+                     'delete request has completed'),
+    cfg.IntOpt('volume_clear_bps_limit',
+               default=0,
+               help='The upper limit of bandwidth used to wipe old '
+                    'volumes, in bytes per second. 0 => '
+                    'volume_copy_bps_limit'),
     cfg.StrOpt('volume_clear_ionice',
                default=None,
                help='The flag to pass to ionice to alter the i/o priority '
@@ -127,6 +143,20 @@ volume_opts = [
                default=None,
                help='The path to the client certificate for verification, '
                     'if the driver supports it.'),
+    cfg.BoolOpt('image_cache_enabled',
+                default=False,
+                help='Keep the images fetched to create volumes in a cache '
+                     'local to the volume backend, so that volumes created '
+                     'later from the same image do not fetch it again'),
+    cfg.StrOpt('image_cache_dir',
+               default='$state_path/image-cache',
+               help='Directory of the image cache, each volume backend '
+                    'using a subdirectory named after its configuration '
+                    'group'),
+    cfg.IntOpt('image_cache_max_size_gb',
+               default=20,
+               help='Size in GB the image cache of a volume backend is '
+                    'trimmed to by evicting the least recently used images'),
 ]
 
 # for backward compatibility
@@ -196,6 +226,7 @@ class VolumeDriver(object):
             self.configuration.append_config_values(iser_opts)
         self.set_execute(execute)
         self._stats = {}
+        self.image_cache = None
 
         self.pools = []
 
@@ -427,14 +458,63 @@ class VolumeDriver(object):
         attach_info = self._attach_volume(context, volume, properties)
 
         try:
+            self._fetch_image_to_path(context, volume, image_service,
+                                      image_id,
+                                      attach_info['device']['path'])
+        finally:
+            self._detach_volume(context, attach_info, volume, properties)
+
+    def _get_image_cache(self):
+        """Return the image cache of this backend, None if disabled."""
+        if self.configuration.safe_get('image_cache_enabled') is not True:
+            return None
+        if self.image_cache is None:
+            self.image_cache = self._create_image_cache()
+        return self.image_cache
+
+    def _create_image_cache(self):
+        name = self.configuration.config_group or 'default'
+        return image_cache.FileImageCache(
+            name,
+            self.configuration.image_cache_max_size_gb * units.Gi,
+            os.path.join(self.configuration.image_cache_dir, name),
+            self.configuration.volume_dd_blocksize)
+
+    def _check_cached_image_size(self, cached_path, volume, image_id):
+        """Return the size of a cached image that must fit in volume."""
+        image_size = os.path.getsize(cached_path)
+        if image_size > volume['size'] * units.Gi:
+            params = {'image_size': math.ceil(float(image_size) / units.Gi),
+                      'volume_size': volume['size']}
+            reason = _("Size is %(image_size)dGB and doesn't fit in a "
+                       "volume of size %(volume_size)dGB.") % params
+            raise exception.ImageUnacceptable(image_id=image_id,
+                                              reason=reason)
+        return image_size
+
+    def _fetch_image_to_path(self, context, volume, image_service, image_id,
+                             path):
+        """Write the image as raw to path, going through the image cache."""
+        cache = self._get_image_cache()
+        if cache is None:
             image_utils.fetch_to_raw(context,
                                      image_service,
                                      image_id,
-                                     attach_info['device']['path'],
+                                     path,
                                      self.configuration.volume_dd_blocksize,
                                      size=volume['size'])
-        finally:
-            self._detach_volume(context, attach_info, volume, properties)
+            return
+
+        with cache.get(context, image_service, image_id,
+                       size=volume['size']) as key:
+            cached_path = cache.get_path(key)
+            image_size = self._check_cached_image_size(cached_path, volume,
+                                                       image_id)
+            volume_utils.copy_volume(
+                cached_path, path,
+                int(math.ceil(float(image_size) / units.Mi)),
+                self.configuration.volume_dd_blocksize,
+                execute=self._execute)
 
     def copy_volume_to_image(self, context, volume, image_service, image_meta):
         """Copy the volume to the specified image."""
@@ -801,6 +881,30 @@ class VolumeDriver(object):
         """Synchronously recreates an export for a volume."""
         raise NotImplementedError()
 
+    def ensure_exports(self, context, volumes, concurrency=1):
+        """Synchronously recreates the exports of several volumes.
+
+        Drivers able to check all of their exports at once should override
+        this, which calls ensure_export() for up to concurrency volumes at
+        the same time.
+
+        :returns: dict of the exceptions raised, by volume id, for the
+                  exports that could not be recreated.
+        """
+        failures = {}
+
+        def _ensure_export(volume):
+            try:
+                self.ensure_export(context, volume)
+            except Exception as ex:
+                failures[volume['id']] = ex
+
+        pool = greenpool.GreenPool(max(1, concurrency))
+        for volume in volumes:
+            pool.spawn_n(_ensure_export, volume)
+        pool.waitall()
+        return failures
+
     def create_export(self, context, volume):
         """Exports the volume.
 
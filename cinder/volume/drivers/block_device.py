@@ -113,7 +113,8 @@ class BlockDeviceDriver(driver.ISCSIDriver):
             volutils.clear_volume(
                 self._get_device_size(dev_path), dev_path,
                 volume_clear=self.configuration.volume_clear,
-                volume_clear_size=self.configuration.volume_clear_size)
+                volume_clear_size=self.configuration.volume_clear_size,
+                bps_limit=self.configuration.volume_clear_bps_limit or None)
 
     def local_path(self, volume):
         if volume['provider_location']:
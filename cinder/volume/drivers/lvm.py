@@ -22,13 +22,16 @@ import math
 import os
 import socket
 
+from eventlet import greenthread
 from oslo.config import cfg
 
 from cinder.brick import exception as brick_exception
 from cinder.brick.local_dev import lvm as lvm
 from cinder import exception
 from cinder.i18n import _
+from cinder.image import cache as image_cache
 from cinder.image import image_utils
+from cinder.openstack.common import excutils
 from cinder.openstack.common import fileutils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import processutils
@@ -55,6 +58,12 @@ volume_opts = [
 CONF = cfg.CONF
 CONF.register_opts(volume_opts)
 
+# Prefix of the thin LVs holding cached images.
+IMAGE_CACHE_LV_PREFIX = 'image-cache-'
+
+# Prefix deleted LVs are renamed to while being wiped in the background.
+CLEAR_PENDING_LV_PREFIX = 'clear-pending-'
+
 
 class LVMVolumeDriver(driver.VolumeDriver):
     """Executes commands relating to Volumes."""
@@ -114,11 +123,26 @@ class LVMVolumeDriver(driver.VolumeDriver):
                     raise exception.VolumeBackendAPIException(
                         data=exception_message)
 
+        if self.configuration.volume_clear_background:
+            # Resume the wiping of the volumes deleted before a restart.
+            for lv in self.vg.get_volumes():
+                if lv['name'].startswith(CLEAR_PENDING_LV_PREFIX):
+                    size_in_g = int(math.ceil(float(lv['size'])))
+                    greenthread.spawn_n(self._clear_and_delete_lv,
+                                        {'name': lv['name'],
+                                         'id': lv['name'],
+                                         'size': size_in_g})
+
     def _sizestr(self, size_in_g):
         if int(size_in_g) == 0:
             return '100m'
         return '%sg' % size_in_g
 
+    def _sparse_copy_volume(self):
+        # Zeroes needn't be written to thin LVs, which read back
+        # unallocated space as zeroes.
+        return self.configuration.lvm_type == 'thin'
+
     def _volume_not_present(self, volume_name):
         return self.vg.get_volume(volume_name) is None
 
@@ -126,6 +150,11 @@ class LVMVolumeDriver(driver.VolumeDriver):
         """Deletes a logical volume."""
         if self.configuration.volume_clear != 'none' and \
                 self.configuration.lvm_type != 'thin':
+            if (self.configuration.volume_clear_background and
+                    not is_snapshot and
+                    volume.get('size', volume.get('volume_size'))):
+                self._delete_volume_in_background(volume)
+                return
             self._clear_volume(volume, is_snapshot)
 
         name = volume['name']
@@ -133,9 +162,30 @@ class LVMVolumeDriver(driver.VolumeDriver):
             name = self._escape_snapshot(volume['name'])
         self.vg.delete(name)
 
+    def _delete_volume_in_background(self, volume):
+        """Wipe and delete a logical volume after returning.
+
+        The LV is renamed first so that a volume with the same name can be
+        created while it is being wiped, and so that the wiping is resumed
+        by check_for_setup_error() if the service is restarted meanwhile.
+        """
+        pending = {'name': CLEAR_PENDING_LV_PREFIX + volume['name'],
+                   'id': volume['id'],
+                   'size': volume.get('size', volume.get('volume_size'))}
+        self.vg.rename_volume(volume['name'], pending['name'])
+        LOG.debug("Wiping volume %s in the background." % volume['id'])
+        greenthread.spawn_n(self._clear_and_delete_lv, pending)
+
+    def _clear_and_delete_lv(self, volume):
+        try:
+            self._clear_volume(volume)
+            self.vg.delete(volume['name'])
+        except Exception:
+            LOG.exception(_("Failed to wipe and delete logical volume %s.")
+                          % volume['name'])
+
     def _clear_volume(self, volume, is_snapshot=False):
         # zero out old volumes to prevent data leaking between users
-        # TODO(ja): reclaiming space should be done lazy and low priority
         if is_snapshot:
             # if the volume to be cleared is a snapshot of another volume
             # we need to clear out the volume using the -cow instead of the
@@ -169,7 +219,8 @@ class LVMVolumeDriver(driver.VolumeDriver):
         volutils.clear_volume(
             vol_sz_in_meg, dev_path,
             volume_clear=self.configuration.volume_clear,
-            volume_clear_size=self.configuration.volume_clear_size)
+            volume_clear_size=self.configuration.volume_clear_size,
+            bps_limit=self.configuration.volume_clear_bps_limit or None)
 
     def _escape_snapshot(self, snapshot_name):
         # Linux LVM reserves name that starts with snapshot, so that
@@ -196,8 +247,29 @@ class LVMVolumeDriver(driver.VolumeDriver):
                             self.configuration.lvm_type,
                             mirror_count)
 
+    def _create_thin_clone(self, volume, source_name, source_size):
+        """Creates a volume as a thin snapshot of the LV source_name.
+
+        Nothing is copied: the blocks of the source are shared until they
+        are written to, and the volume is grown if it is bigger than the
+        source.
+        """
+        self.vg.create_lv_snapshot(volume['name'], source_name, 'thin')
+        # Some configurations of LVM do not automatically activate
+        # ThinLVM snapshot LVs.
+        self.vg.activate_lv(volume['name'], is_snapshot=True)
+        if source_size < volume['size']:
+            self.vg.extend_volume(volume['name'],
+                                  self._sizestr(volume['size']))
+
     def create_volume_from_snapshot(self, volume, snapshot):
         """Creates a volume from a snapshot."""
+        if self.configuration.lvm_type == 'thin':
+            self._create_thin_clone(volume,
+                                    self._escape_snapshot(snapshot['name']),
+                                    snapshot['volume_size'])
+            return
+
         self._create_volume(volume['name'],
                             self._sizestr(volume['size']),
                             self.configuration.lvm_type,
@@ -213,7 +285,8 @@ class LVMVolumeDriver(driver.VolumeDriver):
                              self.local_path(volume),
                              snapshot['volume_size'] * units.Ki,
                              self.configuration.volume_dd_blocksize,
-                             execute=self._execute)
+                             execute=self._execute,
+                             sparse=self._sparse_copy_volume())
 
     def delete_volume(self, volume):
         """Deletes a logical volume."""
@@ -262,6 +335,27 @@ class LVMVolumeDriver(driver.VolumeDriver):
 
     def copy_image_to_volume(self, context, volume, image_service, image_id):
         """Fetch the image from image_service and write it to the volume."""
+        cache = self._get_image_cache()
+        if cache is None or self.configuration.lvm_type != 'thin':
+            self._fetch_image_to_path(context, volume, image_service,
+                                      image_id, self.local_path(volume))
+            return
+
+        # On thin pools cached images are kept as thin LVs, which the new
+        # volume is a snapshot of.
+        with cache.get(context, image_service, image_id,
+                       size=volume['size']) as key:
+            cache_lv = IMAGE_CACHE_LV_PREFIX + key
+            cache_size = float(self.vg.get_volume(cache_lv)['size'])
+            if cache_size <= volume['size']:
+                LOG.debug("Cloning volume %(volume)s from cached image "
+                          "%(cache_lv)s." % {'volume': volume['name'],
+                                             'cache_lv': cache_lv})
+                self.vg.delete(volume['name'])
+                self._create_thin_clone(volume, cache_lv, cache_size)
+                return
+
+        # The image does not fit in this volume.
         image_utils.fetch_to_raw(context,
                                  image_service,
                                  image_id,
@@ -269,6 +363,68 @@ class LVMVolumeDriver(driver.VolumeDriver):
                                  self.configuration.volume_dd_blocksize,
                                  size=volume['size'])
 
+    def _create_image_cache(self):
+        if self.configuration.lvm_type != 'thin':
+            return super(LVMVolumeDriver, self)._create_image_cache()
+
+        entries = []
+        for lv in self.vg.get_volumes():
+            if lv['name'].startswith(IMAGE_CACHE_LV_PREFIX):
+                entries.append((lv['name'][len(IMAGE_CACHE_LV_PREFIX):],
+                                int(float(lv['size']) * units.Gi)))
+        return image_cache.ImageCache(
+            self.configuration.config_group or 'default',
+            self.configuration.image_cache_max_size_gb * units.Gi,
+            self._create_image_cache_lv,
+            self._delete_image_cache_lv,
+            entries=entries)
+
+    def _create_image_cache_lv(self, context, image_service, image_id, key,
+                               size):
+        """Fetch an image into a thin LV of the virtual size of the image.
+
+        The LV does not depend on the volume the image is fetched for, so
+        that any volume the image fits in can be cloned from it, and the
+        cache is charged the size of the image rather than of that volume.
+        """
+        name = IMAGE_CACHE_LV_PREFIX + key
+        image_meta = image_service.show(context, image_id)
+        with image_utils.temporary_file() as tmp:
+            if (image_meta.get('disk_format') == 'raw' and
+                    image_meta.get('size') is not None):
+                # Raw images are streamed to the LV, see fetch_to_raw().
+                virtual_size = image_meta['size']
+                fetched = False
+            else:
+                image_utils.fetch_verify_image(context, image_service,
+                                               image_id, tmp)
+                virtual_size = image_utils.qemu_img_info(tmp).virtual_size
+                fetched = True
+            cache_size = max(1, int(math.ceil(float(virtual_size) /
+                                              units.Gi)))
+
+            self._create_volume(name, self._sizestr(cache_size), 'thin', 0)
+            try:
+                if fetched:
+                    image_utils.convert_image(
+                        tmp, self.local_path({'name': name}), 'raw',
+                        bps_limit=CONF.volume_copy_bps_limit)
+                else:
+                    image_utils.fetch_to_raw(
+                        context,
+                        image_service,
+                        image_id,
+                        self.local_path({'name': name}),
+                        self.configuration.volume_dd_blocksize,
+                        size=cache_size)
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    self.vg.delete(name)
+        return cache_size * units.Gi
+
+    def _delete_image_cache_lv(self, key):
+        self.vg.delete(IMAGE_CACHE_LV_PREFIX + key)
+
     def copy_volume_to_image(self, context, volume, image_service, image_meta):
         """Copy the volume to the specified image."""
         image_utils.upload_volume(context,
@@ -278,6 +434,11 @@ class LVMVolumeDriver(driver.VolumeDriver):
 
     def create_cloned_volume(self, volume, src_vref):
         """Creates a clone of the specified volume."""
+        if self.configuration.lvm_type == 'thin':
+            LOG.info(_('Creating thin clone of volume: %s') % src_vref['id'])
+            self._create_thin_clone(volume, src_vref['name'],
+                                    src_vref['size'])
+            return
 
         mirror_count = 0
         if self.configuration.lvm_mirrors:
@@ -308,7 +469,8 @@ class LVMVolumeDriver(driver.VolumeDriver):
                 self.local_path(volume),
                 src_vref['size'] * units.Ki,
                 self.configuration.volume_dd_blocksize,
-                execute=self._execute)
+                execute=self._execute,
+                sparse=self._sparse_copy_volume())
         finally:
             self.delete_snapshot(temp_snapshot)
 
@@ -394,6 +556,9 @@ class LVMVolumeDriver(driver.VolumeDriver):
             reserved_percentage=self.configuration.reserved_percentage,
             location_info=location_info,
             QoS_support=False,
+            # Clones and volumes created from snapshots share the blocks
+            # of their source on thin pools.
+            fast_clone=self.configuration.lvm_type == 'thin',
         ))
         data["pools"].append(single_pool)
 
@@ -544,6 +709,19 @@ class LVMISCSIDriver(LVMVolumeDriver, driver.ISCSIDriver):
         if model_update:
             self.db.volume_update(context, volume['id'], model_update)
 
+    def ensure_exports(self, context, volumes, concurrency=1):
+        # The target helpers recreate the exports at once, or one by one.
+        exports = []
+        for volume in volumes:
+            iscsi_name = "%s%s" % (self.configuration.iscsi_target_prefix,
+                                   volume['name'])
+            volume_path = "/dev/%s/%s" % (self.configuration.volume_group,
+                                          volume['name'])
+            exports.append((volume, iscsi_name, volume_path))
+        return self.target_helper.ensure_exports(
+            context, exports, self.configuration.volume_group,
+            self.configuration, concurrency=concurrency)
+
     def create_export(self, context, volume):
         return self._create_export(context, volume)
 
@@ -614,7 +792,8 @@ class LVMISCSIDriver(LVMVolumeDriver, driver.ISCSIDriver):
                              self.local_path(volume, vg=dest_vg),
                              volume['size'],
                              self.configuration.volume_dd_blocksize,
-                             execute=self._execute)
+                             execute=self._execute,
+                             sparse=self._sparse_copy_volume())
         self._delete_volume(volume)
         model_update = self._create_export(ctxt, volume, vg=dest_vg)
 
@@ -16,6 +16,7 @@
 import errno
 import os
 
+from eventlet import greenthread
 from oslo.config import cfg
 
 from cinder.brick.remotefs import remotefs as remotefs_brick
@@ -24,6 +25,7 @@ from cinder.i18n import _
 from cinder.image import image_utils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import processutils as putils
+from cinder.openstack.common import timeutils
 from cinder.openstack.common import units
 from cinder import utils
 from cinder.volume.drivers import remotefs
@@ -58,6 +60,12 @@ nfs_opts = [
                default=None,
                help=('Mount options passed to the nfs client. See section '
                      'of the nfs man page for details.')),
+    cfg.IntOpt('nfs_allocated_rescan_interval',
+               default=600,
+               help=('Seconds after which the space allocated on a share, '
+                     'tracked as volumes are created, extended and deleted, '
+                     'is counted again in the background. If 0, it is '
+                     'counted on every capacity query.')),
 ]
 
 CONF = cfg.CONF
@@ -76,6 +84,10 @@ class NfsDriver(remotefs.RemoteFSDriver):
 
     def __init__(self, execute=putils.execute, *args, **kwargs):
         self._remotefsclient = None
+        # Apparent bytes allocated on each share, and when they were
+        # last counted: share : [allocated, counted_at]
+        self._allocated = {}
+        self._recounting = set()
         super(NfsDriver, self).__init__(*args, **kwargs)
         self.configuration.append_config_values(nfs_opts)
         root_helper = utils.get_root_helper()
@@ -245,12 +257,76 @@ class NfsDriver(remotefs.RemoteFSDriver):
         total_available = block_size * blocks_avail
         total_size = block_size * blocks_total
 
-        du, _ = self._execute('du', '-sb', '--apparent-size', '--exclude',
-                              '*snapshot*', mount_point,
-                              run_as_root=run_as_root)
-        total_allocated = float(du.split()[0])
+        total_allocated = self._get_allocated_capacity(nfs_share,
+                                                       mount_point)
         return total_size, total_available, total_allocated
 
+    def _get_allocated_capacity(self, nfs_share, mount_point):
+        """Return the apparent space allocated on the NFS share.
+
+        Walking the share with du is expensive, so it is only done the
+        first time, the allocated space being then updated as volumes are
+        created, extended and deleted.  Once nfs_allocated_rescan_interval
+        has elapsed, it is counted again in the background, at idle I/O
+        priority, to catch the files created or deleted behind our back.
+        """
+        interval = self.configuration.nfs_allocated_rescan_interval
+        entry = self._allocated.get(nfs_share)
+        if entry is None or interval <= 0:
+            return self._count_allocated_capacity(nfs_share, mount_point)
+
+        allocated, counted_at = entry
+        if (timeutils.is_older_than(counted_at, interval) and
+                nfs_share not in self._recounting):
+            self._recounting.add(nfs_share)
+            greenthread.spawn_n(self._recount_allocated_capacity, nfs_share,
+                                mount_point)
+        return allocated
+
+    def _count_allocated_capacity(self, nfs_share, mount_point,
+                                  low_priority=False):
+        cmd = ('du', '-sb', '--apparent-size', '--exclude', '*snapshot*',
+               mount_point)
+        if low_priority:
+            cmd = ('ionice', '-c3') + cmd
+        du, _ = self._execute(*cmd, run_as_root=self._execute_as_root)
+        allocated = float(du.split()[0])
+        self._allocated[nfs_share] = [allocated, timeutils.utcnow()]
+        return allocated
+
+    def _recount_allocated_capacity(self, nfs_share, mount_point):
+        try:
+            self._count_allocated_capacity(nfs_share, mount_point,
+                                           low_priority=True)
+        except Exception:
+            LOG.exception(_('Failed to count the space allocated on %s.'),
+                          nfs_share)
+            # Keep the last count, and only try again once it is due
+            # again, rather than on each of the next capacity queries.
+            entry = self._allocated.get(nfs_share)
+            if entry is not None:
+                entry[1] = timeutils.utcnow()
+        finally:
+            self._recounting.discard(nfs_share)
+
+    def _update_allocated_capacity(self, nfs_share, size_in_gib):
+        """Account for size_in_gib more, or less, allocated on a share."""
+        entry = self._allocated.get(nfs_share)
+        if entry is not None:
+            entry[0] = max(0, entry[0] + size_in_gib * units.Gi)
+
+    def _do_create_volume(self, volume):
+        super(NfsDriver, self)._do_create_volume(volume)
+        self._update_allocated_capacity(volume['provider_location'],
+                                        volume['size'])
+
+    def delete_volume(self, volume):
+        """Deletes a logical volume."""
+        super(NfsDriver, self).delete_volume(volume)
+        if volume['provider_location'] in self._allocated:
+            self._update_allocated_capacity(volume['provider_location'],
+                                            -volume['size'])
+
     def _get_mount_point_base(self):
         return self.base
 
@@ -270,6 +346,8 @@ class NfsDriver(remotefs.RemoteFSDriver):
         if not self._is_file_size_equal(path, new_size):
             raise exception.ExtendVolumeError(
                 reason='Resizing image file failed.')
+        self._update_allocated_capacity(volume['provider_location'],
+                                        extend_by)
 
     def _is_file_size_equal(self, path, size):
         """Checks if file size at path is equal to size."""
@@ -791,6 +791,16 @@ class RBDDriver(driver.VolumeDriver):
             os.makedirs(tmp_dir)
 
     def copy_image_to_volume(self, context, volume, image_service, image_id):
+        cache = self._get_image_cache()
+        if cache is not None:
+            with cache.get(context, image_service, image_id,
+                           size=volume['size']) as key:
+                cached_path = cache.get_path(key)
+                self._check_cached_image_size(cached_path, volume, image_id)
+                self._import_image(cached_path, volume)
+            self._resize(volume)
+            return
+
         self._ensure_tmp_exists()
         tmp_dir = self.configuration.volume_tmp_dir
 
@@ -799,22 +809,24 @@ class RBDDriver(driver.VolumeDriver):
                                      tmp.name,
                                      self.configuration.volume_dd_blocksize,
                                      size=volume['size'])
+            self._import_image(tmp.name, volume)
+        self._resize(volume)
 
-            self.delete_volume(volume)
+    def _import_image(self, path, volume):
+        self.delete_volume(volume)
 
-            chunk_size = CONF.rbd_store_chunk_size * units.Mi
-            order = int(math.log(chunk_size, 2))
-            # keep using the command line import instead of librbd since it
-            # detects zeroes to preserve sparseness in the image
-            args = ['rbd', 'import',
-                    '--pool', self.configuration.rbd_pool,
-                    '--order', order,
-                    tmp.name, volume['name']]
-            if self._supports_layering():
-                args.append('--new-format')
-            args.extend(self._ceph_args())
-            self._try_execute(*args)
-        self._resize(volume)
+        chunk_size = CONF.rbd_store_chunk_size * units.Mi
+        order = int(math.log(chunk_size, 2))
+        # keep using the command line import instead of librbd since it
+        # detects zeroes to preserve sparseness in the image
+        args = ['rbd', 'import',
+                '--pool', self.configuration.rbd_pool,
+                '--order', order,
+                path, volume['name']]
+        if self._supports_layering():
+            args.append('--new-format')
+        args.extend(self._ceph_args())
+        self._try_execute(*args)
 
     def copy_volume_to_image(self, context, volume, image_service, image_meta):
         self._ensure_tmp_exists()
@@ -19,6 +19,7 @@ from taskflow.utils import misc
 from cinder import exception
 from cinder import flow_utils
 from cinder.i18n import _
+from cinder.openstack.common import excutils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import timeutils
 from cinder.openstack.common import units
@@ -524,7 +525,9 @@ class EntryCreateTask(flow_utils.CinderTask):
             # Committed quota doesn't rollback as the volume has already been
             # created at this point, and the quota has already been absorbed.
             return
-        vol_id = result['volume_id']
+        self._destroy_volume(context, result['volume_id'])
+
+    def _destroy_volume(self, context, vol_id):
         try:
             self.db.volume_destroy(context.elevated(), vol_id)
         except exception.CinderException:
@@ -556,8 +559,11 @@ class QuotaReserveTask(flow_utils.CinderTask):
         super(QuotaReserveTask, self).__init__(addons=[ACTION])
 
     def execute(self, context, size, volume_type_id, optional_args):
+        return self._reserve(context, size, volume_type_id, 1)
+
+    def _reserve(self, context, size, volume_type_id, count):
         try:
-            reserve_opts = {'volumes': 1, 'gigabytes': size}
+            reserve_opts = {'volumes': count, 'gigabytes': size * count}
             QUOTAS.add_volume_type_opts(context, reserve_opts, volume_type_id)
             reservations = QUOTAS.reserve(context, **reserve_opts)
             return {
@@ -582,11 +588,11 @@ class QuotaReserveTask(flow_utils.CinderTask):
                         "%(s_size)sG volume (%(d_consumed)dG "
                         "of %(d_quota)dG already consumed)")
                 LOG.warn(msg % {'s_pid': context.project_id,
-                                's_size': size,
+                                's_size': size * count,
                                 'd_consumed': _consumed('gigabytes'),
                                 'd_quota': quotas['gigabytes']})
                 raise exception.VolumeSizeExceedsAvailableQuota(
-                    requested=size,
+                    requested=size * count,
                     consumed=_consumed('gigabytes'),
                     quota=quotas['gigabytes'])
             elif _is_over('volumes'):
@@ -651,8 +657,12 @@ class QuotaCommitTask(flow_utils.CinderTask):
         if isinstance(result, misc.Failure):
             return
         volume = result['volume_properties']
+        self._release(context, volume, 1, volume['id'])
+
+    def _release(self, context, volume, count, volume_ids):
         try:
-            reserve_opts = {'volumes': -1, 'gigabytes': -volume['size']}
+            reserve_opts = {'volumes': -count,
+                            'gigabytes': -volume['size'] * count}
             QUOTAS.add_volume_type_opts(context,
                                         reserve_opts,
                                         volume['volume_type_id'])
@@ -664,7 +674,7 @@ class QuotaCommitTask(flow_utils.CinderTask):
                               project_id=context.project_id)
         except Exception:
             LOG.exception(_("Failed to update quota for deleting volume: %s"),
-                          volume['id'])
+                          volume_ids)
 
 
 class VolumeCastTask(flow_utils.CinderTask):
@@ -770,6 +780,129 @@ class VolumeCastTask(flow_utils.CinderTask):
         LOG.error(_('Unexpected build error:'), exc_info=exc_info)
 
 
+class BulkQuotaReserveTask(QuotaReserveTask):
+    """Reserves count volumes of the given size & volume type at once.
+
+    Reversion strategy: rollback the quota reservation.
+    """
+
+    def execute(self, context, size, volume_type_id, count, optional_args):
+        return self._reserve(context, size, volume_type_id, count)
+
+
+class BulkEntryCreateTask(EntryCreateTask):
+    """Creates count alike entries in the database.
+
+    Each volume after the first one gets an encryption key of its own.
+
+    Reversion strategy: remove the volume_ids created from the database.
+    """
+
+    default_provides = set(['volume_properties', 'volume_ids', 'volumes'])
+
+    def execute(self, context, count, key_manager, optional_args, **kwargs):
+        volumes = []
+        try:
+            for index in range(count):
+                properties = dict(kwargs)
+                if index and properties['encryption_key_id'] is not None:
+                    properties['encryption_key_id'] = (
+                        key_manager.create_key(context))
+                result = super(BulkEntryCreateTask, self).execute(
+                    context, optional_args, **properties)
+                volumes.append(result['volume'])
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for volume in volumes:
+                    self._destroy_volume(context, volume['id'])
+
+        # What the volumes have in common, to schedule them with.
+        volume_properties = result['volume_properties']
+        volume_properties.pop('id', None)
+        return {
+            'volume_ids': [volume['id'] for volume in volumes],
+            'volume_properties': volume_properties,
+            'volumes': volumes,
+        }
+
+    def revert(self, context, result, optional_args, **kwargs):
+        # We never produced a result and therefore can't destroy anything.
+        if isinstance(result, misc.Failure):
+            return
+
+        if optional_args['is_quota_committed']:
+            return
+        for vol_id in result['volume_ids']:
+            self._destroy_volume(context, vol_id)
+
+
+class BulkQuotaCommitTask(QuotaCommitTask):
+    """Commits the reservation of count volumes.
+
+    Reversion strategy: N/A (the rollback will be handled by the task that did
+    the initial reservation (see: BulkQuotaReserveTask).
+    """
+
+    def execute(self, context, reservations, volume_properties, count,
+                volume_ids, optional_args):
+        return super(BulkQuotaCommitTask, self).execute(context, reservations,
+                                                        volume_properties,
+                                                        optional_args)
+
+    def revert(self, context, result, count, volume_ids, **kwargs):
+        # We never produced a result and therefore can't destroy anything.
+        if isinstance(result, misc.Failure):
+            return
+        self._release(context, result['volume_properties'], count,
+                      volume_ids)
+
+
+class BulkVolumeCastTask(flow_utils.CinderTask):
+    """Casts the creation of count alike volumes to the scheduler.
+
+    The scheduler filters and weighs the hosts once for all of them.
+
+    Reversion strategy: N/A
+    """
+
+    def __init__(self, scheduler_rpcapi, db):
+        requires = ['image_id', 'scheduler_hints', 'snapshot_id',
+                    'source_volid', 'volume_ids', 'volume_type',
+                    'volume_properties', 'source_replicaid',
+                    'consistencygroup_id']
+        super(BulkVolumeCastTask, self).__init__(addons=[ACTION],
+                                                 requires=requires)
+        self.scheduler_rpcapi = scheduler_rpcapi
+        self.db = db
+
+    def execute(self, context, volume_ids, **kwargs):
+        scheduler_hints = kwargs.pop('scheduler_hints', None)
+        request_spec = kwargs.copy()
+        request_spec['volume_id'] = None
+        filter_properties = {}
+        if scheduler_hints:
+            filter_properties['scheduler_hints'] = scheduler_hints
+        self.scheduler_rpcapi.create_volumes(
+            context,
+            CONF.volume_topic,
+            volume_ids,
+            image_id=request_spec['image_id'],
+            request_spec=request_spec,
+            filter_properties=filter_properties)
+
+    def revert(self, context, result, flow_failures, volume_ids, **kwargs):
+        if isinstance(result, misc.Failure):
+            return
+
+        for volume_id in volume_ids:
+            common.error_out_volume(context, self.db, volume_id)
+        LOG.error(_("Volumes %s: create failed"), volume_ids)
+        exc_info = False
+        if all(flow_failures[-1].exc_info):
+            exc_info = flow_failures[-1].exc_info
+        LOG.error(_('Unexpected build error:'), exc_info=exc_info)
+
+
 def get_flow(scheduler_rpcapi, volume_rpcapi, db_api,
              image_service_api, availability_zones,
              create_what):
@@ -804,3 +937,31 @@ def get_flow(scheduler_rpcapi, volume_rpcapi, db_api,
 
     # Now load (but do not run) the flow using the provided initial data.
     return taskflow.engines.load(api_flow, store=create_what)
+
+
+def get_bulk_flow(scheduler_rpcapi, db_api, image_service_api,
+                  availability_zones, create_what):
+    """Constructs and returns the api entrypoint flow of a bulk create.
+
+    This flow does what the one of get_flow() does, but for create_what
+    ['count'] alike volumes: the quota is reserved once for all of them,
+    and a single cast asks the scheduler to place them all.
+    """
+
+    flow_name = ACTION.replace(":", "_") + "_bulk_api"
+    api_flow = linear_flow.Flow(flow_name)
+
+    api_flow.add(ExtractVolumeRequestTask(
+        image_service_api,
+        availability_zones,
+        rebind={'size': 'raw_size',
+                'availability_zone': 'raw_availability_zone',
+                'volume_type': 'raw_volume_type'}))
+    api_flow.add(BulkQuotaReserveTask(),
+                 BulkEntryCreateTask(db_api),
+                 BulkQuotaCommitTask())
+
+    api_flow.add(BulkVolumeCastTask(scheduler_rpcapi, db_api))
+
+    # Now load (but do not run) the flow using the provided initial data.
+    return taskflow.engines.load(api_flow, store=create_what)
@@ -16,6 +16,8 @@
 import os
 import re
 
+from eventlet import greenpool
+
 from cinder.brick.iscsi import iscsi
 from cinder import exception
 from cinder.i18n import _
@@ -93,15 +95,25 @@ class _ExportMixin(object):
 
         self.remove_iscsi_target(iscsi_target, 0, volume['id'], volume['name'])
 
-    def ensure_export(self, context, volume, iscsi_name, volume_path,
-                      vg_name, conf, old_name=None):
+    def _get_ensure_export_target(self, context, volume, iscsi_name,
+                                  volume_path, vg_name, conf):
+        """Return the create_iscsi_target() arguments of ensure_export.
+
+        Returns None if no iSCSI target is provisioned for the volume.
+        """
         iscsi_target = self._get_target_for_ensure_export(context,
                                                           volume['id'])
         if iscsi_target is None:
             LOG.info(_("Skipping remove_export. No iscsi_target "
                        "provisioned for volume: %s"), volume['id'])
-            return
+            return None
+        # Keep the CHAP credentials of the current export, so that it is
+        # left alone if nothing else changed.
         chap_auth = None
+        current_chap_auth = self._get_target_chap_auth(iscsi_name)
+        if current_chap_auth:
+            chap_auth = self._iscsi_authentication('IncomingUser',
+                                                   *current_chap_auth)
         # Check for https://bugs.launchpad.net/cinder/+bug/1065702
         old_name = None
         if (volume['provider_location'] is not None and
@@ -112,10 +124,42 @@ class _ExportMixin(object):
             old_name = self._fix_id_migration(context, volume, vg_name)
             if 'in-use' in volume['status']:
                 old_name = None
-        self.create_iscsi_target(iscsi_name, iscsi_target, 0, volume_path,
-                                 chap_auth, check_exit_code=False,
-                                 old_name=old_name,
-                                 write_cache=conf.iscsi_write_cache)
+        return {'name': iscsi_name, 'tid': iscsi_target, 'lun': 0,
+                'path': volume_path, 'chap_auth': chap_auth,
+                'check_exit_code': False, 'old_name': old_name,
+                'write_cache': conf.iscsi_write_cache}
+
+    def ensure_export(self, context, volume, iscsi_name, volume_path,
+                      vg_name, conf, old_name=None):
+        target = self._get_ensure_export_target(context, volume, iscsi_name,
+                                                volume_path, vg_name, conf)
+        if target is not None:
+            self.create_iscsi_target(**target)
+
+    def ensure_exports(self, context, exports, vg_name, conf,
+                       concurrency=1):
+        """Synchronously recreates several exports.
+
+        Up to concurrency exports are recreated at the same time.
+
+        :param exports: list of (volume, iscsi_name, volume_path) tuples.
+        :returns: dict of the exceptions raised, by volume id, for the
+                  exports that could not be recreated.
+        """
+        failures = {}
+
+        def _ensure_export(volume, iscsi_name, volume_path):
+            try:
+                self.ensure_export(context, volume, iscsi_name, volume_path,
+                                   vg_name, conf)
+            except Exception as ex:
+                failures[volume['id']] = ex
+
+        pool = greenpool.GreenPool(max(1, concurrency))
+        for export in exports:
+            pool.spawn_n(_ensure_export, *export)
+        pool.waitall()
+        return failures
 
     def _ensure_iscsi_targets(self, context, host, max_targets):
         """Ensure that target ids have been created in datastore."""
@@ -219,6 +263,33 @@ class TgtAdm(_ExportMixin, iscsi.TgtAdm):
     def _get_target_for_ensure_export(self, context, volume_id):
         return 1
 
+    def ensure_exports(self, context, exports, vg_name, conf,
+                       concurrency=1):
+        """Synchronously recreates several exports at once.
+
+        The target table of tgtd is read once, and all the targets missing
+        from it are created with a single update, whatever concurrency.
+        """
+        failures = {}
+        volumes = []
+        targets = []
+        for volume, iscsi_name, volume_path in exports:
+            try:
+                target = self._get_ensure_export_target(
+                    context, volume, iscsi_name, volume_path, vg_name, conf)
+            except Exception as ex:
+                failures[volume['id']] = ex
+                continue
+            if target is not None:
+                volumes.append(volume)
+                targets.append(target)
+
+        for volume, result in zip(volumes,
+                                  self.create_iscsi_targets(targets)):
+            if isinstance(result, Exception):
+                failures[volume['id']] = result
+        return failures
+
 
 class FakeIscsiHelper(_ExportMixin, iscsi.FakeIscsiHelper):
 
@@ -66,6 +66,7 @@ from cinder.volume import rpcapi as volume_rpcapi
 from cinder.volume import utils as vol_utils
 from cinder.volume import volume_types
 
+from eventlet import greenpool
 from eventlet.greenpool import GreenPool
 
 LOG = logging.getLogger(__name__)
@@ -85,6 +86,13 @@ volume_manager_opts = [
                 default=False,
                 help='Offload pending volume delete during '
                      'volume service startup'),
+    cfg.IntOpt('volume_service_inithost_concurrency',
+               default=1,
+               help='Number of volumes whose pool is looked up, or whose '
+                    'export is recreated, at the same time during volume '
+                    'service startup. Only raise it for drivers whose '
+                    'get_pool and ensure_export calls can run '
+                    'concurrently'),
     cfg.StrOpt('zoning_mode',
                default='none',
                help='FC Zoning mode configured'),
@@ -203,34 +211,66 @@ class VolumeManager(manager.SchedulerDependentManager):
     def _add_to_threadpool(self, func, *args, **kwargs):
         self._tp.spawn_n(func, *args, **kwargs)
 
-    def _count_allocated_capacity(self, ctxt, volume):
+    def _get_volume_pool(self, volume):
+        """Return the pool of a volume, and whether to save it in its host.
+
+        Returns (None, False) if the pool of the volume could not be found.
+        """
         pool = vol_utils.extract_host(volume['host'], 'pool')
-        if pool is None:
-            # No pool name encoded in host, so this is a legacy
-            # volume created before pool is introduced, ask
-            # driver to provide pool info if it has such
-            # knowledge and update the DB.
-            try:
-                pool = self.driver.get_pool(volume)
-            except Exception as err:
-                LOG.error(_('Failed to fetch pool name for volume: %s'),
-                          volume['id'])
-                LOG.exception(err)
-                return
+        if pool is not None:
+            return pool, False
 
-            if pool:
-                new_host = vol_utils.append_host(volume['host'],
-                                                 pool)
-                self.db.volume_update(ctxt, volume['id'],
-                                      {'host': new_host})
-            else:
-                # Otherwise, put them into a special fixed pool with
-                # volume_backend_name being the pool name, if
-                # volume_backend_name is None, use default pool name.
-                # This is only for counting purpose, doesn't update DB.
-                pool = (self.driver.configuration.safe_get(
-                    'volume_backend_name') or vol_utils.extract_host(
-                    volume['host'], 'pool', True))
+        # No pool name encoded in host, so this is a legacy
+        # volume created before pool is introduced, ask
+        # driver to provide pool info if it has such
+        # knowledge and update the DB.
+        try:
+            pool = self.driver.get_pool(volume)
+        except Exception as err:
+            LOG.error(_('Failed to fetch pool name for volume: %s'),
+                      volume['id'])
+            LOG.exception(err)
+            return None, False
+        if pool:
+            return pool, True
+
+        # Otherwise, put them into a special fixed pool with
+        # volume_backend_name being the pool name, if
+        # volume_backend_name is None, use default pool name.
+        # This is only for counting purpose, doesn't update DB.
+        pool = (self.driver.configuration.safe_get(
+            'volume_backend_name') or vol_utils.extract_host(
+            volume['host'], 'pool', True))
+        return pool, False
+
+    def _count_allocated_capacity(self, ctxt, volumes):
+        """Count the allocated capacity of volumes, pool by pool.
+
+        The pools of up to volume_service_inithost_concurrency legacy
+        volumes are looked up at the same time, and saved in the hosts of
+        the volumes afterwards, with one update per host.
+        """
+        new_hosts = {}
+        pool_lookups = greenpool.GreenPool(
+            max(1, CONF.volume_service_inithost_concurrency))
+        volume_pools = pool_lookups.imap(self._get_volume_pool, volumes)
+        for count, (volume, (pool, save_pool)) in enumerate(
+                zip(volumes, volume_pools), 1):
+            if count % 1000 == 0:
+                LOG.info(_("Counted the allocated capacity of %(count)d of "
+                           "%(total)d volumes."),
+                         {'count': count, 'total': len(volumes)})
+            if pool is None:
+                continue
+            if save_pool:
+                new_host = vol_utils.append_host(volume['host'], pool)
+                new_hosts.setdefault(new_host, []).append(volume['id'])
+            self._count_volume_allocated_capacity(volume, pool)
+
+        for new_host, volume_ids in new_hosts.iteritems():
+            self.db.volume_update_all(ctxt, volume_ids, {'host': new_host})
+
+    def _count_volume_allocated_capacity(self, volume, pool):
         try:
             pool_stat = self.stats['pools'][pool]
         except KeyError:
@@ -282,28 +322,27 @@ class VolumeManager(manager.SchedulerDependentManager):
             return
 
         volumes = self.db.volume_get_all_by_host(ctxt, self.host)
-        # FIXME volume count for exporting is wrong
-        LOG.debug("Re-exporting %s volumes" % len(volumes))
 
         try:
             self.stats['pools'] = {}
             self.stats.update({'allocated_capacity_gb': 0})
+
+            # available volume should also be counted into allocated
+            counted_volumes = [volume for volume in volumes
+                               if volume['status'] in ['in-use', 'available']]
+            start = time.time()
+            self._count_allocated_capacity(ctxt, counted_volumes)
+            LOG.info(_("Counted the allocated capacity of %(count)d "
+                       "volumes in %(time).2fs."),
+                     {'count': len(counted_volumes),
+                      'time': time.time() - start})
+
+            exported_volumes = []
             for volume in volumes:
-                # available volume should also be counted into allocated
-                if volume['status'] in ['in-use', 'available']:
-                    # calculate allocated capacity for driver
-                    self._count_allocated_capacity(ctxt, volume)
-
-                    try:
-                        if volume['status'] in ['in-use']:
-                            self.driver.ensure_export(ctxt, volume)
-                    except Exception as export_ex:
-                        LOG.error(_("Failed to re-export volume %s: "
-                                    "setting to error state"), volume['id'])
-                        LOG.exception(export_ex)
-                        self.db.volume_update(ctxt,
-                                              volume['id'],
-                                              {'status': 'error'})
+                if volume['status'] == 'in-use':
+                    exported_volumes.append(volume)
+                elif volume['status'] == 'available':
+                    continue
                 elif volume['status'] == 'downloading':
                     LOG.info(_("volume %s stuck in a downloading state"),
                              volume['id'])
@@ -313,6 +352,26 @@ class VolumeManager(manager.SchedulerDependentManager):
                                           {'status': 'error'})
                 else:
                     LOG.info(_("volume %s: skipping export"), volume['id'])
+
+            # The exports are recreated at once, which lets the driver
+            # check them all in one go.
+            LOG.info(_("Re-exporting %d volumes."), len(exported_volumes))
+            start = time.time()
+            failures = self.driver.ensure_exports(
+                ctxt, exported_volumes,
+                concurrency=CONF.volume_service_inithost_concurrency)
+            LOG.info(_("Re-exported %(count)d volumes in %(time).2fs, "
+                       "%(failed)d failed."),
+                     {'count': len(exported_volumes),
+                      'time': time.time() - start,
+                      'failed': len(failures)})
+            for volume_id, export_ex in failures.iteritems():
+                LOG.error(_("Failed to re-export volume %(volume_id)s: "
+                            "setting to error state: %(error)s"),
+                          {'volume_id': volume_id, 'error': export_ex})
+                self.db.volume_update(ctxt,
+                                      volume_id,
+                                      {'status': 'error'})
         except Exception as ex:
             LOG.error(_("Error encountered during "
                         "re-exporting phase of driver initialization: "
@@ -324,7 +383,13 @@ class VolumeManager(manager.SchedulerDependentManager):
         # at this point the driver is considered initialized.
         self.driver.set_initialized()
 
+        # The schedulers can use the capabilities of the backend right
+        # away, rather than wait for the pending deletes to be resumed or
+        # for its first periodic report.
+        self._publish_initial_capabilities(ctxt)
+
         LOG.debug('Resuming any in progress delete operations')
+        deleted = False
         for volume in volumes:
             if volume['status'] == 'deleting':
                 LOG.info(_('Resuming delete on volume: %s') % volume['id'])
@@ -337,9 +402,11 @@ class VolumeManager(manager.SchedulerDependentManager):
                 else:
                     # By default, delete volumes sequentially
                     self.delete_volume(ctxt, volume['id'])
+                    deleted = True
 
-        # collect and publish service capabilities
-        self.publish_service_capabilities(ctxt)
+        if deleted:
+            # collect and publish service capabilities
+            self.publish_service_capabilities(ctxt)
 
     def create_volume(self, context, volume_id, request_spec=None,
                       filter_properties=None, allow_reschedule=True,
@@ -520,7 +587,7 @@ class VolumeManager(manager.SchedulerDependentManager):
             self.stats['pools'][pool] = dict(
                 allocated_capacity_gb=-size)
 
-        self.publish_service_capabilities(context)
+        self._refresh_service_capabilities(context)
 
         return True
 
@@ -1225,6 +1292,15 @@ class VolumeManager(manager.SchedulerDependentManager):
                         updates.update(model_update)
                     self.db.volume_update(ctxt, volume_ref['id'], updates)
 
+    def _publish_initial_capabilities(self, context):
+        """Publish the capabilities of the driver once it is initialized."""
+        try:
+            self._update_driver_status()
+            self._publish_service_capabilities(context, full=True)
+        except Exception:
+            LOG.exception(_("Failed to publish the capabilities of the "
+                            "volume service at startup."))
+
     @periodic_task.periodic_task
     def _report_driver_status(self, context):
         LOG.info(_("Updating volume status"))
@@ -1242,15 +1318,21 @@ class VolumeManager(manager.SchedulerDependentManager):
                          'driver_version': self.driver.get_version(),
                          'config_group': config_group})
         else:
-            volume_stats = self.driver.get_volume_stats(refresh=True)
-            if self.extra_capabilities:
-                volume_stats.update(self.extra_capabilities)
-            if volume_stats:
-                # Append volume stats with 'allocated_capacity_gb'
-                self._append_volume_stats(volume_stats)
-
-                # queue it to be sent to the Schedulers.
-                self.update_service_capabilities(volume_stats)
+            self._update_driver_status()
+
+    def _update_driver_status(self):
+        volume_stats = self.driver.get_volume_stats(refresh=True)
+        if self.extra_capabilities:
+            volume_stats.update(self.extra_capabilities)
+        image_cache = getattr(self.driver, 'image_cache', None)
+        if volume_stats and image_cache is not None:
+            volume_stats['image_cache'] = image_cache.get_stats()
+        if volume_stats:
+            # Append volume stats with 'allocated_capacity_gb'
+            self._append_volume_stats(volume_stats)
+
+            # queue it to be sent to the Schedulers.
+            self.update_service_capabilities(volume_stats)
 
     def _append_volume_stats(self, vol_stats):
         pools = vol_stats.get('pools', None)
@@ -1266,7 +1348,16 @@ class VolumeManager(manager.SchedulerDependentManager):
                 pool.update(pool_stats)
 
     def publish_service_capabilities(self, context):
-        """Collect driver status and then publish."""
+        """Collect driver status and then publish all of it.
+
+        Called by schedulers when they start, which can't make use of
+        capability deltas before they got a full report.
+        """
+        self._report_driver_status(context)
+        self._publish_service_capabilities(context, full=True)
+
+    def _refresh_service_capabilities(self, context):
+        """Collect driver status and then publish what changed."""
         self._report_driver_status(context)
         self._publish_service_capabilities(context)
 
@@ -1511,7 +1602,7 @@ class VolumeManager(manager.SchedulerDependentManager):
             QUOTAS.commit(context, old_reservations, project_id=project_id)
         if new_reservations:
             QUOTAS.commit(context, new_reservations, project_id=project_id)
-        self.publish_service_capabilities(context)
+        self._refresh_service_capabilities(context)
 
     def manage_existing(self, ctxt, volume_id, ref=None):
         LOG.debug('manage_existing: managing %s.' % ref)
@@ -1803,7 +1894,7 @@ class VolumeManager(manager.SchedulerDependentManager):
                  group_id)
         self._notify_about_consistencygroup_usage(
             context, group_ref, "delete.end")
-        self.publish_service_capabilities(context)
+        self._refresh_service_capabilities(context)
 
         return True
 
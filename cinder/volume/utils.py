@@ -15,9 +15,14 @@
 """Volume-related Utilities and helpers."""
 
 
+import errno
 import math
+import os
+import stat
+import struct
 
 from Crypto.Random import random
+from eventlet import tpool
 from oslo.config import cfg
 
 from cinder.brick.local_dev import lvm as brick_lvm
@@ -30,12 +35,16 @@ from cinder.openstack.common import timeutils
 from cinder.openstack.common import units
 from cinder import rpc
 from cinder import utils
+from cinder.volume import copy_engine
 
 
 CONF = cfg.CONF
 
 LOG = logging.getLogger(__name__)
 
+# Size of the ranges zeroed at once by zero_block_device().
+CLEAR_CHUNK_SIZE = 128 * units.Mi
+
 
 def null_safe_str(s):
     return str(s) if s else ''
@@ -297,7 +306,29 @@ def check_for_odirect_support(src, dest, flag='oflag=direct'):
 
 
 def copy_volume(srcstr, deststr, size_in_m, blocksize, sync=False,
-                execute=utils.execute, ionice=None):
+                execute=utils.execute, ionice=None, sparse=False,
+                progress_callback=None, bps_limit=None):
+    """Copy size_in_m MB from srcstr to deststr.
+
+    The copy is done by dd unless volume_copy_engine is set to native,
+    see cinder.volume.copy_engine.  sparse and progress_callback are only
+    honoured by the native engine, which isn't used when ionice is given
+    as it has no way to set the I/O priority of the copy.  bps_limit
+    defaults to volume_copy_bps_limit.
+    """
+    if bps_limit is None:
+        bps_limit = CONF.volume_copy_bps_limit
+
+    if CONF.volume_copy_engine == 'native' and ionice is None:
+        blocksize, count = _calculate_count(size_in_m, blocksize)
+        copy_engine.copy_volume(
+            srcstr, deststr, size_in_m,
+            strutils.string_to_bytes('%sB' % blocksize, return_int=True),
+            sync=sync, sparse=sparse,
+            bps_limit=bps_limit,
+            progress_callback=progress_callback)
+        return
+
     # Use O_DIRECT to avoid thrashing the system buffer cache
     extra_flags = []
     if check_for_odirect_support(srcstr, deststr, 'iflag=direct'):
@@ -321,7 +352,7 @@ def copy_volume(srcstr, deststr, size_in_m, blocksize, sync=False,
     if ionice is not None:
         cmd = ['ionice', ionice] + cmd
 
-    cgcmd = setup_blkio_cgroup(srcstr, deststr, CONF.volume_copy_bps_limit)
+    cgcmd = setup_blkio_cgroup(srcstr, deststr, bps_limit)
     if cgcmd:
         cmd = cgcmd + cmd
 
@@ -345,9 +376,89 @@ def copy_volume(srcstr, deststr, size_in_m, blocksize, sync=False,
     LOG.info(mesg % {'size_in_m': size_in_m, 'mbps': mbps})
 
 
+def _discard_zeroes_data(st):
+    path = ('/sys/dev/block/%d:%d/queue/discard_zeroes_data' %
+            (os.major(st.st_rdev), os.minor(st.st_rdev)))
+    try:
+        with open(path) as f:
+            return f.read().strip() == '1'
+    except IOError:
+        return False
+
+
+def _discard(fileno, offset, length):
+    # NOTE: fcntl is not available on Windows, where there are no
+    # block device files either.
+    import fcntl
+    fcntl.ioctl(fileno, utils.BLKDISCARD, struct.pack('QQ', offset, length))
+
+
+def _is_zeroed(dev, offset, length):
+    dev.seek(offset)
+    while length > 0:
+        data = dev.read(min(length, units.Mi))
+        if not data or not utils.is_all_zero(data):
+            return False
+        length -= len(data)
+    return True
+
+
+def zero_block_device(volume_path, size_in_m, bps_limit=None):
+    """Zero the start of a block device in the block layer.
+
+    Ranges are discarded if the device reports that discarded blocks read
+    back as zeroes, which is checked by reading back every discarded
+    range, and zeroed out with BLKZEROOUT otherwise.  Returns False,
+    without having done anything, if volume_path is not a block device or
+    supports neither.
+    """
+    st = os.stat(volume_path)
+    if not stat.S_ISBLK(st.st_mode):
+        return False
+    discard = _discard_zeroes_data(st)
+    total = size_in_m * units.Mi
+    bucket = copy_engine.TokenBucket(bps_limit) if bps_limit else None
+
+    with utils.temporary_chown(volume_path):
+        with open(volume_path, 'r+b', 0) as dev:
+            offset = 0
+            while offset < total:
+                length = min(CLEAR_CHUNK_SIZE, total - offset)
+                if bucket is not None:
+                    bucket.consume(length)
+                if discard:
+                    try:
+                        tpool.execute(_discard, dev.fileno(), offset, length)
+                        discard = tpool.execute(_is_zeroed, dev, offset,
+                                                length)
+                    except IOError as e:
+                        if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY,
+                                           errno.EINVAL):
+                            raise
+                        discard = False
+                    if not discard:
+                        LOG.warn(_("Discard does not zero %s, zeroing it "
+                                   "out instead.") % volume_path)
+                if (not discard and
+                        not tpool.execute(utils.punch_hole, dev, offset,
+                                          length)):
+                    if offset:
+                        raise exception.VolumeBackendAPIException(
+                            data=_("Failed to zero out %s.") % volume_path)
+                    return False
+                offset += length
+    return True
+
+
 def clear_volume(volume_size, volume_path, volume_clear=None,
-                 volume_clear_size=None, volume_clear_ionice=None):
-    """Unprovision old volumes to prevent data leaking between users."""
+                 volume_clear_size=None, volume_clear_ionice=None,
+                 bps_limit=None):
+    """Unprovision old volumes to prevent data leaking between users.
+
+    The discard method zeroes the volume in the block layer, see
+    zero_block_device(), and falls back to the zero one on devices that
+    don't support it.  bps_limit defaults to volume_copy_bps_limit.
+    """
     if volume_clear is None:
         volume_clear = CONF.volume_clear
 
@@ -360,13 +471,27 @@ def clear_volume(volume_size, volume_path, volume_clear=None,
     if volume_clear_ionice is None:
         volume_clear_ionice = CONF.volume_clear_ionice
 
+    if bps_limit is None:
+        bps_limit = CONF.volume_copy_bps_limit
+
     LOG.info(_("Performing secure delete on volume: %s") % volume_path)
 
+    if volume_clear == 'discard':
+        start_time = timeutils.utcnow()
+        if zero_block_device(volume_path, volume_clear_size,
+                             bps_limit=bps_limit):
+            duration = timeutils.delta_seconds(start_time, timeutils.utcnow())
+            LOG.info(_('Elapsed time for clear volume: %.2f sec') % duration)
+            return
+        LOG.debug("%s can't be zeroed in the block layer, copying zeroes "
+                  "to it instead." % volume_path)
+        volume_clear = 'zero'
+
     if volume_clear == 'zero':
         return copy_volume('/dev/zero', volume_path, volume_clear_size,
                            CONF.volume_dd_blocksize,
                            sync=True, execute=utils.execute,
-                           ionice=volume_clear_ionice)
+                           ionice=volume_clear_ionice, bps_limit=bps_limit)
     elif volume_clear == 'shred':
         clear_cmd = ['shred', '-n3']
         if volume_clear_size:
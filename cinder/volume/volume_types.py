@@ -28,6 +28,7 @@ from cinder import db
 from cinder import exception
 from cinder.i18n import _, _LE
 from cinder.openstack.common import log as logging
+from cinder import quota
 
 
 CONF = cfg.CONF
@@ -45,6 +46,7 @@ def create(context, name, extra_specs=None):
         LOG.exception(_LE('DB error: %s') % e)
         raise exception.VolumeTypeCreateFailed(name=name,
                                                extra_specs=extra_specs)
+    quota.QUOTAS.invalidate_resources()
     return type_ref
 
 
@@ -55,6 +57,7 @@ def destroy(context, id):
         raise exception.InvalidVolumeType(reason=msg)
     else:
         db.volume_type_destroy(context, id)
+        quota.QUOTAS.invalidate_resources()
 
 
 def get_all_types(context, inactive=0, search_opts=None):
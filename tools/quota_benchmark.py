@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the throughput of quota reservations under concurrent load.
+
+   Threads reserve and commit quota of a single project in a loop, the way
+   a tenant creating and deleting many volumes in parallel does: each cycle
+   reserves and commits a volume and a gigabyte, then gives them back the
+   same way.  The quota of the project allows one volume per thread, so
+   that the reservations are checked against it but never go over it.
+
+   Each quota driver given by --drivers is measured in turn, by default the
+   DbQuotaDriver, which locks the usages of the project while reserving,
+   committing and rolling back, and the AtomicDbQuotaDriver, which changes
+   them with conditional updates.  The reserve/commit pairs per second and
+   the failed cycles of each driver are printed.
+
+   The database of the [database] connection option is used, its schema is
+   upgraded first, and each run creates its quotas, usages and reservations
+   in a project of its own.  SQLite serializes all of its writers and can't
+   show row lock contention: use a MySQL or PostgreSQL database, e.g.
+
+       tools/quota_benchmark.py --config-file bench.conf --threads 32
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import threading
+import time
+import uuid
+
+from oslo.config import cfg
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir,
+                                   os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'cinder', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+from cinder.common import config  # noqa
+from cinder import context
+from cinder import db
+from cinder.db import migration
+from cinder.openstack.common import importutils
+from cinder import quota
+
+
+CONF = cfg.CONF
+script_opts = [
+    cfg.IntOpt('threads',
+               default=16,
+               help='Number of threads reserving quota concurrently'),
+    cfg.IntOpt('cycles',
+               default=50,
+               help='Number of reserve/commit cycles of each thread'),
+    cfg.ListOpt('drivers',
+                default=['cinder.quota.DbQuotaDriver',
+                         'cinder.quota.AtomicDbQuotaDriver'],
+                help='Quota drivers to measure'),
+]
+CONF.register_cli_opts(script_opts)
+
+
+def _reserve_and_commit(driver, ctxt, resources, project_id, deltas):
+    # The drivers are called directly, as the QuotaEngine only logs the
+    # errors of commits.
+    reservations = driver.reserve(ctxt, resources, deltas,
+                                  project_id=project_id)
+    driver.commit(ctxt, reservations, project_id=project_id)
+
+
+def _run_cycles(driver, ctxt, resources, project_id, cycles, failures):
+    for i in range(cycles):
+        try:
+            _reserve_and_commit(driver, ctxt, resources, project_id,
+                                {'volumes': 1, 'gigabytes': 1})
+            _reserve_and_commit(driver, ctxt, resources, project_id,
+                                {'volumes': -1, 'gigabytes': -1})
+        except Exception as e:
+            failures.append(e)
+
+
+def _measure(driver_class, ctxt):
+    driver = importutils.import_object(driver_class)
+    resources = quota.QUOTAS.resources
+    project_id = 'quota-benchmark-%s' % uuid.uuid4().hex
+    for resource in ('volumes', 'gigabytes'):
+        db.quota_create(ctxt, project_id, resource, CONF.threads)
+    # Create the usages of the project out of the measure.
+    _reserve_and_commit(driver, ctxt, resources, project_id,
+                        {'volumes': 0, 'gigabytes': 0})
+
+    failures = []
+    threads = [threading.Thread(target=_run_cycles,
+                                args=(driver, ctxt, resources, project_id,
+                                      CONF.cycles, failures))
+               for i in range(CONF.threads)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    # Each successful cycle reserved and committed twice.
+    pairs = 2 * (CONF.threads * CONF.cycles - len(failures))
+    print('%-36s %9.1f reserve/commit per second, %d failed cycles' %
+          (driver_class, pairs / elapsed, len(failures)))
+    for error in sorted(set(type(failure).__name__
+                            for failure in failures)):
+        print('    %s' % error)
+
+
+def main():
+    CONF(sys.argv[1:], project='cinder')
+    migration.db_sync()
+    ctxt = context.get_admin_context()
+
+    print('%d threads, %d cycles each' % (CONF.threads, CONF.cycles))
+    for driver_class in CONF.drivers:
+        _measure(driver_class, ctxt)
+
+
+if __name__ == '__main__':
+    main()